@@ -1,12 +1,26 @@
+import time
 from flask import Flask, render_template
 from config import Config
 from .extensions import db, login_manager, migrate
-from .models import User, Role  # Import models
+from .database import configure_database, apply_sqlite_pragmas
+from .models import User  # Import models
 import os
 
 def create_app(config_class=Config):
+    # Each phase is timed and logged: worker boot should stay near-instant.
+    # Schema creation and role seeding are one-time steps (`flask init-db`),
+    # and the ML models load on first use (or here with PRELOAD_ML).
+    timings = {}
+    started = phase = time.perf_counter()
+
+    def lap(name):
+        nonlocal phase
+        now = time.perf_counter()
+        timings[name] = round((now - phase) * 1000, 1)
+        phase = now
+
     app = Flask(__name__, instance_relative_config=True)
-    
+
     # 1. Load configuration from config.py
     app.config.from_object(config_class)
 
@@ -15,20 +29,23 @@ def create_app(config_class=Config):
         os.makedirs(app.instance_path)
     except OSError:
         pass
+    lap('config')
 
     # 3. Initialize extensions
+    configure_database(app)
     db.init_app(app)
+    apply_sqlite_pragmas(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
 
     @login_manager.user_loader
     def load_user(user_id):
         """Required callback for Flask-Login to load a user from session."""
-        return User.query.get(int(user_id))
+        return db.session.get(User, int(user_id))
+    lap('extensions')
 
     # --- Register Blueprints ---
-    # (We create the blueprint files in later phases)
-    
+
     from .main.routes import main_bp
     app.register_blueprint(main_bp)
 
@@ -44,25 +61,28 @@ def create_app(config_class=Config):
     from .market.routes import market_bp
     app.register_blueprint(market_bp, url_prefix='/market')
 
+    from .api.routes import api_bp
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
+
     # --- End of Blueprint Registration ---
+    lap('blueprints')
+
+    # --- CLI Commands ---
+    from .commands import register_commands
+    register_commands(app)
 
-    # --- Create DB and Default Roles ---
-    # This block runs within the app context to interact with the DB
-    with app.app_context():
-        # Create all database tables if they don't exist
-        db.create_all()  
-        
-        # Create user roles if they don't exist
-        if not Role.query.filter_by(name='Farmer').first():
-            db.session.add(Role(name='Farmer'))
-        if not Role.query.filter_by(name='Admin').first():
-            db.session.add(Role(name='Admin'))
-        
-        db.session.commit()
-    
+    # Opt-in request profiling (no-op unless PROFILING_ENABLED)
+    from .profiling import init_profiling
+    init_profiling(app)
 
+    # Shared cache for the public pages (invalidated by product/user writes)
+    from .page_cache import init_page_cache
+    init_page_cache(app)
 
-    # ... (inside the create_app function)
+    # Dashboard current conditions, refreshed in the background
+    from .ml_models.current_weather import init_current_weather
+    init_current_weather(app)
+    lap('cli_and_profiling')
 
     # --- Error Handlers ---
     @app.errorhandler(404)
@@ -76,11 +96,14 @@ def create_app(config_class=Config):
         log_exception("Unhandled 500 Error", e)
         return render_template('500.html'), 500
 
-    # --- Create DB and Default Roles ---
-    # (This section is already here)
-    with app.app_context():
-        db.create_all()  
-        # ... (rest of the code) ...
-        db.session.commit()
+    if app.config.get('PRELOAD_ML'):
+        from agroadvisor.ml_models import recommender_models
+        recommender_models()
+        lap('ml_models')
+
+    timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+    app.extensions['startup_timings'] = timings
+    from agroadvisor.ml_models.utils import log
+    log("[Startup] create_app " + ", ".join(f"{k}={v}ms" for k, v in timings.items()))
 
-    return app
\ No newline at end of file
+    return app
@@ -0,0 +1,119 @@
+import io
+import os
+import csv
+import json
+import zlib
+from typing import Iterable, Iterator, List, NamedTuple, Sequence
+from sqlalchemy import select
+
+from agroadvisor.extensions import db
+from agroadvisor.models import User, Role, Product
+from agroadvisor.ml_models.utils import INSTANCE_DIR
+
+# --- Configuration ---
+# Rows fetched from the database cursor at a time
+YIELD_PER = 1000
+# Rows per chunk written to the response
+CHUNK_ROWS = 500
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+# Written by `flask backtest` (see ml_models/backtest.py)
+FORECASTS_FILE = os.path.join(INSTANCE_DIR, 'backtest', 'forecasts.csv')
+
+
+class Export(NamedTuple):
+    columns: List[str]
+    rows: Iterator[Sequence]  # values in `columns` order
+
+
+# --- Row sources (each streams; nothing is loaded whole) ---
+
+def _stream(query) -> Iterator[Sequence]:
+    result = db.session.execute(query.execution_options(yield_per=YIELD_PER))
+    for partition in result.partitions():
+        yield from partition
+
+
+def user_export() -> Export:
+    query = select(User.id, User.username, User.email, Role.name.label('role'))\
+        .outerjoin(Role, User.role_id == Role.id).order_by(User.id)
+    return Export(['id', 'username', 'email', 'role'], _stream(query))
+
+
+def product_export() -> Export:
+    query = select(Product.id, Product.name, Product.description, Product.price, Product.quantity,
+                   Product.contact_phone, Product.date_posted, Product.user_id, User.username.label('seller'))\
+        .join(User, Product.user_id == User.id).order_by(Product.id)
+    columns = ['id', 'name', 'description', 'price', 'quantity', 'contact_phone', 'date_posted', 'user_id', 'seller']
+    return Export(columns, _stream(query))
+
+
+def forecast_export() -> Export:
+    """The price forecasts scored by the last `flask backtest` run, read line by line."""
+    path = FORECASTS_FILE
+    if not os.path.exists(path):
+        return Export([], iter(()))
+    with open(path, newline='') as f:
+        columns = next(csv.reader(f), [])
+
+    def rows():
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            yield from reader
+    return Export(columns, rows())
+
+
+DATASETS = {
+    'users': user_export,
+    'products': product_export,
+    'forecasts': forecast_export,
+}
+
+
+# --- Encoders ---
+
+def _batches(rows: Iterator[Sequence]) -> Iterator[List[Sequence]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == CHUNK_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def csv_chunks(export: Export) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export.columns:
+        writer.writerow(export.columns)
+    for batch in _batches(export.rows):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(export: Export) -> Iterator[str]:
+    columns = export.columns
+    for batch in _batches(export.rows):
+        yield ''.join(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in batch)
+
+
+def gzip_chunks(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    """Gzips a stream of text chunks on the fly (one compressor, no buffering of the whole body)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(dataset: str, fmt: str, gzip: bool = False) -> Iterator:
+    """The encoded export, chunk by chunk. The query only starts once the response is being sent."""
+    export = DATASETS[dataset]()
+    chunks = csv_chunks(export) if fmt == 'csv' else ndjson_chunks(export)
+    yield from (gzip_chunks(chunks) if gzip else chunks)
@@ -1,8 +1,11 @@
-from flask import Blueprint, render_template, flash, redirect, url_for, abort
+from flask import Blueprint, render_template, flash, redirect, url_for, abort, current_app, send_from_directory, request, Response, stream_with_context
 from flask_login import current_user, login_required
 from functools import wraps
+from datetime import datetime
 from agroadvisor.extensions import db
 from agroadvisor.models import Product, User
+from agroadvisor.page_cache import invalidate_pages
+from agroadvisor.profiling import list_profiles, load_profile, profiles_dir
 
 # Tell the blueprint where to find its templates
 admin_bp = Blueprint('admin', __name__, template_folder='../templates/admin')
@@ -27,10 +30,23 @@ def admin_required(f):
 def dashboard():
     """
     Main admin dashboard. Only users with the 'Admin' role can see this.
+    Lists users a page at a time, sorted and filtered on the server
+    (?page=, ?sort=, ?dir=, ?q=, ?role=, ?listings=).
     """
-    # Fetch all users to display them
-    users = User.query.order_by(User.id).all()
-    return render_template('dashboard.html', title='Admin Dashboard', users=users)
+    from .user_listing import user_page, SORTS
+    filters = {
+        'q': request.args.get('q', '').strip(),
+        'role': request.args.get('role', '').strip(),
+        'listings': request.args.get('listings', '').strip(),
+    }
+    sort = request.args.get('sort', 'id')
+    desc = request.args.get('dir') == 'desc'
+    users = user_page(page=request.args.get('page', 1, type=int),
+                      per_page=current_app.config.get('ADMIN_USERS_PER_PAGE', 50),
+                      sort=sort, desc=desc, **filters)
+    return render_template('admin/dashboard.html', title='Admin Dashboard', users=users,
+                           filters=filters, active_filters={k: v for k, v in filters.items() if v},
+                           sort=sort if sort in SORTS else 'id', desc=desc)
 
 @admin_bp.route('/delete_user/<int:user_id>', methods=['POST'])
 @login_required
@@ -52,6 +68,75 @@ def delete_user(user_id):
     
     db.session.delete(user_to_delete)
     db.session.commit()
+    # Their listings are gone from the marketplace
+    invalidate_pages('user deleted')
     
     flash(f'User {user_to_delete.username} and all their products have been deleted.', 'success')
-    return redirect(url_for('admin.dashboard'))
\ No newline at end of file
+    return redirect(url_for('admin.dashboard'))
+
+
+@admin_bp.route('/exports')
+@login_required
+@admin_required
+def exports():
+    """
+    Lists the downloadable exports.
+    """
+    from .exports import DATASETS, FORMATS
+    return render_template('admin/exports.html', title='Exports', datasets=list(DATASETS), formats=list(FORMATS))
+
+@admin_bp.route('/export/<dataset>.<fmt>')
+@login_required
+@admin_required
+def export(dataset, fmt):
+    """
+    Streams users, products or backtest forecasts as CSV or NDJSON (?gzip=1
+    for a .gz download). Rows are read from a database cursor in batches and
+    sent in chunks, so memory stays flat however large the table is.
+    """
+    from .exports import DATASETS, FORMATS, export_stream
+    if dataset not in DATASETS or fmt not in FORMATS:
+        abort(404)
+    gzip = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    filename = f"{dataset}-{datetime.now():%Y%m%d-%H%M%S}.{fmt}" + ('.gz' if gzip else '')
+    response = Response(stream_with_context(export_stream(dataset, fmt, gzip)),
+                        mimetype='application/gzip' if gzip else FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@admin_bp.route('/profiles')
+@login_required
+@admin_required
+def profiles():
+    """
+    Lists stored request profiles, slowest first.
+    """
+    all_profiles = list_profiles(current_app)
+    return render_template('profiles.html', title='Request Profiles', profiles=all_profiles[:100],
+                           enabled=current_app.config.get('PROFILING_ENABLED'))
+
+@admin_bp.route('/profiles/<name>')
+@login_required
+@admin_required
+def profile_detail(name):
+    """
+    Shows the hottest functions (overall and in the ML code) for one profile.
+    """
+    profile = load_profile(current_app, name)
+    if profile is None:
+        abort(404)
+    return render_template('profile_detail.html', title='Request Profile', profile=profile)
+
+@admin_bp.route('/profiles/<name>/raw')
+@login_required
+@admin_required
+def profile_raw(name):
+    """
+    Downloads the raw cProfile output (for snakeviz / pstats).
+    """
+    profile = load_profile(current_app, name)
+    if profile is None or not profile.get('raw'):
+        abort(404)
+    return send_from_directory(profiles_dir(current_app), profile['raw'], as_attachment=True)
@@ -0,0 +1,102 @@
+from typing import List, NamedTuple, Optional
+from sqlalchemy import select, func, exists, or_
+
+from agroadvisor.extensions import db
+from agroadvisor.models import User, Role, Product
+
+# Sort keys accepted from ?sort= and the columns they order by
+USER_SORTS = {
+    'id': User.id,
+    'username': User.username,
+    'email': User.email,
+    'role': Role.name,
+}
+STAT_SORTS = ('products', 'latest')
+SORTS = tuple(USER_SORTS) + STAT_SORTS
+LISTING_FILTERS = ('with', 'without')
+
+
+class UserRow(NamedTuple):
+    id: int
+    username: str
+    email: str
+    role: Optional[str]
+    products: int
+    latest_listing: Optional[object]
+
+
+class UserPage(NamedTuple):
+    rows: List[UserRow]
+    total: int
+    page: int
+    per_page: int
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-self.total // self.per_page))
+
+
+def _filters(q: str = '', role: str = '', listings: str = ''):
+    conditions = []
+    if q:
+        pattern = f"%{q}%"
+        if db.engine.dialect.name == 'sqlite':
+            # SQLite's LIKE is already case-insensitive; ILIKE would wrap both sides in lower()
+            conditions.append(or_(User.username.like(pattern), User.email.like(pattern)))
+        else:
+            conditions.append(or_(User.username.ilike(pattern), User.email.ilike(pattern)))
+    if role:
+        conditions.append(Role.name == role)
+    if listings in LISTING_FILTERS:
+        has_products = exists().where(Product.user_id == User.id)
+        conditions.append(has_products if listings == 'with' else ~has_products)
+    return conditions
+
+
+def user_page(page: int = 1, per_page: int = 50, sort: str = 'id', desc: bool = False,
+              q: str = '', role: str = '', listings: str = '') -> UserPage:
+    """
+    One page of users with their role name, product count and latest listing
+    date, filtered and sorted on the server. The rows come from one grouped
+    query (plus a COUNT for the page links):
+
+    * sorted by a user column, the page of users is picked first and only its
+      products are aggregated, so the cost does not grow with the user table;
+    * sorted by product count / latest listing, every user's products are
+      aggregated (from the (user_id, date_posted) index) and then paged.
+    """
+    sort = sort if sort in SORTS else 'id'
+    conditions = _filters(q, role, listings)
+    page = max(1, page)
+
+    def ordered(column):
+        return column.desc() if desc else column.asc()
+
+    users = select(User.id, User.username, User.email, Role.name.label('role'))\
+        .outerjoin(Role, User.role_id == Role.id).where(*conditions)
+
+    if sort in USER_SORTS:
+        picked = users.order_by(ordered(USER_SORTS[sort]), ordered(User.id))\
+            .limit(per_page).offset((page - 1) * per_page).subquery()
+        products = func.count(Product.id)
+        latest = func.max(Product.date_posted)
+        query = select(picked, products.label('products'), latest.label('latest_listing'))\
+            .outerjoin(Product, Product.user_id == picked.c.id)\
+            .group_by(*picked.c)\
+            .order_by(ordered(picked.c[sort]), ordered(picked.c.id))
+    else:
+        stats = select(Product.user_id, func.count(Product.id).label('products'),
+                       func.max(Product.date_posted).label('latest_listing'))\
+            .group_by(Product.user_id).subquery()
+        products = func.coalesce(stats.c.products, 0)
+        key = products if sort == 'products' else stats.c.latest_listing
+        query = users.add_columns(products.label('products'), stats.c.latest_listing)\
+            .outerjoin(stats, stats.c.user_id == User.id)\
+            .order_by(ordered(key), ordered(User.id))\
+            .limit(per_page).offset((page - 1) * per_page)
+
+    rows = [UserRow(*row) for row in db.session.execute(query)]
+    total = db.session.execute(
+        select(func.count()).select_from(User).outerjoin(Role, User.role_id == Role.id).where(*conditions)
+    ).scalar_one()
+    return UserPage(rows, total, page, per_page)
@@ -0,0 +1,247 @@
+import gzip
+import hashlib
+from functools import wraps
+from flask import Blueprint, request, jsonify, current_app, Response
+from flask_login import current_user
+import math
+
+from agroadvisor.ml_models.utils import log, log_exception, setup_session
+from agroadvisor.farmer.routes import get_weather_data as get_climate_data, prefetch_climate, seasonal_inputs
+
+# Versioned JSON API for partner apps
+api_bp = Blueprint('api', __name__)
+
+# Same ranges as the RecommendationForm
+SOIL_RANGES = {
+    'nitrogen': (0, 200),
+    'phosphorous': (0, 200),
+    'potassium': (0, 200),
+    'ph': (0, 14),
+}
+SEASONS = ('Kharif', 'Rabi', 'Summer', 'Whole Year')
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@api_bp.errorhandler(ApiError)
+def handle_api_error(e):
+    return jsonify(error=e.message), e.status
+
+
+def api_login_required(view):
+    """Like login_required, but answers 401 JSON instead of redirecting to the login page."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify(error='Authentication required.'), 401
+        return view(*args, **kwargs)
+    return wrapped
+
+
+# --- Conditional + compressed responses ---
+
+@api_bp.after_request
+def etag_and_gzip(response: Response):
+    """
+    Adds a strong ETag to every successful JSON response and answers 304 when
+    the client already has it (also for POST: the batch endpoints are pure
+    queries). Bodies over API_GZIP_MIN_BYTES are gzipped when accepted; the
+    gzip representation gets its own tag ('<sha1>-gz'), and either tag
+    revalidates, since both encode the same content.
+    """
+    if response.status_code != 200 or response.mimetype != 'application/json' or response.direct_passthrough:
+        return response
+
+    body = response.get_data()
+    etag = hashlib.sha1(body).hexdigest()
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '') and \
+        len(body) >= current_app.config.get('API_GZIP_MIN_BYTES', 1024)
+    response.set_etag(etag + '-gz' if use_gzip else etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept-Encoding')
+    if request.if_none_match.contains(etag) or request.if_none_match.contains(etag + '-gz'):
+        response.status_code = 304
+        response.set_data(b'')
+        return response
+
+    if use_gzip:
+        response.set_data(gzip.compress(body, compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+# --- Helpers ---
+
+def json_safe(value):
+    """numpy scalars -> Python, NaN -> None (recursively)."""
+    if isinstance(value, dict):
+        return {k: json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(v) for v in value]
+    if type(value).__module__ == 'numpy':
+        # numpy scalar (numpy itself is not imported at worker boot)
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def batch_items():
+    """The request's list of items: a JSON array or {"items": [...]}, within API_MAX_BATCH."""
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('items')
+    if not isinstance(payload, list) or not payload:
+        raise ApiError("Send a JSON array of items (or {\"items\": [...]}).")
+    limit = current_app.config.get('API_MAX_BATCH', 50)
+    if len(payload) > limit:
+        raise ApiError(f"At most {limit} items per request.", 413)
+    if not all(isinstance(item, dict) for item in payload):
+        raise ApiError("Every item must be a JSON object.")
+    return payload
+
+
+def forecast_result(crop, district, session, memo, include_history=False):
+    """One price forecast, computed once per (crop, district) within a batch."""
+    from agroadvisor.ml_models.predictor import run_price_prediction, memoized
+    from agroadvisor.ml_models.charting import downsample_price_history, to_columnar
+    key = ('price', crop.strip().lower(), district.strip().lower())
+    price = memoized(memo, key, run_price_prediction, crop, district, session, memo)
+    if not price:
+        return {'ok': False, 'error': f'No price data or model for {crop} in {district}.'}
+
+    result = {
+        'ok': True,
+        'predicted_price': price['predicted_price'],
+        'market': price['market'],
+        'prediction_date': price['prediction_date'],
+        'model_r2': price['model_r2'],
+    }
+    if include_history and not price['historical_df'].empty:
+        history = downsample_price_history(
+            price['historical_df'][['date', 'modal_price']],
+            max_points=current_app.config.get('CHART_MAX_POINTS', 400),
+            method=current_app.config.get('CHART_DOWNSAMPLE', 'lttb'),
+        )
+        result['history'] = to_columnar(history, ['date', 'modal_price'])
+    return result
+
+
+def parse_profile(item):
+    """Validates one soil profile against the RecommendationForm rules."""
+    profile = {}
+    for field, (low, high) in SOIL_RANGES.items():
+        try:
+            value = float(item[field])
+        except (KeyError, TypeError, ValueError):
+            raise ApiError(f"'{field}' must be a number.")
+        if not low <= value <= high:
+            raise ApiError(f"'{field}' must be between {low} and {high}.")
+        profile[field] = value
+    district = str(item.get('district') or '').strip()
+    if not district:
+        raise ApiError("'district' is required.")
+    season = item.get('season') or 'Whole Year'
+    if season not in SEASONS:
+        raise ApiError(f"'season' must be one of {', '.join(SEASONS)}.")
+    profile.update(district=district, season=season)
+    return profile
+
+
+def district_coords(district, session, memo):
+    """(lat, lon) of a district, geocoded once per batch."""
+    from agroadvisor.ml_models.predictor import geocode_market, memoized
+    return memoized(memo, ('geocode', district.lower()), geocode_market,
+                    market_name=district, district=district, state="India", session=session)
+
+
+def climate_for(district, session, memo):
+    """Seasonal weather summary for a district, fetched once per batch."""
+    from agroadvisor.ml_models.predictor import memoized
+    def fetch():
+        lat, lon = district_coords(district, session, memo)
+        if lat is None or lon is None:
+            return None
+        return get_climate_data(lat, lon, is_forecast=False, session=session, years=5)
+    return memoized(memo, ('climate', district.lower()), fetch)
+
+
+def climate_summary(data):
+    return {k: round(float(data[k]), 2) for k in ('temperature', 'rainfall', 'humidity')}
+
+
+# --- Endpoints ---
+
+@api_bp.route('/forecasts', methods=['POST'])
+@api_login_required
+def forecasts():
+    """
+    Batch price forecasts.
+    Body: [{"crop": "Onion", "district": "Bangalore"}, ...] (or {"items": [...]}).
+    Add "history": true to an item for its downsampled price history.
+    """
+    items = batch_items()
+    for item in items:
+        if not str(item.get('crop') or '').strip() or not str(item.get('district') or '').strip():
+            raise ApiError("Every item needs a 'crop' and a 'district'.")
+
+    session = setup_session()
+    memo = {}
+    results = []
+    for item in items:
+        crop, district = str(item['crop']).strip(), str(item['district']).strip()
+        try:
+            result = forecast_result(crop, district, session, memo, bool(item.get('history')))
+        except Exception as e:
+            log_exception(f"[API] Forecast failed for {crop}/{district}", e)
+            result = {'ok': False, 'error': 'Forecast failed.'}
+        results.append({'crop': crop, 'district': district, **result})
+
+    log(f"[API] {current_user.email}: {len(items)} forecasts, "
+        f"{sum(1 for k in memo if k[0] == 'price')} computed")
+    return jsonify(json_safe({'results': results}))
+
+
+@api_bp.route('/recommendations', methods=['POST'])
+@api_login_required
+def recommendations():
+    """
+    Batch crop recommendations with price forecasts.
+    Body: [{"nitrogen", "phosphorous", "potassium", "ph", "district", "season"}, ...].
+    Weather is fetched once per district and prices once per (crop, district).
+    Without the joblib models, crops are ranked by the rule-based engine.
+    """
+    from agroadvisor.ml_models import recommender_models
+    from agroadvisor.ml_models.recommender import get_recommendations
+    from agroadvisor.ml_models.predictor import memoized
+    profiles = [parse_profile(item) for item in batch_items()]
+    models = recommender_models()
+
+    session = setup_session()
+    memo = {}
+    # Every district's climate in as few multi-location calls as possible
+    coords = [district_coords(d, session, memo) for d in dict.fromkeys(p['district'] for p in profiles)]
+    prefetch_climate([c for c in coords if c[0] is not None and c[1] is not None], session)
+    results = []
+    for profile in profiles:
+        weather_info = climate_for(profile['district'], session, memo)
+        if not weather_info or 'seasonal_summary' not in weather_info:
+            results.append({**profile, 'ok': False, 'error': f"No weather data for {profile['district']}."})
+            continue
+
+        data = {**profile, **seasonal_inputs(weather_info, profile['season'])}
+        crops = memoized(memo, ('recommend',) + tuple(sorted(data.items())),
+                         get_recommendations, data, *models) or []
+        ranked = []
+        for crop_data in crops:
+            crop_name = crop_data['Crop_Name']
+            ranked.append({**crop_data, **forecast_result(crop_name, profile['district'], session, memo)})
+        results.append({**profile, 'ok': True, 'climate': climate_summary(data), 'crops': ranked})
+
+    log(f"[API] {current_user.email}: {len(profiles)} recommendation profiles")
+    return jsonify(json_safe({'results': results}))
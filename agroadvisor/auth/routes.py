@@ -17,8 +17,8 @@ def register():
     form = RegistrationForm()
     if form.validate_on_submit():
         # Get the default "Farmer" role from the database
-        farmer_role = Role.query.filter_by(name='Farmer').first()
-        if not farmer_role:
+        farmer_role_id = Role.id_for('Farmer')
+        if not farmer_role_id:
             # This is a fallback in case roles weren't created
             flash('Default user role not found. Please contact admin.', 'danger')
             return redirect(url_for('auth.register'))
@@ -27,7 +27,7 @@ def register():
         user = User(
             username=form.username.data, 
             email=form.email.data,
-            role=farmer_role  # Assign default role
+            role_id=farmer_role_id  # Assign default role
         )
         user.set_password(form.password.data)
         
@@ -0,0 +1,138 @@
+import click
+
+
+def register_commands(app):
+    """Registers the project's `flask ...` CLI commands."""
+
+    @app.cli.command('init-db')
+    def init_db():
+        """Creates missing tables and the default roles (safe to re-run)."""
+        from agroadvisor.database import init_database
+        added = init_database()
+        click.echo(f"Database ready (added roles: {', '.join(added) or 'none'}).")
+
+    @app.cli.command('seed-roles')
+    def seed_roles_command():
+        """Adds the default Farmer/Admin roles if they are missing."""
+        from agroadvisor.database import seed_roles
+        added = seed_roles()
+        click.echo(f"Added roles: {', '.join(added)}" if added else "All roles present.")
+
+    @app.cli.command('price-memory-report')
+    @click.option('--raw', is_flag=True, help='Also measure a plain pd.read_csv of each file.')
+    def price_memory_report(raw):
+        """Loads every commodity in the compact format and reports its memory use."""
+        from agroadvisor.ml_models.dataset import memory_report
+        report = memory_report(compare_raw=raw)
+        click.echo(report.to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+
+    @app.cli.command('ingest-prices')
+    @click.argument('exports', nargs=-1, type=click.Path(exists=True, dir_okay=False))
+    @click.option('--commodity', help='Commodity of the export rows (default: their Commodity column).')
+    @click.option('--bootstrap', is_flag=True, help='Seed the store from data/ for commodities without one.')
+    def ingest_prices(exports, commodity, bootstrap):
+        """Appends new Agmarknet exports to the deduplicated price store."""
+        import time
+        from agroadvisor.ml_models.ingest import ingest_export, bootstrap_all
+        # Registers its ingest hook: aggregates are refreshed with the store
+        import agroadvisor.ml_models.aggregates  # noqa: F401
+        started = time.perf_counter()
+        if bootstrap:
+            seeded = bootstrap_all()
+            click.echo(f"Seeded {len(seeded)} commodities from data/.")
+        for path in exports:
+            changes = ingest_export(path, commodity)
+            for key, parts in changes.items():
+                added = sum(p['rows_added'] for p in parts.values())
+                click.echo(f"{path}: {key}: +{added} rows in {len(parts)} district(s)")
+            if not changes:
+                click.echo(f"{path}: nothing new")
+        click.echo(f"Done in {time.perf_counter() - started:.2f}s")
+
+    @app.cli.command('backtest')
+    @click.option('--commodity', 'commodities', multiple=True, help='Commodity to test (repeatable; default: all).')
+    @click.option('--horizons', default='7,30,60,90', show_default=True, help='Comma-separated forecast horizons in days.')
+    @click.option('--origins', default=6, show_default=True, help='Rolling forecast origins per market.')
+    @click.option('--workers', type=int, help='Worker processes (default: half the CPUs).')
+    @click.option('--max-markets', type=int, help='Only test the markets with the most history.')
+    @click.option('--backend', 'backends', multiple=True,
+                  help='Model backend to compare (repeatable, or "all"); several also pick the default per data size.')
+    def backtest(commodities, horizons, origins, workers, max_markets, backends):
+        """Walk-forward backtest of the price model across markets and horizons."""
+        from agroadvisor.ml_models.backtest import run_backtest, horizon_summary, BACKTEST_DIR
+        from agroadvisor.ml_models.backends import BACKENDS
+        if 'all' in backends:
+            backends = list(BACKENDS)
+        leaderboard = run_backtest(
+            commodities=list(commodities) or None,
+            horizons=tuple(int(h) for h in horizons.split(',') if h.strip()),
+            n_origins=origins, workers=workers, max_markets=max_markets,
+            backends=list(backends) or None,
+        )
+        if leaderboard.empty:
+            click.echo("No markets could be backtested.")
+            return
+        click.echo(horizon_summary(leaderboard).to_string(index=False, float_format=lambda v: f"{v:,.3f}"))
+        click.echo(f"Leaderboard written to {BACKTEST_DIR}/leaderboard.csv")
+
+    @app.cli.command('warm-features')
+    @click.option('--commodity', 'commodities', multiple=True, help='Commodity to warm (repeatable; default: all).')
+    @click.option('--max-markets', type=int, help='Only warm the markets with the most history.')
+    def warm_features(commodities, max_markets):
+        """Brings the feature store up to date, fetching missing weather in multi-location calls."""
+        import time
+        from agroadvisor.ml_models.backtest import list_markets, warm_feature_store
+        from agroadvisor.ml_models.utils import setup_session
+        markets = list_markets(list(commodities) or None)
+        if max_markets:
+            markets = sorted(markets, key=lambda m: m["rows"], reverse=True)[:max_markets]
+        started = time.perf_counter()
+        ready = warm_feature_store(markets, setup_session())
+        click.echo(f"{len(ready)} of {len(markets)} markets ready in {time.perf_counter() - started:.1f}s.")
+
+    @app.cli.command('build-yield-table')
+    def build_yield_table_command():
+        """Scores every district x crop x season with the yield model into instance/yield_table.npz."""
+        import joblib
+        import pandas as pd
+        from agroadvisor.ml_models.recommender import YIELD_MODEL_FILE, YIELD_CSV
+        from agroadvisor.ml_models.yield_table import build_yield_table, model_version
+        yield_model = joblib.load(YIELD_MODEL_FILE)
+        table = build_yield_table(yield_model, pd.read_csv(YIELD_CSV), model_version(YIELD_MODEL_FILE))
+        click.echo(f"Stored {len(table)} yield scores. Web workers now skip loading {YIELD_MODEL_FILE}.")
+
+    @app.cli.command('build-yield-stats')
+    def build_yield_stats_command():
+        """Rebuilds instance/yield_stats.pkl from the crop-wise yield CSV."""
+        import pandas as pd
+        from agroadvisor.ml_models.recommender import YIELD_CSV
+        from agroadvisor.ml_models.yield_stats import build_yield_stats, csv_version
+        stats = build_yield_stats(pd.read_csv(YIELD_CSV), csv_version(YIELD_CSV))
+        click.echo(f"Yield statistics for {len(stats.levels['crop_district_season'])} crop/district/season groups.")
+
+    @app.cli.command('import-listings')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--email', required=True, help='Email of the user the listings belong to.')
+    @click.option('--dry-run', is_flag=True, help='Only validate the file.')
+    def import_listings_command(path, email, dry_run):
+        """Bulk-imports marketplace listings from a CSV or JSON file."""
+        import os
+        from agroadvisor.models import User
+        from agroadvisor.market.bulk_import import import_listings, ListingImportError
+        from agroadvisor.page_cache import invalidate_pages
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            raise click.ClickException(f"No user with email {email}.")
+        try:
+            with open(path, 'rb') as f:
+                result = import_listings(f, os.path.basename(path), user.id,
+                                         max_rows=app.config['IMPORT_MAX_ROWS'], dry_run=dry_run,
+                                         batch_size=app.config['IMPORT_BATCH_SIZE'])
+        except ListingImportError as e:
+            raise click.ClickException(str(e))
+        if result.inserted:
+            invalidate_pages('products imported')
+        for error in result.errors[:50]:
+            click.echo(f"Row {error['row']}: {error['field']} {error['value']!r}: {error['message']}")
+        click.echo(f"{result.total} rows, {result.inserted} inserted, {result.failed_rows} invalid "
+                   f"in {result.seconds:.2f}s.")
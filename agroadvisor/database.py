@@ -0,0 +1,73 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from flask import current_app
+
+from .extensions import db
+
+DEFAULT_ROLES = ('Farmer', 'Admin')
+
+
+def engine_options(app) -> dict:
+    """
+    Engine options for the configured database: SQLite waits on locks instead
+    of failing; server databases get a sized, pre-pinged connection pool.
+    Options set explicitly in SQLALCHEMY_ENGINE_OPTIONS win.
+    """
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    config = app.config
+    if url.get_backend_name() == 'sqlite':
+        options = {'connect_args': {'timeout': config['SQLITE_PRAGMAS'].get('busy_timeout', 5000) / 1000}}
+    else:
+        options = {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+        }
+    return {**options, **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+
+
+def configure_database(app):
+    """Call before db.init_app: fills in the engine options for DATABASE_TUNING."""
+    if app.config.get('DATABASE_TUNING'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app)
+
+
+def apply_sqlite_pragmas(app):
+    """Call after db.init_app: runs SQLITE_PRAGMAS on every new SQLite connection."""
+    if not app.config.get('DATABASE_TUNING'):
+        return
+    pragmas = app.config['SQLITE_PRAGMAS']
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            # journal_mode is ignored (and stays 'memory') for in-memory databases
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def seed_roles():
+    """Adds the DEFAULT_ROLES that are missing. Returns their names."""
+    from .models import Role, ROLE_IDS_KEY
+    existing = {name for (name,) in db.session.query(Role.name)}
+    missing = [name for name in DEFAULT_ROLES if name not in existing]
+    db.session.add_all(Role(name=name) for name in missing)
+    db.session.commit()
+    current_app.extensions.pop(ROLE_IDS_KEY, None)
+    return missing
+
+
+def init_database():
+    """
+    Creates missing tables and the default roles. Idempotent; run once per
+    database with `flask init-db` (needs an app context), not on every boot.
+    """
+    db.create_all()
+    return seed_roles()
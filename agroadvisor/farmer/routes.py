@@ -1,17 +1,17 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app
 from flask_login import login_required, current_user
 from .forms import RecommendationForm, PricePredictionForm
-import pandas as pd
+import math
 import os
 from datetime import datetime, timedelta
-import numpy as np
 import time 
 import requests 
 
-# Import our ML functions and pre-loaded models
-from agroadvisor.ml_models import CROP_MODEL, YIELD_MODEL, AVG_YIELD_LOOKUP
-from agroadvisor.ml_models.recommender import get_recommendations
-from agroadvisor.ml_models.predictor import run_price_prediction, geocode_market
+# The ML stack (pandas, sklearn, the models) is imported inside the views
+# that use it, so worker boot does not pay for it
+from agroadvisor.ml_models.weather_cache import snap, shared_fetch, cached, prime, FORECAST_TTL, ARCHIVE_TTL
+from agroadvisor.ml_models.weather_client import WeatherQuery, fetch_one, fetch_batch
+from agroadvisor.ml_models.current_weather import remember_location, dashboard_weather
 from agroadvisor.ml_models.utils import log_exception, setup_session, log
 
 # Tell the blueprint where to find its templates
@@ -23,79 +23,78 @@ def get_weather_data(lat, lon, start_date=None, end_date=None, is_forecast=False
     """
     Fetch weather data (historical or forecast) for a given location using Open-Meteo API.
     If is_forecast=False, it gets multi-year historical data in a *single call*.
+    Results are shared per snapped location within a request and across requests.
     """
+    lat, lon = snap(lat, lon)
+    key, ttl = _climate_key(lat, lon, is_forecast, years)
+    return shared_fetch(key, ttl, lambda: _fetch_weather_summary(lat, lon, is_forecast, session, years))
+
+
+def _climate_key(lat, lon, is_forecast, years):
+    """Shared-cache key and TTL for snapped coordinates."""
+    if is_forecast:
+        return ("climate-forecast", lat, lon), FORECAST_TTL
+    return ("climate", lat, lon, years, datetime.utcnow().date()), ARCHIVE_TTL
+
+
+def climate_query(lat, lon, is_forecast, years):
+    """The Open-Meteo request behind get_weather_data: 7 days ahead, or `years` of ERA5 history."""
+    today = datetime.utcnow().date()
+    daily_vars = (
+        "weathercode",
+        "temperature_2m_max",
+        "temperature_2m_min",
+        "precipitation_sum",
+        "relativehumidity_2m_mean" if is_forecast else "relative_humidity_2m_mean",
+    )
+    if is_forecast:
+        # Forecast = single call
+        start_dt, end_dt = today, today + timedelta(days=7)
+        extra = ()
+    else:
+        # Historical multi-year aggregation in ONE CALL
+        end_dt = today - timedelta(days=3) # End date is ~yesterday
+        start_dt = today - timedelta(days=(years * 365)) # Start date is 5 years ago
+        extra = (("models", "era5"),) # Use a consistent historical model
+    return WeatherQuery(lat, lon, forecast=is_forecast, start_date=start_dt.strftime("%Y-%m-%d"),
+                        end_date=end_dt.strftime("%Y-%m-%d"), daily=daily_vars, extra=extra)
+
+
+def prefetch_climate(locations, session, is_forecast=False, years=5):
+    """
+    Fetches get_weather_data() results for many (lat, lon) at once, in
+    multi-location calls, into the shared cache. Returns how many were fetched.
+    """
+    wanted = {}
+    for lat, lon in locations:
+        lat, lon = snap(lat, lon)
+        key, ttl = _climate_key(lat, lon, is_forecast, years)
+        if key not in wanted and cached(key) is None:
+            wanted[key] = (climate_query(lat, lon, is_forecast, years), ttl)
+    if not wanted:
+        return 0
+    payloads = fetch_batch([query for query, _ in wanted.values()], session)
+    for (key, (query, ttl)), payload in zip(wanted.items(), payloads):
+        prime(key, ttl, summarise_weather(payload))
+    return len(wanted)
+
+
+def _fetch_weather_summary(lat, lon, is_forecast, session, years):
+    query = climate_query(lat, lon, is_forecast, years)
+    log(f"[Weather] Fetching {'forecast' if is_forecast else 'archive'} for {lat},{lon} "
+        f"({query.start_date} to {query.end_date})")
+    return summarise_weather(fetch_one(query, session))
+
+
+def summarise_weather(data):
+    """Seasonal averages (and the daily rows) from an Open-Meteo daily payload; None without data."""
+    if not data or not data.get("daily"):
+        log("[Weather] No valid weather data found.")
+        return None
     try:
+        import numpy as np
         import pandas as pd
-        base_url = (
-            "https://api.open-meteo.com/v1/forecast"
-            if is_forecast
-            else "https://archive-api.open-meteo.com/v1/archive"
-        )
-
-        today = datetime.utcnow().date()
-        daily_vars = [
-            "weathercode",
-            "temperature_2m_max",
-            "temperature_2m_min",
-            "precipitation_sum",
-        ]
-        if not is_forecast:
-            daily_vars.append("relative_humidity_2m_mean")
-        else:
-            daily_vars.append("relativehumidity_2m_mean")
-
-        all_dataframes = []
-
-        if is_forecast:
-            # Forecast = single call
-            end_dt = today + timedelta(days=7)
-            start_dt = today
-            params = {
-                "latitude": lat,
-                "longitude": lon,
-                "daily": daily_vars,
-                "timezone": "auto",
-                "start_date": start_dt.strftime("%Y-%m-%d"),
-                "end_date": end_dt.strftime("%Y-%m-%d"),
-            }
-            log(f"[Weather] Fetching forecast for {lat},{lon} ({start_dt} to {end_dt})")
-            res = session.get(base_url, params=params, timeout=30)
-            res.raise_for_status()
-            data = res.json()
-            if "daily" not in data:
-                return None
-            df = pd.DataFrame(data["daily"])
-            all_dataframes.append(df)
-        else:
-            # --- THIS IS THE NEW, EFFICIENT LOGIC ---
-            # Historical multi-year aggregation in ONE CALL
-            end_dt = today - timedelta(days=3) # End date is ~yesterday
-            start_dt = today - timedelta(days=(years * 365)) # Start date is 5 years ago
-            params = {
-                "latitude": lat,
-                "longitude": lon,
-                "daily": daily_vars,
-                "timezone": "auto",
-                "start_date": start_dt.strftime("%Y-%m-%d"),
-                "end_date": end_dt.strftime("%Y-%m-%d"),
-                "models": "era5", # Use a consistent historical model
-            }
-            log(f"[Weather] Fetching *single* archive for {start_dt} to {end_dt}")
-            res = session.get(base_url, params=params, timeout=30)
-            res.raise_for_status() # This will catch the 429 error if it happens
-            data = res.json()
-            if "daily" in data and data["daily"]:
-                df = pd.DataFrame(data["daily"])
-                all_dataframes.append(df)
-            else:
-                log(f"[Weather] No data in single archive call.")
-            # --- END OF NEW LOGIC ---
-
-        if not all_dataframes:
-            log("[Weather] No valid weather data found.")
-            return None
-
-        weather_df = pd.concat(all_dataframes, ignore_index=True)
+        weather_df = pd.DataFrame(data["daily"])
         weather_df["date"] = pd.to_datetime(weather_df["time"])
         weather_df.sort_values("date", inplace=True)
         
@@ -158,22 +157,49 @@ def get_weather_data(lat, lon, start_date=None, end_date=None, is_forecast=False
         }
 
     except Exception as e:
-        log_exception("[Weather] Error fetching data", e)
+        log_exception("[Weather] Error summarising weather data", e)
         return None
 
 
 
+def seasonal_inputs(weather_info, season):
+    """
+    Temperature, rainfall and humidity for the recommender from a
+    get_weather_data() seasonal summary, with defaults for missing values.
+    """
+    seasonal_stats = weather_info["seasonal_summary"]
+    # Get the stats for the season the farmer *selected*
+    current_stats = seasonal_stats.get(season, seasonal_stats["Whole Year"])
+    inputs = {
+        'temperature': current_stats["avg_temp"],
+        'rainfall': current_stats["rainfall"],
+        'humidity': current_stats["humidity"],
+    }
+    # Handle potential NaN values from calculations
+    if math.isnan(inputs['temperature']): inputs['temperature'] = 25.0
+    if math.isnan(inputs['rainfall']): inputs['rainfall'] = 1000.0
+    if math.isnan(inputs['humidity']): inputs['humidity'] = 60.0
+    return inputs
+
+
 # ---------------- ROUTES ---------------- #
 
 @farmer_bp.route('/dashboard')
 @login_required
 def dashboard():
-    return render_template('dashboard.html', title='Your Dashboard')
+    # Served from memory: never waits on Open-Meteo
+    location, weather = dashboard_weather()
+    return render_template('dashboard.html', title='Your Dashboard', location=location, weather=weather)
 
 
 @farmer_bp.route('/recommend', methods=['GET', 'POST'])
 @login_required
 def recommend():
+    import pandas as pd
+    from agroadvisor.ml_models import recommender_models
+    from agroadvisor.ml_models.recommender import get_recommendations
+    from agroadvisor.ml_models.predictor import run_price_prediction, geocode_market
+
     form = RecommendationForm()
     results = None
     session = setup_session() # Use one session for all API calls
@@ -204,11 +230,8 @@ def recommend():
 
 
     if form.validate_on_submit():
-        if not CROP_MODEL or not YIELD_MODEL:
-            log("Error: Recommender models not loaded.")
-            flash('Server is busy, models are not loaded. Please try again later.', 'danger')
-            return redirect(url_for('farmer.recommend'))
-
+        # Without the joblib models, get_recommendations falls back to the
+        # rule-based suitability engine
         try:
             data = form.data
             district_name = data['district']
@@ -226,6 +249,7 @@ def recommend():
             if lat is None or lon is None:
                 flash(f'Could not find location data for "{district_name}".', 'danger')
                 return render_template('recommend.html', title='Crop Recommendation', form=form)
+            remember_location(district_name, lat, lon)
 
             # --- Weather Fetch (Past 5 years + Seasonal Analysis) ---
             weather_info = get_weather_data(lat, lon, is_forecast=False, session=session, years=5)
@@ -234,22 +258,11 @@ def recommend():
                 flash(f'Could not fetch weather data for "{district_name}".', 'danger')
                 return render_template('recommend.html', title='Crop Recommendation', form=form)
             
-            seasonal_stats = weather_info["seasonal_summary"]
-
-            # Get the stats for the season the farmer *selected*
-            current_stats = seasonal_stats.get(selected_season, seasonal_stats["Whole Year"])
             log(f"Using stats for selected season: {selected_season}")
 
             try:
                 # Use the pre-calculated seasonal stats
-                data['temperature'] = current_stats["avg_temp"]
-                data['rainfall'] = current_stats["rainfall"]
-                data['humidity'] = current_stats["humidity"]
-
-                # Handle potential NaN values from calculations
-                if np.isnan(data['temperature']): data['temperature'] = 25.0
-                if np.isnan(data['rainfall']): data['rainfall'] = 1000.0
-                if np.isnan(data['humidity']): data['humidity'] = 60.0
+                data.update(seasonal_inputs(weather_info, selected_season))
 
                 log(f"Final Weather Inputs -> Temp={data['temperature']:.2f}, Rainfall={data['rainfall']:.2f}, Humidity={data['humidity']:.2f}")
 
@@ -259,7 +272,7 @@ def recommend():
                 return render_template('recommend.html', title='Crop Recommendation', form=form)
 
             # --- Crop recommendations ---
-            top_5_crops = get_recommendations(data, CROP_MODEL, YIELD_MODEL, AVG_YIELD_LOOKUP)
+            top_5_crops = get_recommendations(data, *recommender_models())
             if not top_5_crops:
                 flash('No crop recommendations found.', 'warning')
                 return render_template('recommend.html', title='Recommendation', form=form)
@@ -294,6 +307,10 @@ def recommend():
 @farmer_bp.route('/predict', methods=['GET', 'POST'])
 @login_required
 def predict():
+    import pandas as pd
+    from agroadvisor.ml_models.predictor import run_price_prediction
+    from agroadvisor.ml_models.charting import downsample_price_history, chart_json
+
     form = PricePredictionForm()
     result = None
     historical_data_json = None # For the graph
@@ -338,21 +355,19 @@ def predict():
                 # --- THIS IS THE NEW CODE TO CREATE THE GRAPH DATA ---
                 
                 # 1. Process Historical Data
+                # Downsampled to a fixed point budget and encoded column-wise,
+                # so the inlined payload stays small however long the history is.
                 if 'historical_df' in price_result and not price_result['historical_df'].empty:
-                    hist_df = price_result['historical_df'].copy()
-                    # Ensure 'date' column exists and is a string
-                    hist_df['date'] = pd.to_datetime(hist_df['date']).dt.strftime('%Y-%m-%d')
-                    # Select only the columns we need
-                    hist_df = hist_df[['date', 'modal_price']]
-                    historical_data_json = hist_df.to_json(orient='records')
+                    hist_df = downsample_price_history(
+                        price_result['historical_df'][['date', 'modal_price']],
+                        max_points=current_app.config.get('CHART_MAX_POINTS', 400),
+                        method=current_app.config.get('CHART_DOWNSAMPLE', 'lttb')
+                    )
+                    historical_data_json = chart_json(hist_df, ['date', 'modal_price', 'open', 'high', 'low', 'close'])
 
                 # 2. Process Forecast Data
                 if 'forecast_df' in price_result and not price_result['forecast_df'].empty:
-                    fcst_df = price_result['forecast_df'].copy()
-                    fcst_df['date'] = pd.to_datetime(fcst_df['date']).dt.strftime('%Y-%m-%d')
-                    # Select only the columns we need
-                    fcst_df = fcst_df[['date', 'modal_price', 'predicted_price']]
-                    forecast_data_json = fcst_df.to_json(orient='records')
+                    forecast_data_json = chart_json(price_result['forecast_df'], ['date', 'modal_price', 'predicted_price'])
                 # --- END OF NEW GRAPH CODE ---
 
             else:
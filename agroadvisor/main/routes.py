@@ -1,9 +1,11 @@
 from flask import Blueprint, render_template
+from agroadvisor.page_cache import cached_page
 
 main_bp = Blueprint('main', __name__, template_folder='../templates/main')
 
 @main_bp.route('/')
 @main_bp.route('/index')
+@cached_page
 def index():
     """Serves the homepage."""
     return render_template('index.html', title='Home')
@@ -0,0 +1,202 @@
+import io
+import os
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert
+from wtforms.validators import DataRequired, Length, NumberRange
+
+from agroadvisor.extensions import db
+from agroadvisor.models import Product
+from agroadvisor.ml_models.utils import log, log_exception
+from .forms import ProductForm
+
+# --- Configuration ---
+# ProductForm fields, in form order (errors are reported in this order)
+FIELDS = ('name', 'price', 'quantity', 'description', 'contact_phone')
+NUMBER_FIELDS = ('price',)
+TEXT_FIELDS = tuple(f for f in FIELDS if f not in NUMBER_FIELDS)
+# Header spellings accepted for each field (case and spaces are ignored)
+ALIASES = {'product': 'name', 'product_name': 'name', 'price_(rs.)': 'price', 'phone': 'contact_phone'}
+# Rows per executemany INSERT (and per transaction)
+BATCH_SIZE = 1000
+
+
+class ListingImportError(ValueError):
+    """The upload as a whole cannot be imported (format, columns, size)."""
+
+
+class ImportResult(NamedTuple):
+    total: int
+    inserted: int
+    errors: List[Dict]       # {'row', 'field', 'value', 'message'}, row is 1-based
+    seconds: float
+
+    @property
+    def failed_rows(self) -> int:
+        return len({e['row'] for e in self.errors})
+
+
+# --- Rules (read from ProductForm, so the two never drift apart) ---
+
+def form_rules() -> Dict[str, Dict]:
+    """Per field: required, min/max length, min/max value and their messages, from ProductForm."""
+    rules = {}
+    for field in FIELDS:
+        rule = {}
+        for validator in getattr(ProductForm, field).kwargs.get('validators', []):
+            if isinstance(validator, DataRequired):
+                rule['required'] = validator.message or 'This field is required.'
+            elif isinstance(validator, Length):
+                rule['length'] = (validator.min, validator.max, validator.message)
+            elif isinstance(validator, NumberRange):
+                rule['range'] = (validator.min, validator.max, validator.message)
+        rules[field] = rule
+    return rules
+
+
+def _length_message(low, high, message):
+    if message:
+        return message
+    if low != -1 and high != -1:
+        return f"Field must be between {low} and {high} characters long."
+    if high != -1:
+        return f"Field cannot be longer than {high} characters."
+    return f"Field must be at least {low} characters long."
+
+
+def _range_message(low, high, message):
+    if message:
+        return message
+    if low is not None and high is not None:
+        return f"Number must be between {low} and {high}."
+    if high is not None:
+        return f"Number must be at most {high}."
+    return f"Number must be at least {low}."
+
+
+# --- Reading ---
+
+def read_listings(stream, filename: str, max_rows: int) -> pd.DataFrame:
+    """A .csv or .json upload as a frame of string columns named after ProductForm fields."""
+    ext = os.path.splitext(filename or '')[1].lower()
+    raw = stream.read()
+    try:
+        if ext == '.csv':
+            df = pd.read_csv(io.BytesIO(raw), dtype=str, keep_default_na=False, skipinitialspace=True)
+        elif ext == '.json':
+            data = json.loads(raw)
+            if isinstance(data, dict):
+                data = data.get('listings', data.get('products'))
+            if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+                raise ListingImportError("JSON must be a list of listing objects (or {\"listings\": [...]}).")
+            df = pd.DataFrame.from_records(data)
+        else:
+            raise ListingImportError("Upload a .csv or .json file.")
+    except ListingImportError:
+        raise
+    except (ValueError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise ListingImportError(f"Could not read {filename}: {e}")
+
+    df.columns = [ALIASES.get(c, c) for c in (str(c).strip().lower().replace(' ', '_') for c in df.columns)]
+    missing = [f for f, rule in form_rules().items() if rule.get('required') and f not in df.columns]
+    if missing:
+        raise ListingImportError(f"Missing column(s): {', '.join(missing)}.")
+    if len(df) > max_rows:
+        raise ListingImportError(f"{len(df)} rows is more than the limit of {max_rows} per upload.")
+    for field in FIELDS:
+        if field not in df.columns:
+            df[field] = ''
+    return df[list(FIELDS)]
+
+
+# --- Validation ---
+
+def validate_listings(df: pd.DataFrame):
+    """
+    Applies the ProductForm rules to every row at once. Returns (valid rows as
+    Product column dicts, per-row errors). Blank optional fields are stored as
+    NULL instead of failing their length rule.
+    """
+    rules = form_rules()
+    n = len(df)
+    failed = np.zeros(n, dtype=bool)
+    problems = []  # (mask, field, message)
+    values = {}
+
+    for field in TEXT_FIELDS:
+        text = df[field].astype('string').fillna('').str.strip()
+        lengths = text.str.len().to_numpy(dtype=int)
+        blank = lengths == 0
+        rule = rules[field]
+        if 'required' in rule:
+            problems.append((blank, field, rule['required']))
+        if 'length' in rule:
+            low, high, message = rule['length']
+            bad = ((lengths < low) if low != -1 else False) | ((lengths > high) if high != -1 else False)
+            problems.append((bad & ~blank, field, _length_message(low, high, message)))
+        values[field] = text.astype(object).where(~blank, None)
+
+    for field in NUMBER_FIELDS:
+        text = df[field].astype('string').fillna('').str.strip()
+        blank = (text == '').to_numpy()
+        number = pd.to_numeric(text.mask(text == ''), errors='coerce').to_numpy(dtype=float)
+        not_number = np.isnan(number) & ~blank
+        rule = rules[field]
+        problems.append((not_number, field, 'Not a valid float value.'))
+        if 'required' in rule:
+            # DataRequired rejects 0 as well as blanks
+            problems.append((blank | (number == 0), field, rule['required']))
+        if 'range' in rule:
+            low, high, message = rule['range']
+            with np.errstate(invalid='ignore'):
+                bad = ((number < low) if low is not None else False) | ((number > high) if high is not None else False)
+            problems.append((bad & ~np.isnan(number), field, _range_message(low, high, message)))
+        values[field] = number
+
+    errors = []
+    for mask, field, message in problems:
+        rows = np.flatnonzero(mask)
+        failed[rows] = True
+        column = df[field].to_numpy()
+        errors.extend({'row': int(i) + 1, 'field': field, 'value': str(column[i])[:60], 'message': message}
+                      for i in rows)
+    errors.sort(key=lambda e: (e['row'], FIELDS.index(e['field'])))
+
+    records = pd.DataFrame(values)[~failed].to_dict('records')
+    return records, errors
+
+
+# --- Inserting ---
+
+def insert_listings(records: List[Dict], user_id: int, batch_size: int = BATCH_SIZE) -> int:
+    """Bulk-inserts the listings for `user_id`, one executemany and commit per batch. Returns rows inserted."""
+    posted = datetime.utcnow()
+    inserted = 0
+    for start in range(0, len(records), batch_size):
+        batch = [{**r, 'user_id': user_id, 'date_posted': posted} for r in records[start:start + batch_size]]
+        try:
+            db.session.execute(insert(Product), batch)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            log_exception(f"[Import] Batch at row {start + 1} failed after {inserted} rows", e)
+            raise
+        inserted += len(batch)
+    return inserted
+
+
+def import_listings(stream, filename: str, user_id: int, max_rows: int,
+                    dry_run: bool = False, batch_size: int = BATCH_SIZE) -> ImportResult:
+    """Reads, validates and (unless dry_run) inserts an upload. Invalid rows are skipped and reported."""
+    started = time.perf_counter()
+    df = read_listings(stream, filename, max_rows)
+    records, errors = validate_listings(df)
+    inserted = 0 if dry_run else insert_listings(records, user_id, batch_size)
+    result = ImportResult(len(df), inserted, errors, time.perf_counter() - started)
+    log(f"[Import] {filename}: {result.total} rows, {inserted} inserted, {result.failed_rows} invalid"
+        f"{' (dry run)' if dry_run else ''} in {result.seconds:.2f}s")
+    return result
@@ -1,5 +1,6 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, TextAreaField, FloatField, SubmitField
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import StringField, TextAreaField, FloatField, BooleanField, SubmitField
 from wtforms.validators import DataRequired, Length, NumberRange
 
 class ProductForm(FlaskForm):
@@ -21,4 +22,16 @@ class ProductForm(FlaskForm):
     contact_phone = StringField('Contact Phone (Optional)',
                                 validators=[Length(min=10, max=20)])
     
-    submit = SubmitField('List Product')
\ No newline at end of file
+    submit = SubmitField('List Product')
+
+class ProductImportForm(FlaskForm):
+    """
+    Form for uploading many listings at once as CSV or JSON
+    (columns: name, price, quantity, description, contact_phone).
+    """
+    listings = FileField('Listings File (.csv or .json)',
+                         validators=[FileRequired(), FileAllowed(['csv', 'json'], 'Upload a .csv or .json file.')])
+
+    dry_run = BooleanField('Only validate (do not list anything yet)')
+
+    submit = SubmitField('Import Listings')
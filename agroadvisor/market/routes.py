@@ -1,25 +1,66 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
+from datetime import datetime
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, jsonify, current_app
 from flask_login import login_required, current_user
+from sqlalchemy import and_, or_
 from agroadvisor.extensions import db
 from agroadvisor.models import Product, User  # Make sure User and Product are imported
-from .forms import ProductForm
+from agroadvisor.page_cache import cached_page, cached_fragment, invalidate_pages
+from agroadvisor.ml_models.utils import log_exception
+from .forms import ProductForm, ProductImportForm
 
 # Tell the blueprint where to find its templates
 market_bp = Blueprint('market', __name__, template_folder='../templates/market')
 
+# Marketplace pages are keyset-paginated on (date_posted, id): ?cursor= is the
+# last listing of the previous page, so deep pages cost the same as the first.
+CURSOR_FORMAT = '%Y%m%d%H%M%S%f'
+
+
+def encode_cursor(product):
+    return f"{product.date_posted.strftime(CURSOR_FORMAT)}-{product.id}"
+
+
+def decode_cursor(cursor):
+    """(date_posted, id) from a cursor, or None if it is malformed."""
+    try:
+        posted, product_id = cursor.split('-', 1)
+        return datetime.strptime(posted, CURSOR_FORMAT), int(product_id)
+    except ValueError:
+        return None
+
+
+def marketplace_page(cursor=None):
+    """One page of listings (newest first) and the cursor of the next one."""
+    page_size = current_app.config.get('MARKETPLACE_PAGE_SIZE', 24)
+    query = db.session.query(Product, User.username, User.id)\
+        .join(User, Product.user_id == User.id)
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            abort(400)
+        posted, product_id = position
+        query = query.filter(or_(Product.date_posted < posted,
+                                 and_(Product.date_posted == posted, Product.id < product_id)))
+    rows = query.order_by(Product.date_posted.desc(), Product.id.desc()).limit(page_size + 1).all()
+    next_cursor = encode_cursor(rows[page_size - 1][0]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+
 @market_bp.route('/')
+@cached_page
 def marketplace():
     """
-    Shows all products from all farmers. This is a public page.
+    Shows all products from all farmers, a page at a time. This is a public page.
+    The listing grid is a cached fragment; anonymous visitors get the whole page from cache.
     """
-    # *** MODIFIED QUERY ***
-    # We now also select User.id to create the seller detail link
-    products = db.session.query(Product, User.username, User.id)\
-        .join(User, Product.user_id == User.id)\
-        .order_by(Product.date_posted.desc())\
-        .all()
-        
-    return render_template('marketplace.html', title='Marketplace', products=products)
+    cursor = request.args.get('cursor', '').strip() or None
+
+    def render_grid():
+        products, next_cursor = marketplace_page(cursor)
+        return render_template('_product_grid.html', products=products, cursor=cursor, next_cursor=next_cursor)
+
+    grid = cached_fragment(('marketplace', cursor), render_grid)
+    return render_template('marketplace.html', title='Marketplace', grid=grid)
 
 
 @market_bp.route('/add', methods=['GET', 'POST'])
@@ -41,6 +82,7 @@ def add_product():
         )
         db.session.add(product)
         db.session.commit()
+        invalidate_pages('product added')
         
         flash('Your product has been listed on the marketplace!', 'success')
         return redirect(url_for('market.marketplace'))
@@ -50,6 +92,43 @@ def add_product():
     return render_template('add_product.html', title='Add Product', form=form)
 
 
+@market_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_products():
+    """
+    Lists many products at once from a CSV or JSON upload. Rows are checked
+    against the ProductForm rules; valid rows are inserted in batches and
+    invalid ones are reported by row number.
+    """
+    from .bulk_import import import_listings, ListingImportError
+    form = ProductImportForm()
+    result = None
+
+    if form.validate_on_submit():
+        upload = form.listings.data
+        try:
+            result = import_listings(upload.stream, upload.filename, current_user.id,
+                                     max_rows=current_app.config.get('IMPORT_MAX_ROWS', 20000),
+                                     dry_run=form.dry_run.data,
+                                     batch_size=current_app.config.get('IMPORT_BATCH_SIZE', 1000))
+        except ListingImportError as e:
+            flash(str(e), 'danger')
+        except Exception as e:
+            log_exception("[Import] Listing import failed", e)
+            flash('The import failed part-way; some listings may not have been added.', 'danger')
+            invalidate_pages('products imported')
+        else:
+            if result.inserted:
+                invalidate_pages('products imported')
+            if form.dry_run.data:
+                flash(f'{result.total - result.failed_rows} of {result.total} rows are valid.', 'info')
+            else:
+                flash(f'{result.inserted} of {result.total} listings added.',
+                      'success' if result.inserted == result.total else 'warning')
+
+    return render_template('import_products.html', title='Import Listings', form=form, result=result)
+
+
 @market_bp.route('/seller/<int:user_id>')
 @login_required
 def seller_detail(user_id):
@@ -93,6 +172,7 @@ def update_product(product_id):
         product.quantity = form.quantity.data
         product.contact_phone = form.contact_phone.data
         db.session.commit() # No need to add, just commit the changes
+        invalidate_pages('product updated')
         
         flash('Your product has been updated!', 'success')
         # Redirect back to their seller page
@@ -128,6 +208,29 @@ def delete_product(product_id):
         
     db.session.delete(product)
     db.session.commit()
+    invalidate_pages('product deleted')
     
     flash('Your product has been deleted.', 'success')
-    return redirect(url_for('market.seller_detail', user_id=current_user.id))
\ No newline at end of file
+    return redirect(url_for('market.seller_detail', user_id=current_user.id))
+
+
+#
+# --- PRICE COMPARISON (JSON) ---
+#
+@market_bp.route('/prices/<commodity>')
+def price_comparison(commodity):
+    """
+    Recent modal/min/max prices and trends for a commodity across every
+    market of a district and/or state, e.g. /market/prices/Onion?district=Bangalore.
+    Served from the precomputed aggregates. This is a public endpoint.
+    """
+    district = request.args.get('district', '').strip()
+    state = request.args.get('state', '').strip()
+    if not district and not state:
+        return jsonify(error="Pass a 'district' or 'state' query parameter."), 400
+
+    from agroadvisor.ml_models.aggregates import compare_markets
+    result = compare_markets(commodity, district=district, state=state)
+    if result is None:
+        return jsonify(error=f"No price data for '{commodity}'."), 404
+    return jsonify(result)
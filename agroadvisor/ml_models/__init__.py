@@ -1,11 +1,35 @@
-from .recommender import load_recommender_data
+import threading
+import time
 from .utils import log
 
-# --- Load Models on App Start ---
-# This code runs ONCE when the Flask app is imported.
-# It loads the heavy models into memory so they are ready for predictions.
-try:
-    (CROP_MODEL, YIELD_MODEL, AVG_YIELD_LOOKUP) = load_recommender_data()
-except Exception as e:
-    log(f"CRITICAL: Failed to load ML models on startup. {e}")
-    (CROP_MODEL, YIELD_MODEL, AVG_YIELD_LOOKUP) = (None, None, None)
\ No newline at end of file
+# --- Load Models on First Use ---
+# The recommender models are loaded the first time a request needs them (or
+# at startup with PRELOAD_ML), not when the package is imported, so web
+# workers and `flask` CLI commands boot without pandas/sklearn/joblib.
+_LOCK = threading.Lock()
+_MODELS = None
+
+
+def recommender_models():
+    """(CROP_MODEL, YIELD_MODEL, AVG_YIELD_LOOKUP), loaded once per process."""
+    global _MODELS
+    if _MODELS is None:
+        with _LOCK:
+            if _MODELS is None:
+                started = time.perf_counter()
+                from .recommender import load_recommender_data
+                try:
+                    _MODELS = load_recommender_data()
+                except Exception as e:
+                    log(f"CRITICAL: Failed to load ML models. {e}")
+                    _MODELS = (None, None, None)
+                log(f"[Startup] Recommender models loaded in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return _MODELS
+
+
+def __getattr__(name):
+    # Keeps `from agroadvisor.ml_models import CROP_MODEL` working (it loads on access)
+    names = ("CROP_MODEL", "YIELD_MODEL", "AVG_YIELD_LOOKUP")
+    if name in names:
+        return recommender_models()[names.index(name)]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
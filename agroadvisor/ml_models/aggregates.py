@@ -0,0 +1,273 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from .utils import log, log_exception, AGGREGATE_STORE_DIR
+from .dataset import (
+    STATE_COL, DISTRICT_COL, MARKET_COL, DATE_COL, MODAL_COL, MIN_COL, MAX_COL, ARRIVALS_COL,
+    EPOCH, normalise_name, partition_key, price_csv_path, read_price_csv, read_manifest,
+    read_partitions, store_version, concat_compact,
+)
+from .ingest import register_ingest_hook
+
+# --- Configuration ---
+SOURCE_COLUMNS = [STATE_COL, DISTRICT_COL, MARKET_COL, MODAL_COL, MIN_COL, MAX_COL, ARRIVALS_COL, DATE_COL]
+KEYS = ["state", "district", "market"]
+SPARKLINE_WEEKS = 8
+# 1970-01-05 was a Monday: weeks are numbered from there
+WEEK_OFFSET = 4
+MEMORY_CACHE_SIZE = 16
+
+_MEMORY: "OrderedDict[str, Tuple[int, Dict]]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+# --- 1. Building ---
+
+def source_rows(crop_name: str, partitions: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Raw rows with min/max prices, from the price store (only `partitions` if given) or the CSV."""
+    manifest = read_manifest(crop_name)
+    if manifest is not None:
+        wanted = set(partitions) if partitions is not None else None
+        _, parts = read_partitions(crop_name, manifest, wanted)
+        rows = concat_compact([frame[SOURCE_COLUMNS] for frame in parts.values()])
+    else:
+        path = price_csv_path(crop_name)
+        rows = read_price_csv(path, SOURCE_COLUMNS) if path else None
+    if rows is None or rows.empty:
+        return pd.DataFrame(columns=SOURCE_COLUMNS)
+    return rows
+
+
+def daily_aggregates(rows: pd.DataFrame) -> pd.DataFrame:
+    """One row per (market, day): mean modal, lowest min, highest max, total arrivals."""
+    daily = (
+        rows.groupby([STATE_COL, DISTRICT_COL, MARKET_COL, DATE_COL], observed=True, sort=True)
+        .agg(modal=(MODAL_COL, "mean"), min=(MIN_COL, "min"), max=(MAX_COL, "max"),
+             arrivals=(ARRIVALS_COL, "sum"), reports=(MODAL_COL, "size"))
+        .reset_index()
+    )
+    return daily.rename(columns={STATE_COL: "state", DISTRICT_COL: "district",
+                                 MARKET_COL: "market", DATE_COL: "day"})
+
+
+def weekly_aggregates(daily: pd.DataFrame) -> pd.DataFrame:
+    """Daily aggregates rolled up into Monday-to-Sunday weeks ('week' = first day)."""
+    week = (daily["day"].to_numpy() - WEEK_OFFSET) // 7 * 7 + WEEK_OFFSET
+    return (
+        daily.assign(week=week.astype(np.int32))
+        .groupby(KEYS + ["week"], observed=True, sort=True)
+        .agg(modal=("modal", "mean"), min=("min", "min"), max=("max", "max"),
+             arrivals=("arrivals", "sum"), reports=("reports", "sum"))
+        .reset_index()
+    )
+
+
+def _window(daily: pd.DataFrame, age: np.ndarray, lo: int, hi: int):
+    """Rows whose age (days before the market's latest report) is in [lo, hi), grouped by market."""
+    return daily[(age >= lo) & (age < hi)].groupby(KEYS, observed=True)
+
+
+def _iso(days: pd.Series) -> pd.Series:
+    return pd.Series((EPOCH + days.to_numpy().astype("timedelta64[D]")).astype(str), index=days.index)
+
+
+def market_summary(daily: pd.DataFrame, weekly: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per market: latest prices, 7/30-day averages, the change of the
+    30-day average against the 30 days before, 52-week range and the last
+    SPARKLINE_WEEKS weekly modal prices. Ages are relative to each market's
+    own latest report.
+    """
+    if daily.empty:
+        return pd.DataFrame(columns=KEYS)
+    age = (daily.groupby(KEYS, observed=True)["day"].transform("max") - daily["day"]).to_numpy()
+
+    summary = daily.drop_duplicates(KEYS, keep="last").set_index(KEYS)
+    summary = summary[["day", "modal", "min", "max", "arrivals"]].rename(columns={"day": "last_date"})
+    summary["avg_7d"] = _window(daily, age, 0, 7)["modal"].mean()
+    summary["avg_30d"] = _window(daily, age, 0, 30)["modal"].mean()
+    previous = _window(daily, age, 30, 60)["modal"].mean()
+    summary["change_30d_pct"] = (summary["avg_30d"] / previous - 1) * 100
+    year = _window(daily, age, 0, 365)
+    summary["high_52w"] = year["max"].max()
+    summary["low_52w"] = year["min"].min()
+    recent_weeks = weekly.groupby(KEYS, observed=True).tail(SPARKLINE_WEEKS)
+    summary["weekly_modal"] = recent_weeks.groupby(KEYS, observed=True)["modal"].agg(
+        lambda v: [round(float(x), 2) for x in v])
+
+    summary = summary.reset_index()
+    summary["last_date"] = _iso(summary["last_date"])
+    for col in KEYS:
+        summary[col] = summary[col].astype(str)
+    numeric = ["modal", "min", "max", "arrivals", "avg_7d", "avg_30d", "change_30d_pct", "high_52w", "low_52w"]
+    summary[numeric] = summary[numeric].astype(float).round(2)
+    return summary
+
+
+def _categorical(df: pd.DataFrame) -> pd.DataFrame:
+    for col in KEYS:
+        if col in df.columns:
+            df[col] = df[col].astype(str).astype("category")
+    return df
+
+
+def source_version(crop_name: str):
+    """Changes whenever the underlying prices do (store manifest or CSV mtime)."""
+    version = store_version(crop_name)
+    if version is not None:
+        return version
+    path = price_csv_path(crop_name)
+    return os.stat(path).st_mtime_ns if path else None
+
+
+def build_aggregates(crop_name: str) -> Optional[Dict]:
+    """Full rebuild of one commodity's aggregates."""
+    started = datetime.now()
+    rows = source_rows(crop_name)
+    if rows.empty:
+        return None
+    daily = _categorical(daily_aggregates(rows))
+    weekly = _categorical(weekly_aggregates(daily))
+    entry = {
+        "version": source_version(crop_name),
+        "built_at": started.isoformat(timespec="seconds"),
+        "daily": daily,
+        "weekly": weekly,
+        "summary": market_summary(daily, weekly),
+    }
+    save_entry(aggregate_path(crop_name), entry)
+    log(f"[Aggregates] {crop_name}: built {len(daily)} daily / {len(weekly)} weekly rows "
+        f"for {len(entry['summary'])} markets in {(datetime.now() - started).total_seconds():.2f}s")
+    return entry
+
+
+def refresh_partitions(crop_name: str, partitions: Iterable[str]) -> Optional[Dict]:
+    """Recomputes only the given district partitions and splices them into the stored aggregates."""
+    path = aggregate_path(crop_name)
+    entry = load_entry(path)
+    if entry is None:
+        return build_aggregates(crop_name)
+
+    partitions = set(partitions)
+    rows = source_rows(crop_name, partitions)
+    daily = daily_aggregates(rows)
+    weekly = weekly_aggregates(daily)
+    summary = market_summary(daily, weekly)
+
+    def keep(df):
+        # Matched on the (few hundred) district categories, not on every row
+        districts = df["district"].astype("category")
+        replaced = districts.cat.categories.map(partition_key).isin(partitions)
+        return df[~replaced[districts.cat.codes.to_numpy()]]
+
+    entry = {
+        "version": source_version(crop_name),
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "daily": _categorical(pd.concat([keep(entry["daily"]), daily], ignore_index=True)),
+        "weekly": _categorical(pd.concat([keep(entry["weekly"]), weekly], ignore_index=True)),
+        "summary": pd.concat([keep(entry["summary"]), summary], ignore_index=True),
+    }
+    save_entry(path, entry)
+    log(f"[Aggregates] {crop_name}: refreshed {len(partitions)} district(s), {len(summary)} markets")
+    return entry
+
+
+@register_ingest_hook
+def refresh_on_ingest(crop_key: str, changes: Dict):
+    """Ingest hook: keeps the aggregates in step with the price store."""
+    refresh_partitions(crop_key, changes.keys())
+
+
+# --- 2. Storage ---
+
+def aggregate_path(crop_name: str) -> str:
+    return os.path.join(AGGREGATE_STORE_DIR, f"{normalise_name(crop_name)}.pkl")
+
+
+def load_entry(path: str) -> Optional[Dict]:
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _LOCK:
+        cached = _MEMORY.get(path)
+        if cached and cached[0] == mtime:
+            _MEMORY.move_to_end(path)
+            return cached[1]
+    try:
+        entry = pd.read_pickle(path)
+    except Exception as e:
+        log_exception(f"[Aggregates] Could not load {path}", e)
+        return None
+    _remember(path, mtime, entry)
+    return entry
+
+
+def save_entry(path: str, entry: Dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    pd.to_pickle(entry, tmp)
+    os.replace(tmp, path)
+    _remember(path, os.stat(path).st_mtime_ns, entry)
+
+
+def _remember(path: str, mtime: int, entry: Dict):
+    with _LOCK:
+        _MEMORY[path] = (mtime, entry)
+        _MEMORY.move_to_end(path)
+        while len(_MEMORY) > MEMORY_CACHE_SIZE:
+            _MEMORY.popitem(last=False)
+
+
+# --- 3. Queries ---
+
+_BUILD_LOCK = threading.Lock()
+
+
+def get_aggregates(crop_name: str) -> Optional[Dict]:
+    """The stored aggregates, rebuilt if the prices changed without an ingest hook running."""
+    path = aggregate_path(crop_name)
+    version = source_version(crop_name)
+    if version is None:
+        return None
+    entry = load_entry(path)
+    if entry is None or entry["version"] != version:
+        with _BUILD_LOCK:
+            entry = load_entry(path)
+            if entry is None or entry["version"] != version:
+                entry = build_aggregates(crop_name)
+    return entry
+
+
+def compare_markets(crop_name: str, district: Optional[str] = None, state: Optional[str] = None) -> Optional[Dict]:
+    """
+    Latest prices and trends for every market of a commodity in a district
+    and/or state (case-insensitive), highest modal price first. None if the
+    commodity has no price data.
+    """
+    entry = get_aggregates(crop_name)
+    if entry is None:
+        return None
+    summary = entry["summary"]
+    mask = np.ones(len(summary), dtype=bool)
+    if district:
+        mask &= summary["district"].str.strip().str.lower().eq(district.strip().lower()).to_numpy()
+    if state:
+        mask &= summary["state"].str.strip().str.lower().eq(state.strip().lower()).to_numpy()
+    rows = summary[mask].sort_values("modal", ascending=False)
+    markets = [
+        {k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in rec.items()}
+        for rec in rows.to_dict("records")
+    ]
+    return {
+        "commodity": crop_name,
+        "district": district or None,
+        "state": state or None,
+        "updated_at": entry["built_at"],
+        "markets": markets,
+    }
@@ -0,0 +1,181 @@
+import os
+import json
+import threading
+from typing import Callable, Dict, List
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import FunctionTransformer, StandardScaler
+
+from .utils import log, log_exception, INSTANCE_DIR
+from .features import FEATURES, CALENDAR_FEATURES
+
+# --- Configuration ---
+# Written by `flask backtest --backend ...`; overrides DEFAULT_SIZE_BANDS
+BACKEND_CHOICE_FILE = os.path.join(INSTANCE_DIR, "backtest", "backend_choice.json")
+# (max training rows, backend) used until a backtest has picked better ones.
+# Forests are only used where a backtest shows they help.
+DEFAULT_SIZE_BANDS = [
+    (60, "seasonal_naive"),
+    (400, "ridge_seasonal"),
+    (None, "hist_gb"),
+]
+# A backend may be this much worse (absolute MAPE) than the most accurate one
+# and still be chosen for being faster
+MAPE_TOLERANCE = 0.01
+
+
+# --- 1. Estimators ---
+
+class SeasonalNaive(BaseEstimator, RegressorMixin):
+    """Mean price per calendar month over the last `years` years of history."""
+
+    def __init__(self, years: int = 3):
+        self.years = years
+
+    def fit(self, X, y):
+        months = np.asarray(X["month"], dtype=int)
+        years = np.asarray(X["year"], dtype=int)
+        y = np.asarray(y, dtype=float)
+        recent = years >= years.max() - self.years + 1
+        sums = np.bincount(months[recent], weights=y[recent], minlength=13)
+        counts = np.bincount(months[recent], minlength=13)
+        self.fallback_ = float(y[recent].mean())
+        self.profile_ = np.where(counts > 0, sums / np.maximum(counts, 1), self.fallback_)
+        return self
+
+    def predict(self, X):
+        return self.profile_[np.asarray(X["month"], dtype=int)]
+
+
+def seasonal_design(X: pd.DataFrame) -> np.ndarray:
+    """Harmonics of day-of-year/day-of-week, a linear trend and the other features."""
+    doy = 2 * np.pi * np.asarray(X["doy"], dtype=float) / 365.25
+    dow = 2 * np.pi * np.asarray(X["dow"], dtype=float) / 7
+    trend = np.asarray(X["year"], dtype=float) + np.asarray(X["doy"], dtype=float) / 365.25
+    others = [c for c in FEATURES if c not in CALENDAR_FEATURES]
+    return np.column_stack([
+        np.sin(doy), np.cos(doy), np.sin(2 * doy), np.cos(2 * doy),
+        np.sin(dow), np.cos(dow), trend,
+        X[others].to_numpy(dtype=float),
+    ])
+
+
+# --- 2. Registry ---
+
+class Backend:
+    def __init__(self, name: str, factory: Callable[[], object], incremental: bool = False):
+        self.name = name
+        self.factory = factory
+        # Supports model_registry's warm-start update (update_model)
+        self.incremental = incremental
+
+
+BACKENDS: Dict[str, Backend] = {}
+
+
+def register_backend(name: str, factory: Callable[[], object], incremental: bool = False) -> Backend:
+    BACKENDS[name] = Backend(name, factory, incremental)
+    return BACKENDS[name]
+
+
+register_backend(
+    "forest",
+    lambda: RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1, max_depth=10),
+    incremental=True,
+)
+register_backend(
+    "hist_gb",
+    lambda: HistGradientBoostingRegressor(max_iter=200, learning_rate=0.1, early_stopping=False, random_state=42),
+)
+register_backend(
+    "ridge_seasonal",
+    lambda: make_pipeline(FunctionTransformer(seasonal_design), StandardScaler(), Ridge(alpha=1.0)),
+)
+register_backend("seasonal_naive", lambda: SeasonalNaive())
+
+
+def make_estimator(name: str):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown model backend '{name}' (known: {', '.join(BACKENDS)})")
+    return BACKENDS[name].factory()
+
+
+def is_incremental(name: str) -> bool:
+    backend = BACKENDS.get(name)
+    return bool(backend and backend.incremental)
+
+
+# --- 3. Selection ---
+
+_CHOICE = {"mtime": None, "bands": None}
+_CHOICE_LOCK = threading.Lock()
+
+
+def size_bands() -> List:
+    """The backtest's (max rows, backend) bands if it has written any, else the defaults."""
+    try:
+        mtime = os.stat(BACKEND_CHOICE_FILE).st_mtime_ns
+    except OSError:
+        return DEFAULT_SIZE_BANDS
+    with _CHOICE_LOCK:
+        if _CHOICE["mtime"] != mtime:
+            try:
+                with open(BACKEND_CHOICE_FILE) as f:
+                    bands = [(b["max_rows"], b["backend"]) for b in json.load(f)["bands"]]
+                _CHOICE.update(mtime=mtime, bands=[b for b in bands if b[1] in BACKENDS] or None)
+            except Exception as e:
+                log_exception(f"[Backends] Could not read {BACKEND_CHOICE_FILE}", e)
+                _CHOICE.update(mtime=mtime, bands=None)
+        return _CHOICE["bands"] or DEFAULT_SIZE_BANDS
+
+
+def choose_backend(n_rows: int) -> str:
+    for max_rows, name in size_bands():
+        if max_rows is None or n_rows <= max_rows:
+            return name
+    return size_bands()[-1][1]
+
+
+def select_backends(forecasts: pd.DataFrame, tolerance: float = MAPE_TOLERANCE) -> List[Dict]:
+    """
+    Picks a backend per training-size band from backtest forecasts (one row
+    per forecast with 'backend', 'train_rows', 'ape', 'fit_seconds'): the
+    fastest backend whose MAPE is within `tolerance` of the band's best.
+    """
+    limits = [b[0] for b in DEFAULT_SIZE_BANDS]
+    upper = np.array([b for b in limits if b is not None])
+    band = np.searchsorted(upper, forecasts["train_rows"].to_numpy(), side="left")
+    stats = (
+        forecasts.assign(band=band)
+        .groupby(["band", "backend"])
+        .agg(mape=("ape", "mean"), fit_seconds=("fit_seconds", "mean"), forecasts=("ape", "size"))
+        .reset_index()
+    )
+
+    bands = []
+    for i, max_rows in enumerate(limits):
+        rows = stats[stats["band"] == i]
+        if rows.empty:
+            continue
+        eligible = rows[rows["mape"] <= rows["mape"].min() + tolerance]
+        best = eligible.sort_values("fit_seconds").iloc[0]
+        bands.append({
+            "max_rows": max_rows, "backend": best["backend"],
+            "mape": round(float(best["mape"]), 4), "fit_seconds": round(float(best["fit_seconds"]), 4),
+            "candidates": {r.backend: round(float(r.mape), 4) for r in rows.itertuples()},
+        })
+        log(f"[Backends] <= {max_rows or 'any'} rows: {best['backend']} "
+            f"(MAPE {best['mape']:.3f}, fit {best['fit_seconds'] * 1000:.1f} ms)")
+    return bands
+
+
+def save_backend_choice(bands: List[Dict]):
+    os.makedirs(os.path.dirname(BACKEND_CHOICE_FILE), exist_ok=True)
+    tmp = BACKEND_CHOICE_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"bands": bands}, f, indent=1)
+    os.replace(tmp, BACKEND_CHOICE_FILE)
@@ -0,0 +1,248 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+from .utils import log, log_exception, setup_session, INSTANCE_DIR
+from .dataset import (
+    DISTRICT_COL, MARKET_COL, STATE_COL,
+    known_commodities, get_price_dataset, with_datetimes,
+)
+from .predictor import geocode_market, prefetch_weather, train_model, forecast_features, FEATURES, TARGET
+from .feature_store import get_features, feature_path, read_features, weather_gaps
+from .features import HISTORY_FEATURES, WEATHER_FEATURES, climatology
+from .backends import select_backends, save_backend_choice, BACKEND_CHOICE_FILE
+
+# --- Configuration ---
+BACKTEST_DIR = os.path.join(INSTANCE_DIR, "backtest")
+HORIZONS = (7, 30, 60, 90)
+N_ORIGINS = 6
+# A target counts for horizon h if a price was reported within this many
+# days after origin + h
+TARGET_TOLERANCE_DAYS = 7
+MIN_MARKET_ROWS = 120
+MIN_TRAIN_ROWS = 60
+# Markets whose missing weather is prefetched together; kept under
+# weather_cache.MAX_ENTRIES so a wave's results are all still cached
+WARM_WAVE = 50
+
+
+# --- 1. Markets and cached feature matrices ---
+
+def list_markets(commodities: Optional[Iterable[str]] = None, min_rows: int = MIN_MARKET_ROWS) -> List[Dict]:
+    """Every (commodity, district, market) with enough history to backtest."""
+    markets = []
+    for key in (commodities or known_commodities()):
+        df = get_price_dataset(key)
+        if df is None or df.empty:
+            continue
+        counts = df.groupby([STATE_COL, DISTRICT_COL, MARKET_COL], observed=True).size()
+        for (state, district, market), n in counts[counts >= min_rows].items():
+            markets.append({"commodity": key, "state": str(state), "district": str(district),
+                            "market": str(market), "rows": int(n)})
+    return markets
+
+
+def _market_inputs(market: Dict, session) -> Optional[Tuple[pd.DataFrame, float, float]]:
+    """(raw price rows, lat, lon) for a market, or None if it cannot be geocoded."""
+    df = get_price_dataset(market["commodity"])
+    rows = with_datetimes(df[(df[DISTRICT_COL] == market["district"]) & (df[MARKET_COL] == market["market"])])
+    lat, lon = geocode_market(market["market"], market["district"], market["state"], session)
+    if lat is None:
+        return None
+    return rows, lat, lon
+
+
+def build_feature_matrix(market: Dict, session, inputs=None) -> Optional[str]:
+    """
+    Brings the market's frame in the feature store up to date and returns its
+    path. Only days the store does not have yet are merged or fetched.
+    """
+    inputs = inputs or _market_inputs(market, session)
+    if inputs is None:
+        return None
+    rows, lat, lon = inputs
+    frame = get_features(market["commodity"], market["district"], market["market"], lat, lon, rows, session)
+    if frame is None or len(frame) < MIN_MARKET_ROWS:
+        return None
+    return feature_path(market["commodity"], market["district"], market["market"])
+
+
+def warm_feature_store(markets: List[Dict], session) -> List[Tuple[Dict, str]]:
+    """
+    Brings every market's feature frame up to date. Markets are taken in waves:
+    the weather each wave is missing is fetched first in multi-location calls
+    (predictor.prefetch_weather), then the frames are built from the shared
+    cache. Returns (market, path) for the markets with enough data.
+    """
+    ready = []
+    for i in range(0, len(markets), WARM_WAVE):
+        prepared, locations = [], []
+        for market in markets[i:i + WARM_WAVE]:
+            try:
+                inputs = _market_inputs(market, session)
+            except Exception as e:
+                log_exception(f"[Backtest] Geocoding {market['market']} failed", e)
+                continue
+            if inputs is None:
+                continue
+            rows, lat, lon = inputs
+            for start, end in weather_gaps(market["commodity"], market["district"], market["market"], rows):
+                locations.append((lat, lon, start, end))
+            prepared.append((market, inputs))
+        fetched = prefetch_weather(locations, is_forecast=False, session=session)
+        log(f"[Backtest] Wave {i // WARM_WAVE + 1}: prefetched weather for {fetched} locations")
+
+        for market, inputs in prepared:
+            try:
+                path = build_feature_matrix(market, session, inputs)
+            except Exception as e:
+                log_exception(f"[Backtest] Features for {market['market']} failed", e)
+                path = None
+            if path:
+                ready.append((market, path))
+    return ready
+
+
+# --- 2. Rolling-origin evaluation ---
+
+def rolling_origins(dates: np.ndarray, n_origins: int, max_horizon: int) -> List[np.datetime64]:
+    """
+    `n_origins` observed dates, evenly spaced from the middle of the history
+    to the last date that still leaves `max_horizon` days to score.
+    """
+    last_origin = dates[-1] - np.timedelta64(max_horizon, "D")
+    candidates = dates[(dates >= dates[len(dates) // 2]) & (dates <= last_origin)]
+    if len(candidates) == 0:
+        return []
+    picks = np.unique(np.linspace(0, len(candidates) - 1, n_origins).astype(int))
+    return list(candidates[picks])
+
+
+def evaluate_market(market: Dict, path: str, horizons=HORIZONS, n_origins: int = N_ORIGINS,
+                    backends: Sequence[Optional[str]] = (None,)) -> List[Dict]:
+    """
+    Walk-forward test of preprocess_data -> train_model -> forecast for one
+    market: for each origin, train on data up to it and forecast the first
+    reported price at or after origin + h, for every horizon h. Each backend
+    in `backends` is tested (None: the one train_model would pick).
+    """
+    frame = read_features(path).sort_values("date").reset_index(drop=True)
+    dates = frame["date"].values
+    tolerance = np.timedelta64(TARGET_TOLERANCE_DAYS, "D")
+    results = []
+
+    for origin in rolling_origins(dates, n_origins, max(horizons)):
+        train = frame[frame["date"] <= origin]
+        if len(train) < MIN_TRAIN_ROWS:
+            continue
+
+        rows, targets = [], []
+        for h in horizons:
+            target_date = origin + np.timedelta64(h, "D")
+            idx = int(np.searchsorted(dates, target_date))
+            if idx >= len(dates) or dates[idx] - target_date > tolerance:
+                continue
+            target = frame.iloc[idx]
+            when = pd.Timestamp(target["date"]).to_pydatetime()
+            # As in run_price_prediction, only what is known at the origin is
+            # used: the target row's lagged prices (horizons are at most
+            # LAG_DAYS), and for the weather still to come - which the target
+            # row has observed - the climatology of the training data
+            weather = climatology(train, when, WEATHER_FEATURES)
+            history = {**target[HISTORY_FEATURES].to_dict(), "season_rain": weather["season_rain"]}
+            rows.append(forecast_features(when, weather, history))
+            targets.append((h, target["date"], float(target[TARGET])))
+        if not rows:
+            continue
+        X = pd.DataFrame(rows)[FEATURES]
+
+        for backend in backends:
+            model, metrics = train_model(train, backend)
+            if model is None:
+                continue
+            predictions = model.predict(X)
+            for (h, target_date, actual), predicted in zip(targets, predictions):
+                results.append({
+                    **{k: market[k] for k in ("commodity", "district", "market")},
+                    "backend": metrics["backend"], "train_rows": len(train),
+                    "origin": pd.Timestamp(origin), "horizon": h, "target_date": target_date,
+                    "actual": actual, "predicted": float(predicted),
+                    "ape": abs(predicted - actual) / actual if actual else np.nan,
+                    "fit_seconds": metrics["fit_seconds"],
+                })
+    return results
+
+
+def _evaluate_job(args):
+    market, path, horizons, n_origins, backends = args
+    try:
+        return evaluate_market(market, path, horizons, n_origins, backends)
+    except Exception as e:
+        log_exception(f"[Backtest] {market['commodity']}/{market['market']} failed", e)
+        return []
+
+
+# --- 3. Orchestration ---
+
+def run_backtest(commodities: Optional[Iterable[str]] = None, horizons=HORIZONS, n_origins: int = N_ORIGINS,
+                 workers: Optional[int] = None, max_markets: Optional[int] = None,
+                 backends: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Backtests every market on a process pool and writes
+    instance/backtest/forecasts.csv and leaderboard.csv. Returns the leaderboard
+    (MAPE per commodity, market, backend and horizon).
+
+    With several `backends`, the fastest accurate one per training-size band
+    is saved to backend_choice.json, which train_model then follows.
+    """
+    started = time.perf_counter()
+    markets = list_markets(commodities)
+    if max_markets:
+        markets = sorted(markets, key=lambda m: m["rows"], reverse=True)[:max_markets]
+    log(f"[Backtest] {len(markets)} markets, horizons {list(horizons)}, {n_origins} origins")
+
+    # Feature frames are brought up to date up front: this is the part that
+    # talks to the geocoding and weather APIs.
+    session = setup_session()
+    jobs = [(market, path, tuple(horizons), n_origins, tuple(backends or (None,)))
+            for market, path in warm_feature_store(markets, session)]
+    log(f"[Backtest] {len(jobs)} feature matrices ready after {time.perf_counter() - started:.1f}s")
+
+    results = []
+    workers = workers or max(1, (os.cpu_count() or 2) // 2)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(_evaluate_job, job) for job in jobs]):
+            results.extend(future.result())
+
+    os.makedirs(BACKTEST_DIR, exist_ok=True)
+    forecasts = pd.DataFrame(results)
+    if forecasts.empty:
+        log("[Backtest] No forecasts could be scored.")
+        return forecasts
+    forecasts.to_csv(os.path.join(BACKTEST_DIR, "forecasts.csv"), index=False)
+
+    leaderboard = (
+        forecasts.groupby(["commodity", "district", "market", "backend", "horizon"])
+        .agg(mape=("ape", "mean"), forecasts=("ape", "size"), fit_seconds=("fit_seconds", "mean"))
+        .reset_index()
+        .sort_values(["horizon", "mape"])
+    )
+    leaderboard.to_csv(os.path.join(BACKTEST_DIR, "leaderboard.csv"), index=False)
+    if backends and len(backends) > 1:
+        save_backend_choice(select_backends(forecasts))
+        log(f"[Backtest] Backend choice written to {BACKEND_CHOICE_FILE}")
+    log(f"[Backtest] Scored {len(forecasts)} forecasts in {time.perf_counter() - started:.1f}s")
+    return leaderboard
+
+
+def horizon_summary(leaderboard: pd.DataFrame) -> pd.DataFrame:
+    """Mean/median MAPE across markets for each backend and horizon."""
+    return (
+        leaderboard.groupby(["backend", "horizon"])
+        .agg(markets=("market", "size"), mean_mape=("mape", "mean"), median_mape=("mape", "median"),
+             fit_seconds=("fit_seconds", "mean"))
+        .reset_index()
+    )
@@ -0,0 +1,117 @@
+import json
+import math
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from .utils import log
+
+# --- Configuration ---
+DEFAULT_MAX_POINTS = 400
+DOWNSAMPLE_METHODS = ("lttb", "ohlc", "none")
+
+
+# --- 1. Downsampling ---
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: picks `n_out` indices that preserve the
+    visual shape of the series. Always keeps the first and last point.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Bucket boundaries for the n - 2 interior points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third vertex
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean() if nhi > nlo else x[-1]
+        avg_y = y[nlo:nhi].mean() if nhi > nlo else y[-1]
+
+        areas = np.abs(
+            (x[prev] - avg_x) * (y[lo:hi] - y[prev])
+            - (x[prev] - x[lo:hi]) * (avg_y - y[prev])
+        )
+        prev = lo + int(np.argmax(areas))
+        selected[i + 1] = prev
+    return selected
+
+
+def lttb(df: pd.DataFrame, max_points: int, value_col: str = "modal_price") -> pd.DataFrame:
+    """Downsamples a (date, value) frame with LTTB."""
+    x = df["date"].values.astype("datetime64[s]").astype(np.float64)
+    y = df[value_col].to_numpy(dtype=np.float64)
+    return df.iloc[lttb_indices(x, y, max_points)].reset_index(drop=True)
+
+
+def ohlc(df: pd.DataFrame, max_points: int, value_col: str = "modal_price") -> pd.DataFrame:
+    """
+    Aggregates a (date, value) frame into open/high/low/close buckets.
+    Buckets are weekly, widened as needed to stay within `max_points`.
+    """
+    span_days = max((df["date"].iloc[-1] - df["date"].iloc[0]).days, 1)
+    bucket_days = max(7, math.ceil(span_days / max(max_points, 1)))
+
+    agg = (
+        df.set_index("date")[value_col]
+        .resample(f"{bucket_days}D")
+        .agg(["first", "max", "min", "last"])
+        .dropna()
+        .reset_index()
+    )
+    agg.columns = ["date", "open", "high", "low", "close"]
+    # The chart line follows the closing price of each bucket
+    agg[value_col] = agg["close"]
+    return agg
+
+
+def downsample_price_history(df: pd.DataFrame, max_points: int = DEFAULT_MAX_POINTS,
+                             method: str = "lttb") -> pd.DataFrame:
+    """Returns at most `max_points` rows of a (date, modal_price) history."""
+    if df is None or df.empty:
+        return df
+    df = df.dropna(subset=["date", "modal_price"]).sort_values("date").reset_index(drop=True)
+    df["date"] = pd.to_datetime(df["date"])
+
+    if method == "none" or len(df) <= max_points:
+        return df
+    if method == "ohlc":
+        out = ohlc(df, max_points)
+    else:
+        out = lttb(df, max_points)
+    log(f"[Chart] Downsampled history {len(df)} -> {len(out)} points ({method})")
+    return out
+
+
+# --- 2. Compact columnar encoding ---
+
+def to_columnar(df: pd.DataFrame, columns: List[str], decimals: int = 2) -> Dict[str, list]:
+    """
+    Encodes a frame as {column: [values...]} instead of a list of records,
+    so each key is written once. Dates become 'YYYY-MM-DD', NaN becomes null.
+    """
+    out = {}
+    for col in columns:
+        if col not in df.columns:
+            continue
+        series = df[col]
+        if col == "date":
+            out[col] = pd.to_datetime(series).dt.strftime("%Y-%m-%d").tolist()
+        else:
+            values = series.astype(float).round(decimals)
+            out[col] = [None if pd.isna(v) else v for v in values.tolist()]
+    return out
+
+
+def chart_json(df: Optional[pd.DataFrame], columns: List[str]) -> Optional[str]:
+    """Columnar JSON with no whitespace, ready to inline into a template."""
+    if df is None or df.empty:
+        return None
+    return json.dumps(to_columnar(df, columns), separators=(",", ":"))
@@ -0,0 +1,254 @@
+import os
+import time
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from flask import current_app, session as web_session
+
+from .utils import log, log_exception, setup_session
+from .weather_cache import snap
+from .weather_client import WeatherQuery, fetch_batch
+
+# --- Configuration ---
+CURRENT_VARS = ("temperature_2m", "relative_humidity_2m", "precipitation")
+# Seconds a reading is fresh; popular locations are refetched REFRESH_AHEAD
+# seconds before that, so their visitors never see a stale one
+TTL = 600
+REFRESH_AHEAD = 120
+# A stale reading is still shown (while a refresh is pending or failing) up to this age
+MAX_STALE = 3 * 3600
+# A location is popular while it had POPULAR_MIN_VIEWS views within the last
+# POPULAR_WINDOW seconds; only those are refreshed ahead of expiry. Others
+# are refetched only when viewed again (served stale meanwhile).
+POPULAR_WINDOW = 3600
+POPULAR_MIN_VIEWS = 3
+MAX_LOCATIONS = 2000
+# Locations fetched per refresher pass at most (the rest wait for the next)
+MAX_PER_PASS = 200
+# Seconds between refresher passes (it also wakes on every miss)
+TICK = 15
+# A location whose fetch failed is not retried for this many seconds
+RETRY_AFTER = 60
+# Flask session key of the dashboard's location
+SESSION_KEY = "weather_location"
+
+
+class Conditions(NamedTuple):
+    temp: float
+    humidity: float
+    rainfall: float
+    observed: str         # Open-Meteo's local observation time, 'YYYY-MM-DDTHH:MM'
+    fetched_at: datetime  # UTC
+    stale: bool = False
+
+
+def conditions_from(payload: Optional[Dict]) -> Optional[Conditions]:
+    """The current conditions in an Open-Meteo payload, or None if it has none."""
+    current = (payload or {}).get("current")
+    if not current:
+        return None
+    return Conditions(current["temperature_2m"], current["relative_humidity_2m"], current["precipitation"],
+                      current.get("time", ""), datetime.now(timezone.utc))
+
+
+def current_query(lat: float, lon: float) -> WeatherQuery:
+    return WeatherQuery(lat, lon, forecast=True, current=CURRENT_VARS)
+
+
+class CurrentWeatherService:
+    """
+    Current conditions per snapped location, served from memory only. get()
+    never calls Open-Meteo: misses and stale readings are queued for a
+    background thread, which also refetches popular locations before they
+    expire, all in multi-location calls. Request latency therefore does not
+    depend on Open-Meteo's.
+    """
+
+    def __init__(self, ttl: float = TTL, refresh_ahead: float = REFRESH_AHEAD, max_stale: float = MAX_STALE,
+                 popular_window: float = POPULAR_WINDOW, min_views: int = POPULAR_MIN_VIEWS,
+                 max_locations: int = MAX_LOCATIONS, max_per_pass: int = MAX_PER_PASS, tick: float = TICK):
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+        self.max_stale = max(max_stale, ttl)
+        self.popular_window = popular_window
+        self.min_views = max(1, int(min_views))
+        self.max_locations = max_locations
+        self.max_per_pass = max_per_pass
+        self.tick = tick
+        self.hits = self.stale_hits = self.misses = 0
+        self.fetches = self.failures = 0
+        self._entries: Dict[Tuple[float, float], Tuple[float, Conditions]] = {}
+        # location -> times of its last min_views views, least recently viewed location first
+        self._views: Dict[Tuple[float, float], deque] = {}
+        self._wanted = set()
+        self._failed_at: Dict[Tuple[float, float], float] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _is_popular(self, key, now: float) -> bool:
+        views = self._views.get(key)
+        return views is not None and len(views) == self.min_views and now - views[0] <= self.popular_window
+
+    def _forget(self, key):
+        self._views.pop(key, None)
+        self._entries.pop(key, None)
+        self._failed_at.pop(key, None)
+        self._wanted.discard(key)
+
+    # --- Request path ---
+
+    def get(self, lat: float, lon: float) -> Optional[Conditions]:
+        """The latest reading for the location (marked stale if past its TTL), or None until one is fetched."""
+        key = snap(lat, lon)
+        now = time.monotonic()
+        with self._lock:
+            views = self._views.pop(key, None) or deque(maxlen=self.min_views)
+            views.append(now)
+            self._views[key] = views
+            while len(self._views) > self.max_locations:
+                self._forget(next(iter(self._views)))
+            entry = self._entries.get(key)
+            age = now - entry[0] if entry else None
+            if age is None or age > self.max_stale:
+                self.misses += 1
+                value = None
+            elif age > self.ttl:
+                self.stale_hits += 1
+                value = entry[1]._replace(stale=True)
+            else:
+                self.hits += 1
+                value = entry[1]
+            wanted = value is None or value.stale
+            if wanted:
+                self._wanted.add(key)
+        if wanted:
+            self._wake.set()
+        self._ensure_refresher()
+        return value
+
+    # --- Refresher ---
+
+    def popular(self, now: Optional[float] = None) -> List[Tuple[float, float]]:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return [k for k in self._views if self._is_popular(k, now)]
+
+    def due(self, now: Optional[float] = None) -> List[Tuple[float, float]]:
+        """
+        Locations to fetch now, at most max_per_pass: viewed misses and stale
+        readings first (most recently viewed first), then popular locations
+        about to expire.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            def ready(k):
+                return now - self._failed_at.get(k, -RETRY_AFTER) >= RETRY_AFTER
+
+            wanted = sorted((k for k in self._wanted if ready(k)), key=lambda k: -self._views[k][-1])
+            expiring = []
+            for key in self._views:
+                entry = self._entries.get(key)
+                if (key not in self._wanted and entry is not None and ready(key)
+                        and now - entry[0] >= self.ttl - self.refresh_ahead
+                        and self._is_popular(key, now)):
+                    expiring.append(key)
+            return (wanted + expiring)[:self.max_per_pass]
+
+    def refresh(self, keys: Optional[List[Tuple[float, float]]] = None, session=None) -> int:
+        """Fetches `keys` (default: what is due) in batched calls. Returns how many succeeded."""
+        keys = self.due() if keys is None else keys
+        if not keys:
+            return 0
+        payloads = fetch_batch([current_query(lat, lon) for lat, lon in keys], session or setup_session(), timeout=10)
+        now = time.monotonic()
+        fetched = 0
+        with self._lock:
+            for key, payload in zip(keys, payloads):
+                # A failed location keeps its last reading until it is retried
+                self._wanted.discard(key)
+                value = conditions_from(payload)
+                if value is None:
+                    self.failures += 1
+                    self._failed_at[key] = now
+                    continue
+                self._entries[key] = (now, value)
+                self._failed_at.pop(key, None)
+                fetched += 1
+            self.fetches += fetched
+            # Locations not viewed for longer than a reading may be shown are forgotten
+            for key in [k for k, views in self._views.items() if now - views[-1] > self.max_stale]:
+                self._forget(key)
+        log(f"[CurrentWeather] Refreshed {fetched}/{len(keys)} locations")
+        if self._wanted:
+            # More is due than one pass fetches: carry on without waiting a tick
+            self._wake.set()
+        return fetched
+
+    def _run(self):
+        session = setup_session()
+        while True:
+            self._wake.wait(self.tick)
+            self._wake.clear()
+            try:
+                self.refresh(session=session)
+            except Exception as e:
+                log_exception("[CurrentWeather] Refresh failed", e)
+
+    def _ensure_refresher(self):
+        # Started lazily, and again in each forked worker (threads do not survive fork)
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="current-weather", daemon=True)
+            self._thread.start()
+
+    def stats(self) -> dict:
+        total = self.hits + self.stale_hits + self.misses
+        return {'locations': len(self._entries), 'popular': len(self.popular()), 'hits': self.hits,
+                'stale_hits': self.stale_hits, 'misses': self.misses, 'fetches': self.fetches,
+                'failures': self.failures, 'hit_rate': round(self.hits / total, 3) if total else None}
+
+
+# --- App integration ---
+
+def current_weather() -> Optional[CurrentWeatherService]:
+    return current_app.extensions.get('current_weather')
+
+
+def remember_location(district: str, lat: float, lon: float):
+    """Makes `district` the location of the user's dashboard weather (stored in their session)."""
+    lat, lon = snap(lat, lon)
+    web_session[SESSION_KEY] = {'district': district, 'lat': lat, 'lon': lon}
+    service = current_weather()
+    if service is not None:
+        # Queues the first fetch, so the dashboard has it by the next visit
+        service.get(lat, lon)
+
+
+def dashboard_weather() -> Tuple[Optional[Dict], Optional[Conditions]]:
+    """(the user's remembered location, its current conditions); either may be None."""
+    location = web_session.get(SESSION_KEY)
+    service = current_weather()
+    if not location or service is None:
+        return location, None
+    return location, service.get(location['lat'], location['lon'])
+
+
+def init_current_weather(app):
+    """Creates the app's CurrentWeatherService. Does nothing unless CURRENT_WEATHER_ENABLED is set."""
+    if not app.config.get('CURRENT_WEATHER_ENABLED'):
+        return
+    app.extensions['current_weather'] = CurrentWeatherService(
+        ttl=app.config.get('CURRENT_WEATHER_TTL', TTL),
+        refresh_ahead=app.config.get('CURRENT_WEATHER_REFRESH_AHEAD', REFRESH_AHEAD),
+        max_stale=app.config.get('CURRENT_WEATHER_MAX_STALE', MAX_STALE),
+        popular_window=app.config.get('CURRENT_WEATHER_POPULAR_WINDOW', POPULAR_WINDOW),
+        min_views=app.config.get('CURRENT_WEATHER_POPULAR_MIN_VIEWS', POPULAR_MIN_VIEWS),
+        max_per_pass=app.config.get('CURRENT_WEATHER_MAX_PER_PASS', MAX_PER_PASS),
+    )
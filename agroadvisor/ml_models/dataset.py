@@ -0,0 +1,375 @@
+import os
+import re
+import json
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from .utils import log, log_exception, PRICE_STORE_DIR
+
+# --- Configuration ---
+# Path is relative to the project root
+DATA_DIR = 'data'
+
+STATE_COL = "State Name"
+DISTRICT_COL = "District Name"
+MARKET_COL = "Market Name"
+DATE_COL = "Reported Date"
+MODAL_COL = "Modal Price (Rs./Quintal)"
+MIN_COL = "Min Price (Rs./Quintal)"
+MAX_COL = "Max Price (Rs./Quintal)"
+ARRIVALS_COL = "Arrivals (Tonnes)"
+VARIETY_COL = "Variety"
+GRADE_COL = "Grade"
+
+# Repeated strings are held as categoricals, the numbers as float32 and
+# the date as int32 day numbers.
+CATEGORY_COLUMNS = [STATE_COL, DISTRICT_COL, MARKET_COL, VARIETY_COL, GRADE_COL]
+FLOAT_COLUMNS = [ARRIVALS_COL, MIN_COL, MAX_COL, MODAL_COL]
+
+# Only the columns the price predictor reads
+PRICE_COLUMNS = [STATE_COL, DISTRICT_COL, MARKET_COL, ARRIVALS_COL, MODAL_COL, DATE_COL]
+# Everything the ingested price store keeps (dedup keys and min/max too)
+ARCHIVE_COLUMNS = CATEGORY_COLUMNS + FLOAT_COLUMNS + [DATE_COL]
+
+AGMARKNET_DATE_FORMAT = "%d %b %Y"  # e.g. "07 May 2015"
+EPOCH = np.datetime64("1970-01-01", "D")
+# Times a store read restarts when concurrent ingests keep replacing partitions
+READ_RETRIES = 3
+
+_CACHE: Dict[str, tuple] = {}           # commodity -> (store version, frame)
+_PARTITION_CACHE: Dict[tuple, tuple] = {}  # (commodity, district) -> (version, frame)
+_MANIFESTS: Dict[str, tuple] = {}        # commodity -> (mtime, manifest)
+_CACHE_LOCK = threading.Lock()
+_PRICE_FILES: Optional[Dict[str, str]] = None
+
+
+# --- 1. Locating price files ---
+
+def normalise_name(name: str) -> str:
+    """'Arhar/Tur' and 'ArharTur.csv' both become 'arhartur'."""
+    name = re.sub(r"\.csv$", "", str(name), flags=re.IGNORECASE)
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def price_files() -> Dict[str, str]:
+    """Maps normalised commodity name -> path of its Agmarknet price CSV."""
+    global _PRICE_FILES
+    if _PRICE_FILES is None:
+        files = {}
+        for fname in sorted(os.listdir(DATA_DIR)):
+            if not fname.lower().endswith(".csv"):
+                continue
+            path = os.path.join(DATA_DIR, fname)
+            try:
+                header = pd.read_csv(path, nrows=0).columns
+            except Exception:
+                continue
+            if MODAL_COL in header:
+                files[normalise_name(fname)] = path
+        _PRICE_FILES = files
+    return _PRICE_FILES
+
+
+def known_commodities() -> List[str]:
+    """Normalised names of every commodity in data/ or in the price store."""
+    keys = set(price_files())
+    if os.path.isdir(PRICE_STORE_DIR):
+        keys.update(d for d in os.listdir(PRICE_STORE_DIR)
+                    if os.path.exists(os.path.join(PRICE_STORE_DIR, d, "manifest.json")))
+    return sorted(keys)
+
+
+def price_csv_path(crop_name: str) -> Optional[str]:
+    """
+    Resolves a commodity name to its CSV regardless of case or punctuation
+    (e.g. 'Arhar/Tur' -> data/ArharTur.csv, 'wheat' -> data/Wheat.csv).
+    """
+    return price_files().get(normalise_name(crop_name))
+
+
+# --- 2. Loading ---
+
+def parse_report_dates(dates: pd.Series) -> pd.Series:
+    parsed = pd.to_datetime(dates, format=AGMARKNET_DATE_FORMAT, errors="coerce")
+    # Fall back to the slow, format-guessing parser only for odd rows
+    bad = parsed.isna() & dates.notna()
+    if bad.any():
+        parsed[bad] = pd.to_datetime(dates[bad], format="mixed", dayfirst=True, errors="coerce")
+    return parsed
+
+
+def to_day_numbers(dates: pd.Series) -> np.ndarray:
+    """Datetime series -> int32 days since 1970-01-01."""
+    return (dates.values.astype("datetime64[D]") - EPOCH).astype(np.int32)
+
+
+def from_day_numbers(days) -> pd.Series:
+    """int32 days since 1970-01-01 -> datetime64 series."""
+    values = (EPOCH + np.asarray(days, dtype="timedelta64[D]")).astype("datetime64[ns]")
+    return pd.Series(values, index=getattr(days, "index", None))
+
+
+def compact_frame(raw: pd.DataFrame, columns: List[str] = PRICE_COLUMNS) -> pd.DataFrame:
+    """Converts raw Agmarknet rows into the compact schema (rows without a date are dropped)."""
+    df = pd.DataFrame(index=raw.index)
+    for col in columns:
+        if col in CATEGORY_COLUMNS:
+            df[col] = raw[col].astype("category")
+        elif col in FLOAT_COLUMNS:
+            df[col] = pd.to_numeric(raw[col], errors="coerce").astype(np.float32)
+
+    dates = raw[DATE_COL]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = parse_report_dates(dates)
+    keep = dates.notna()
+    df = df[keep]
+    df[DATE_COL] = to_day_numbers(dates[keep])
+    return df
+
+
+def concat_compact(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenates compact frames, keeping categorical columns categorical."""
+    frames = [f for f in frames if f is not None and len(f)]
+    if not frames:
+        return pd.DataFrame(columns=PRICE_COLUMNS)
+    out = pd.concat(frames, ignore_index=True)
+    for col in CATEGORY_COLUMNS:
+        if col in out.columns and not isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype("category")
+    return out
+
+
+def load_price_dataset(crop_name: str) -> Optional[pd.DataFrame]:
+    """
+    Reads one commodity into the compact schema, sorted by (district, market,
+    date). Uses the ingested price store when there is one, otherwise the CSV
+    in data/. Returns None if there is neither.
+    """
+    manifest = read_manifest(crop_name)
+    if manifest is not None:
+        _, parts = read_partitions(crop_name, manifest)
+        df = concat_compact([frame[PRICE_COLUMNS] for frame in parts.values()])
+        df = df.sort_values([DISTRICT_COL, MARKET_COL, DATE_COL], kind="stable").reset_index(drop=True)
+        log(f"[Data] Loaded {crop_name} from price store: {len(df)} rows, {frame_bytes(df) / 1e6:.2f} MB")
+        return df
+
+    path = price_csv_path(crop_name)
+    if path is None:
+        log(f"[Data] No price CSV for '{crop_name}'.")
+        return None
+    df = read_price_csv(path, PRICE_COLUMNS)
+    if df is None:
+        return None
+    df = df.sort_values([DISTRICT_COL, MARKET_COL, DATE_COL], kind="stable").reset_index(drop=True)
+    log(f"[Data] Loaded {path}: {len(df)} rows, {frame_bytes(df) / 1e6:.2f} MB")
+    return df
+
+
+def read_price_csv(path: str, columns: List[str] = PRICE_COLUMNS) -> Optional[pd.DataFrame]:
+    try:
+        raw = pd.read_csv(
+            path,
+            usecols=columns,
+            dtype={col: "category" for col in columns if col in CATEGORY_COLUMNS},
+        )
+    except Exception as e:
+        log_exception(f"[Data] Failed to read {path}", e)
+        return None
+    return compact_frame(raw, columns)
+
+
+# --- 3. Ingested price store ---
+# instance/prices/<commodity>/manifest.json lists one partition per district:
+#   {"partitions": {"<district key>": {"district", "file", "rows", "version",
+#                                      "watermark", "markets": {market: watermark}}}}
+
+def store_dir(crop_name: str) -> str:
+    return os.path.join(PRICE_STORE_DIR, normalise_name(crop_name))
+
+
+def partition_key(district_name: str) -> str:
+    return normalise_name(district_name) or "unknown"
+
+
+def read_manifest(crop_name: str) -> Optional[Dict]:
+    """The store manifest for a commodity (re-read only when it changes on disk)."""
+    key = normalise_name(crop_name)
+    path = os.path.join(store_dir(key), "manifest.json")
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _MANIFESTS.get(key)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path) as f:
+        manifest = json.load(f)
+    manifest["_mtime"] = mtime
+    _MANIFESTS[key] = (mtime, manifest)
+    return manifest
+
+
+def read_partition(crop_name: str, part: Dict) -> pd.DataFrame:
+    return pd.read_pickle(os.path.join(store_dir(crop_name), part["file"]))
+
+
+def read_partitions(crop_name: str, manifest: Dict, pkeys: Optional[List[str]] = None):
+    """
+    (manifest, {pkey: frame}) for all partitions of one manifest, or only
+    `pkeys`. An ingest deletes the partition files its new manifest
+    supersedes; if one disappears mid-read, the read restarts from the new
+    manifest, so the frames never mix two versions of the store.
+    """
+    for _ in range(READ_RETRIES):
+        try:
+            return manifest, {pkey: read_partition(crop_name, part)
+                              for pkey, part in manifest["partitions"].items() if pkeys is None or pkey in pkeys}
+        except FileNotFoundError:
+            latest = read_manifest(crop_name)
+            if latest is None or latest["_mtime"] == manifest["_mtime"]:
+                raise
+            manifest = latest
+    raise RuntimeError(f"Price store for {crop_name} kept changing while it was read")
+
+
+def store_version(crop_name: str):
+    manifest = read_manifest(crop_name)
+    return manifest["_mtime"] if manifest else None
+
+
+# --- 4. Process-wide cache ---
+
+def get_price_dataset(crop_name: str) -> Optional[pd.DataFrame]:
+    """
+    Cached `load_price_dataset`. Reloaded when the price store changes (one
+    stat() per call). Callers must not modify the frame.
+    """
+    key = normalise_name(crop_name)
+    version = store_version(key)
+    entry = _CACHE.get(key)
+    if entry is None or entry[0] != version:
+        with _CACHE_LOCK:
+            entry = _CACHE.get(key)
+            if entry is None or entry[0] != version:
+                df = load_price_dataset(crop_name)
+                if df is None:
+                    return None
+                entry = (version, df)
+                _CACHE[key] = entry
+    return entry[1]
+
+
+def get_district_prices(crop_name: str, district_name: str) -> Optional[pd.DataFrame]:
+    """
+    Compact rows for one commodity in one district. With a price store only
+    that district's partition is read; otherwise the full dataset is sliced.
+    """
+    manifest = read_manifest(crop_name)
+    if manifest is None:
+        df = get_price_dataset(crop_name)
+        return district_slice(df, district_name) if df is not None else None
+
+    pkey = partition_key(district_name)
+    part = manifest["partitions"].get(pkey)
+    if part is None:
+        return pd.DataFrame(columns=PRICE_COLUMNS)
+    cache_key = (normalise_name(crop_name), pkey)
+    entry = _PARTITION_CACHE.get(cache_key)
+    if entry is None or entry[0] != part["version"]:
+        # Cached under the version of the manifest the frame was actually read with
+        manifest, parts = read_partitions(crop_name, manifest, [pkey])
+        if pkey not in parts:
+            return pd.DataFrame(columns=PRICE_COLUMNS)
+        entry = (manifest["partitions"][pkey]["version"], parts[pkey][PRICE_COLUMNS])
+        _PARTITION_CACHE[cache_key] = entry
+    return entry[1]
+
+
+def invalidate_price_dataset(crop_name: Optional[str] = None):
+    """Drops one commodity (or everything) from the in-process caches."""
+    global _PRICE_FILES
+    with _CACHE_LOCK:
+        if crop_name is None:
+            _CACHE.clear()
+            _PARTITION_CACHE.clear()
+            _MANIFESTS.clear()
+            _PRICE_FILES = None
+        else:
+            key = normalise_name(crop_name)
+            _CACHE.pop(key, None)
+            _MANIFESTS.pop(key, None)
+            for cache_key in [k for k in _PARTITION_CACHE if k[0] == key]:
+                _PARTITION_CACHE.pop(cache_key, None)
+
+
+def preload_price_datasets() -> List[str]:
+    """Loads every commodity into the cache; returns the commodities loaded."""
+    loaded = []
+    for key in known_commodities():
+        if get_price_dataset(key) is not None:
+            loaded.append(key)
+    return loaded
+
+
+# --- 5. Slicing helpers ---
+
+def match_category(series: pd.Series, value: str) -> pd.Series:
+    """
+    Case/whitespace-insensitive equality on a categorical column. Only the
+    (few hundred) categories are normalised, not every row.
+    """
+    target = str(value).strip().lower()
+    cats = series.cat.categories
+    hits = np.flatnonzero(cats.astype(str).str.strip().str.lower() == target)
+    return pd.Series(np.isin(series.cat.codes.values, hits), index=series.index)
+
+
+def district_slice(df: pd.DataFrame, district_name: str) -> pd.DataFrame:
+    return df[match_category(df[DISTRICT_COL], district_name).values]
+
+
+def with_datetimes(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of a compact slice with the date column expanded to datetime64."""
+    out = df.copy()
+    out[DATE_COL] = from_day_numbers(out[DATE_COL].values).values
+    return out
+
+
+# --- 6. Memory report ---
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def memory_report(compare_raw: bool = False) -> pd.DataFrame:
+    """
+    Per-commodity row counts and in-memory size of the compact frames.
+    With `compare_raw`, also measures a plain `pd.read_csv` of each file.
+    """
+    rows = []
+    for key in known_commodities():
+        df = get_price_dataset(key)
+        if df is None:
+            continue
+        manifest = read_manifest(key)
+        path = price_csv_path(key)
+        name = manifest["commodity"] if manifest else os.path.basename(path)[:-4]
+        row = {"commodity": name, "rows": len(df), "compact_mb": frame_bytes(df) / 1e6}
+        if compare_raw and path:
+            row["raw_mb"] = frame_bytes(pd.read_csv(path)) / 1e6
+            row["ratio"] = row["raw_mb"] / row["compact_mb"] if row["compact_mb"] else np.nan
+        elif compare_raw:
+            row["raw_mb"], row["ratio"] = np.nan, np.nan
+        rows.append(row)
+
+    report = pd.DataFrame(rows).sort_values("compact_mb", ascending=False).reset_index(drop=True)
+    if not report.empty:
+        total = report.drop(columns="commodity").sum(numeric_only=True)
+        total["commodity"] = "TOTAL"
+        if compare_raw:
+            total["ratio"] = total["raw_mb"] / total["compact_mb"]
+        report = pd.concat([report, total.to_frame().T], ignore_index=True)
+        report["rows"] = report["rows"].astype(int)
+    return report
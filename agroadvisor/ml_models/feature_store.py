@@ -0,0 +1,235 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+
+from .utils import log, log_exception, FEATURE_STORE_DIR
+from .dataset import normalise_name
+from .predictor import get_weather_data, clean_prices, weather_frame, merge_features, WEATHER_COLUMNS
+
+# --- Configuration ---
+# Bump whenever merge_features or the frame columns change: stored frames
+# with another version are rebuilt on first use
+SCHEMA_VERSION = 2
+# While the weather archive lags behind the prices, retry it at most this often
+WEATHER_RETRY = pd.Timedelta(hours=6)
+# Loaded entries kept in memory per process
+MEMORY_CACHE_SIZE = 32
+
+_MEMORY: "OrderedDict[str, Tuple[int, Dict]]" = OrderedDict()
+_LOCK = threading.Lock()
+_BUILD_LOCKS: Dict[str, threading.Lock] = {}
+
+ONE_DAY = pd.Timedelta(days=1)
+
+
+# --- 1. Storage ---
+
+def feature_path(crop_name: str, district_name: str, market_name: str) -> str:
+    return os.path.join(
+        FEATURE_STORE_DIR,
+        normalise_name(crop_name),
+        f"{normalise_name(district_name)}__{normalise_name(market_name)}.pkl",
+    )
+
+
+def load_entry(path: str) -> Optional[Dict]:
+    """
+    {"schema", "frame", "weather", "final_through", "final_rows",
+    "pending_through", "weather_checked_at"} from memory or disk (reloaded if the file changed).
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _LOCK:
+        cached = _MEMORY.get(path)
+        if cached and cached[0] == mtime:
+            _MEMORY.move_to_end(path)
+            return cached[1]
+    try:
+        entry = pd.read_pickle(path)
+    except Exception as e:
+        log_exception(f"[Features] Could not load {path}", e)
+        return None
+    _remember(path, mtime, entry)
+    return entry
+
+
+def read_features(path: str) -> Optional[pd.DataFrame]:
+    entry = load_entry(path)
+    return entry["frame"] if entry else None
+
+
+def save_entry(path: str, entry: Dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    pd.to_pickle(entry, tmp)
+    os.replace(tmp, path)
+    _remember(path, os.stat(path).st_mtime_ns, entry)
+
+
+def _remember(path: str, mtime: int, entry: Dict):
+    with _LOCK:
+        _MEMORY[path] = (mtime, entry)
+        _MEMORY.move_to_end(path)
+        while len(_MEMORY) > MEMORY_CACHE_SIZE:
+            _MEMORY.popitem(last=False)
+
+
+def _build_lock(path: str) -> threading.Lock:
+    with _LOCK:
+        return _BUILD_LOCKS.setdefault(path, threading.Lock())
+
+
+# --- 2. Weather ---
+
+def _fetch_weather(lat: float, lon: float, start: pd.Timestamp, end: pd.Timestamp, session) -> pd.DataFrame:
+    """Archive weather for [start, end]; days the archive has not filled in yet are dropped."""
+    data = get_weather_data(lat, lon, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"),
+                            is_forecast=False, session=session)
+    if not data:
+        return pd.DataFrame(columns=["date"] + WEATHER_COLUMNS)
+    weather = weather_frame(data)
+    return weather.dropna(subset=WEATHER_COLUMNS, how="all")[["date"] + WEATHER_COLUMNS]
+
+
+def _missing_ranges(weather: Optional[pd.DataFrame], prices: pd.DataFrame) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """The (start, end) weather ranges the stored frame lacks for these prices."""
+    first, last = prices["date"].min(), prices["date"].max()
+    if weather is None or weather.empty:
+        return [(first, last)]
+    ranges = []
+    if first < weather["date"].min() - ONE_DAY:
+        ranges.append((first, weather["date"].min() - ONE_DAY))
+    if last > weather["date"].max():
+        ranges.append((weather["date"].max() + ONE_DAY, last))
+    return ranges
+
+
+def _extend_weather(weather: Optional[pd.DataFrame], prices: pd.DataFrame, lat: float, lon: float,
+                    session) -> Tuple[pd.DataFrame, bool]:
+    """Fetches only the weather days the stored frame is missing. Returns (weather, fetched)."""
+    ranges = _missing_ranges(weather, prices)
+    if weather is None or weather.empty:
+        return _fetch_weather(lat, lon, *ranges[0], session), True
+    if not ranges:
+        return weather, False
+
+    parts = [weather]
+    for start, end in ranges:
+        fetched = _fetch_weather(lat, lon, start, end, session)
+        if start < weather["date"].min():
+            parts.insert(0, fetched)
+        else:
+            parts.append(fetched)
+    merged = pd.concat(parts, ignore_index=True).drop_duplicates("date", keep="last")
+    return merged.sort_values("date").reset_index(drop=True), True
+
+
+# --- 3. Feature frames ---
+
+def get_features(crop_name: str, district_name: str, market_name: str, lat: float, lon: float,
+                 market_df: pd.DataFrame, session) -> Optional[pd.DataFrame]:
+    """
+    The merged price + weather frame (as returned by preprocess_data) for one
+    market, kept in instance/features/. Only price days newer than the stored
+    frame are merged, and only weather days it does not have are fetched.
+    `market_df` holds the market's raw price rows.
+    """
+    path = feature_path(crop_name, district_name, market_name)
+    with _build_lock(path):
+        try:
+            prices = clean_prices(market_df)
+            if prices.empty:
+                log("[Features] No price rows left after cleaning.")
+                return None
+            entry = _current_entry(path)
+            return _refresh(path, entry, prices, lat, lon, session)
+        except Exception as e:
+            log_exception(f"[Features] {crop_name}/{market_name} failed", e)
+            return None
+
+
+def _state(entry: Optional[Dict], prices: pd.DataFrame, now: pd.Timestamp) -> Tuple[bool, pd.DataFrame, bool]:
+    """(incremental, pending rows, up_to_date) for a stored entry and the current prices."""
+    final_through = entry["final_through"] if entry else None
+    # Rows up to final_through are merged for good; a changed count there means
+    # old days were backfilled, so everything is re-merged (weather is reused)
+    incremental = entry is not None and int((prices["date"] <= final_through).sum()) == entry["final_rows"]
+    pending = prices[prices["date"] > final_through] if incremental else prices
+    up_to_date = incremental and (pending.empty or (
+        pending["date"].max() <= entry["pending_through"]
+        and now - entry["weather_checked_at"] < WEATHER_RETRY
+    ))
+    return incremental, pending, up_to_date
+
+
+def _current_entry(path: str) -> Optional[Dict]:
+    entry = load_entry(path)
+    if entry is not None and entry.get("schema") != SCHEMA_VERSION:
+        log(f"[Features] {path}: schema {entry.get('schema')} -> {SCHEMA_VERSION}, rebuilding.")
+        return None
+    return entry
+
+
+def weather_gaps(crop_name: str, district_name: str, market_name: str,
+                 market_df: pd.DataFrame) -> List[Tuple[str, str]]:
+    """
+    The ('YYYY-MM-DD', 'YYYY-MM-DD') archive ranges the next get_features call
+    for this market would fetch, so callers warming many markets can fetch
+    them together first (see predictor.prefetch_weather).
+    """
+    prices = clean_prices(market_df)
+    if prices.empty:
+        return []
+    entry = _current_entry(feature_path(crop_name, district_name, market_name))
+    if _state(entry, prices, pd.Timestamp(datetime.now()))[2]:
+        return []
+    return [(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+            for start, end in _missing_ranges(entry["weather"] if entry else None, prices)]
+
+
+def _refresh(path: str, entry: Optional[Dict], prices: pd.DataFrame, lat: float, lon: float,
+             session) -> Optional[pd.DataFrame]:
+    now = pd.Timestamp(datetime.now())
+    weather = entry["weather"] if entry else None
+    final_through = entry["final_through"] if entry else None
+    incremental, pending, up_to_date = _state(entry, prices, now)
+    if up_to_date:
+        return entry["frame"]
+
+    weather, fetched = _extend_weather(weather, prices, lat, lon, session)
+    if weather.empty:
+        log("[Features] No weather data for this market.")
+        return None
+
+    if incremental:
+        stored = entry["frame"]
+        # Full weather and price history: season rain and lags look back from the new rows
+        tail = merge_features(pending, weather, history=prices)
+        frame = pd.concat([stored[stored["date"] <= final_through], tail], ignore_index=True)
+        action = f"+{len(tail)} rows"
+    else:
+        frame = merge_features(prices, weather)
+        action = "built"
+
+    # merge_features takes the nearest weather day within +-1 day, so a price
+    # day is final once the day after it has weather
+    final_through = min(weather["date"].max() - ONE_DAY, prices["date"].max())
+    entry = {
+        "schema": SCHEMA_VERSION,
+        "frame": frame,
+        "weather": weather,
+        "final_through": final_through,
+        "final_rows": int((prices["date"] <= final_through).sum()),
+        "pending_through": prices["date"].max(),
+        "weather_checked_at": now if fetched else entry["weather_checked_at"],
+    }
+    save_entry(path, entry)
+    log(f"[Features] {os.path.basename(path)}: {action}, {len(frame)} rows through "
+        f"{frame['date'].max().date() if len(frame) else '-'}")
+    return frame
+
@@ -0,0 +1,142 @@
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+# History features only look at prices at least LAG_DAYS before the row, so
+# everything they need is known when forecasting PREDICTION_FUTURE_DAYS ahead
+LAG_DAYS = 90
+YEAR_LAG_DAYS = 365
+ROLLING_WINDOWS = (30, 90)
+# The monsoon (kharif) season, and cumulative rainfall, restarts on 1 June
+SEASON_START_MONTH = 6
+CLIMATOLOGY_WINDOW_DAYS = 7
+
+CALENDAR_FEATURES = ["doy", "month", "year", "dow"]
+WEATHER_FEATURES = ["temp_max", "temp_min", "precip", "season_rain"]
+HISTORY_FEATURES = (
+    [f"price_lag_{LAG_DAYS}", f"price_lag_{YEAR_LAG_DAYS}"]
+    + [f"price_mean_{w}" for w in ROLLING_WINDOWS]
+    + [f"price_cv_{ROLLING_WINDOWS[-1]}"]
+    + [f"arrivals_mean_{w}" for w in ROLLING_WINDOWS]
+)
+FEATURES = WEATHER_FEATURES + CALENDAR_FEATURES + HISTORY_FEATURES
+TARGET = "modal_price"
+
+
+# --- 1. Price history ---
+
+def rolling_history(prices: pd.DataFrame, by: Optional[str] = None) -> pd.DataFrame:
+    """
+    One row per (group, day) with the last price and the rolling windows
+    ending on that day. `prices` needs date, modal_price and arrivals_tonnes
+    (plus `by` to compute every market of a commodity in one pass).
+    """
+    keys = ([by] if by else []) + ["date"]
+    daily = (
+        prices.groupby(keys, observed=True, sort=True)[["modal_price", "arrivals_tonnes"]]
+        .mean()
+        .reset_index()
+    )
+    daily["arrivals_tonnes"] = daily["arrivals_tonnes"].fillna(0)
+    source = daily.groupby(by, observed=True, sort=False) if by else daily
+
+    out = daily[keys].copy()
+    out["price_last"] = daily["modal_price"].to_numpy()
+    for w in ROLLING_WINDOWS:
+        rolled = source.rolling(f"{w}D", on="date")
+        out[f"price_mean_{w}"] = rolled["modal_price"].mean().to_numpy()
+        out[f"arrivals_mean_{w}"] = rolled["arrivals_tonnes"].mean().to_numpy()
+    w = ROLLING_WINDOWS[-1]
+    std = source.rolling(f"{w}D", on="date")["modal_price"].std().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[f"price_cv_{w}"] = np.nan_to_num(std / out[f"price_mean_{w}"].to_numpy())
+    return out
+
+
+def _lookup(left: pd.DataFrame, history: pd.DataFrame, lag_days: int, columns: Sequence[str],
+            by: Optional[str], tolerance: Optional[pd.Timedelta] = None) -> pd.DataFrame:
+    """The latest `history` row at or before (date - lag_days), for every row of `left`."""
+    keys = ([by] if by else [])
+    probe = left[keys].copy()
+    probe["lookup"] = (left["date"] - pd.Timedelta(days=lag_days)).astype("datetime64[ns]")
+    probe["_row"] = np.arange(len(left))
+    right = history[keys + ["date"] + list(columns)].rename(columns={"date": "lookup"})
+    right["lookup"] = right["lookup"].astype("datetime64[ns]")
+    merged = pd.merge_asof(
+        probe.sort_values("lookup"), right.sort_values("lookup"),
+        on="lookup", by=by, direction="backward", tolerance=tolerance,
+    )
+    return merged.sort_values("_row")[list(columns)].reset_index(drop=True)
+
+
+def history_features(frame: pd.DataFrame, prices: pd.DataFrame, by: Optional[str] = None) -> pd.DataFrame:
+    """
+    HISTORY_FEATURES for every (date[, by]) row of `frame`, computed from
+    `prices` (the full cleaned price history). Rows with less than LAG_DAYS
+    of history before them get NaN.
+    """
+    history = rolling_history(prices, by)
+    rolling_cols = [c for c in HISTORY_FEATURES if c.startswith(("price_mean", "price_cv", "arrivals_mean"))]
+    out = _lookup(frame, history, LAG_DAYS, ["price_last"] + rolling_cols, by)
+    out = out.rename(columns={"price_last": f"price_lag_{LAG_DAYS}"})
+
+    # Same season last year; markets without one fall back to the 90-day mean
+    year_ago = _lookup(frame, history, YEAR_LAG_DAYS, ["price_last"], by, tolerance=pd.Timedelta(days=30))
+    out[f"price_lag_{YEAR_LAG_DAYS}"] = year_ago["price_last"].fillna(out[f"price_mean_{ROLLING_WINDOWS[-1]}"])
+    return out[HISTORY_FEATURES]
+
+
+# --- 2. Seasonal rainfall ---
+
+def season_year(dates: pd.Series) -> pd.Series:
+    return dates.dt.year - (dates.dt.month < SEASON_START_MONTH).astype(int)
+
+
+def add_season_rain(weather_df: pd.DataFrame) -> pd.DataFrame:
+    """Adds 'season_rain': precipitation summed since the start of the season."""
+    weather_df = weather_df.sort_values("date").reset_index(drop=True)
+    precip = pd.to_numeric(weather_df["precip"], errors="coerce").fillna(0)
+    weather_df["season_rain"] = precip.groupby(season_year(weather_df["date"]).to_numpy()).cumsum().to_numpy()
+    return weather_df
+
+
+def days_into_season(dates: pd.Series) -> np.ndarray:
+    starts = pd.to_datetime({"year": season_year(dates), "month": SEASON_START_MONTH, "day": 1})
+    return (dates - starts).dt.days.to_numpy()
+
+
+def climatology(frame: pd.DataFrame, future_date: datetime, columns: Sequence[str]) -> Dict[str, float]:
+    """
+    Typical value of each column for the day of the season of `future_date`:
+    the mean over past years within CLIMATOLOGY_WINDOW_DAYS of it.
+    """
+    if frame is None or frame.empty:
+        return {c: 0.0 for c in columns}
+    target = days_into_season(pd.Series([pd.Timestamp(future_date)]))[0]
+    offsets = days_into_season(frame["date"])
+    near = np.abs(offsets - target) <= CLIMATOLOGY_WINDOW_DAYS
+    typical = {}
+    for c in columns:
+        values = pd.to_numeric(frame[c], errors="coerce").to_numpy(dtype=float)
+        values = values[near] if near.any() else values
+        typical[c] = float(np.nanmean(values)) if len(values) and not np.isnan(values).all() else 0.0
+    return typical
+
+
+def season_rain_climatology(frame: pd.DataFrame, future_date: datetime) -> float:
+    """
+    Typical 'season_rain' for the day of the season of `future_date`. Used at
+    forecast time, when the rainfall still to come is unknown.
+    """
+    return climatology(frame, future_date, ["season_rain"])["season_rain"]
+
+
+# --- 3. Forecast-time rows ---
+
+def history_at(prices: pd.DataFrame, future_date: datetime) -> Dict[str, float]:
+    """HISTORY_FEATURES for a single future date (same definitions as for training)."""
+    probe = pd.DataFrame({"date": [pd.Timestamp(future_date).normalize()]})
+    row = history_features(probe, prices).iloc[0]
+    return {c: float(row[c]) for c in HISTORY_FEATURES}
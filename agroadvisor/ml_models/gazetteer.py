@@ -0,0 +1,158 @@
+import os
+import re
+import json
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import pandas as pd
+
+from .utils import log, log_exception, GEO_CACHE_FILE
+
+# --- Configuration ---
+MARKET_LIST_FILE = os.path.join('data', 'agmarknet_state_district_market.csv')
+# Minimum trigram (Jaccard) similarity for a fuzzy name match
+FUZZY_THRESHOLD = 0.6
+
+_LOCK = threading.Lock()
+_GAZETTEER: Optional["Gazetteer"] = None
+_GAZETTEER_MTIME: Optional[int] = None
+
+
+class Match(NamedTuple):
+    lat: float
+    lon: float
+    # 'exact', 'fuzzy' or 'district'
+    method: str
+    name: str
+
+
+# --- 1. Names ---
+
+def clean_name(name) -> str:
+    """'Binny Mill (F&V), Bangalore' -> 'binny mill f v bangalore'."""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(name).lower()).split())
+
+
+def trigrams(name: str) -> set:
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Fuzzy lookup of names by the share of trigrams they have in common."""
+
+    def __init__(self, names: List[str]):
+        self.names = names
+        self.sizes = [len(trigrams(n)) for n in names]
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        for i, name in enumerate(names):
+            for gram in trigrams(name):
+                self.postings[gram].append(i)
+
+    def best(self, name: str, threshold: float = FUZZY_THRESHOLD) -> Optional[Tuple[int, float]]:
+        """(index, similarity) of the most similar name, or None below `threshold`."""
+        grams = trigrams(name)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        best, best_score = None, threshold
+        for i, common in shared.items():
+            score = common / (len(grams) + self.sizes[i] - common)
+            if score >= best_score:
+                best, best_score = i, score
+        return (best, best_score) if best is not None else None
+
+
+# --- 2. The gazetteer ---
+
+class Gazetteer:
+    """
+    Known market coordinates (from the geo cache) indexed for exact, fuzzy
+    and district-centroid lookups. The Agmarknet market list supplies the
+    state of places cached under a placeholder state ('India').
+    """
+
+    def __init__(self, geo_cache: Dict, markets: pd.DataFrame):
+        self.state_of_district = {
+            clean_name(d): clean_name(s)
+            for d, s in markets[["district", "state"]].drop_duplicates("district").itertuples(index=False)
+        }
+
+        rows = []
+        for key, value in geo_cache.items():
+            parts = key.split("|")
+            if len(parts) != 3 or value.get("lat") is None or value.get("lon") is None:
+                continue
+            market, district, state = (clean_name(p) for p in parts)
+            state = self.state_of_district.get(district, state)
+            rows.append((key, market, district, state, float(value["lat"]), float(value["lon"]),
+                         value.get("name") or parts[0]))
+        self.places = pd.DataFrame(rows, columns=["key", "market", "district", "state", "lat", "lon", "name"])
+
+        self.matches = [Match(lat, lon, "exact", name) for lat, lon, name
+                        in self.places[["lat", "lon", "name"]].itertuples(index=False)]
+        self.exact = {key: i for i, key in enumerate(self.places["key"])}
+        self.market_index = TrigramIndex((self.places["market"] + " " + self.places["district"]).tolist())
+
+        districts = self.places.groupby("district")[["lat", "lon"]].mean()
+        self.district_names = districts.index.tolist()
+        self.district_centroids = districts.to_numpy()
+        self.district_index = TrigramIndex(self.district_names)
+
+    def __len__(self):
+        return len(self.places)
+
+    def _place(self, i: int, method: str) -> Match:
+        return self.matches[i]._replace(method=method)
+
+    def lookup(self, market_name: str, district: str, state: str) -> Optional[Match]:
+        """Local coordinates for a market: exact key, fuzzy market name, then district centroid."""
+        i = self.exact.get(f"{market_name}|{district}|{state}".lower())
+        if i is not None:
+            return self.matches[i]
+
+        hit = self.market_index.best(f"{clean_name(market_name)} {clean_name(district)}")
+        if hit is not None:
+            return self._place(hit[0], "fuzzy")
+
+        hit = self.district_index.best(clean_name(district))
+        if hit is not None:
+            lat, lon = self.district_centroids[hit[0]]
+            return Match(float(lat), float(lon), "district", self.district_names[hit[0]])
+        return None
+
+
+# --- 3. Loading ---
+
+def _load_markets() -> pd.DataFrame:
+    try:
+        return pd.read_csv(MARKET_LIST_FILE, usecols=["state", "district", "market"], dtype=str).dropna()
+    except Exception as e:
+        log_exception(f"[Gazetteer] Could not read {MARKET_LIST_FILE}", e)
+        return pd.DataFrame(columns=["state", "district", "market"])
+
+
+def get_gazetteer() -> Gazetteer:
+    """The process-wide gazetteer, rebuilt when the geo cache file changes."""
+    global _GAZETTEER, _GAZETTEER_MTIME
+    try:
+        mtime = os.stat(GEO_CACHE_FILE).st_mtime_ns
+    except OSError:
+        mtime = None
+    if _GAZETTEER is not None and mtime == _GAZETTEER_MTIME:
+        return _GAZETTEER
+
+    with _LOCK:
+        if _GAZETTEER is None or mtime != _GAZETTEER_MTIME:
+            geo_cache = {}
+            if mtime is not None:
+                try:
+                    with open(GEO_CACHE_FILE, "r") as f:
+                        geo_cache = json.load(f)
+                except Exception as e:
+                    log_exception("[Gazetteer] Could not read the geo cache", e)
+            _GAZETTEER = Gazetteer(geo_cache, _load_markets())
+            _GAZETTEER_MTIME = mtime
+            log(f"[Gazetteer] Indexed {len(_GAZETTEER)} known markets "
+                f"in {len(_GAZETTEER.district_names)} districts")
+    return _GAZETTEER
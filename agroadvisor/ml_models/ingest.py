@@ -0,0 +1,337 @@
+import os
+import copy
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from .utils import log, log_exception
+from .dataset import (
+    ARCHIVE_COLUMNS, CATEGORY_COLUMNS, DATE_COL, DISTRICT_COL, MARKET_COL, VARIETY_COL, GRADE_COL,
+    compact_frame, parse_report_dates, to_day_numbers, normalise_name,
+    price_csv_path, price_files, store_dir, partition_key, read_manifest, read_partition, read_partitions,
+    invalidate_price_dataset,
+)
+
+# Rows are unique on (market, variety, grade, date)
+KEY_COLUMNS = [MARKET_COL, VARIETY_COL, GRADE_COL]
+
+# Called as hook(commodity_key, changes) after every ingest that adds rows
+_INGEST_HOOKS: List[Callable[[str, Dict], None]] = []
+# Changes whose hooks have not run yet (replayed by the next ingest after a crash)
+PENDING_FILE = "pending_changes.json"
+_STORE_LOCKS: Dict[str, threading.Lock] = {}
+_STORE_LOCKS_GUARD = threading.Lock()
+
+
+def register_ingest_hook(hook: Callable[[str, Dict], None]):
+    """
+    Registers a callback for changed partitions. `changes` maps each changed
+    district key to {"district", "rows_added", "first_new_date", "markets"}.
+    """
+    if hook not in _INGEST_HOOKS:
+        _INGEST_HOOKS.append(hook)
+    return hook
+
+
+# --- 1. Hash index ---
+
+def row_hashes(raw: pd.DataFrame, days: np.ndarray) -> np.ndarray:
+    """uint64 hash of the dedup key of every row (case/whitespace-insensitive)."""
+    keys = pd.DataFrame({
+        col: raw[col].astype(str).str.strip().str.lower().values for col in KEY_COLUMNS
+    })
+    keys["day"] = days
+    return pd.util.hash_pandas_object(keys, index=False).values
+
+
+def _keys_path(crop_name: str) -> str:
+    return os.path.join(store_dir(crop_name), "keys.npy")
+
+
+def load_key_index(crop_name: str, manifest: Optional[Dict] = None) -> np.ndarray:
+    """
+    The sorted hash index. If it does not match the manifest's key count (a
+    crash between writing the two), it is rebuilt from the stored partitions.
+    """
+    path = _keys_path(crop_name)
+    index = np.load(path) if os.path.exists(path) else np.empty(0, dtype=np.uint64)
+    expected = (manifest or {}).get("keys")
+    if expected is None or expected == len(index):
+        return index
+    log(f"[Ingest] {crop_name}: key index has {len(index)} keys, manifest {expected}; rebuilding.")
+    _, parts = read_partitions(crop_name, manifest)
+    hashes = [row_hashes(frame, frame[DATE_COL].to_numpy()) for frame in parts.values()]
+    index = np.unique(np.concatenate(hashes)) if hashes else np.empty(0, dtype=np.uint64)
+    _atomic_write(path, _write_npy(index))
+    return index
+
+
+def unseen_mask(hashes: np.ndarray, index: np.ndarray) -> np.ndarray:
+    """True for hashes not in the sorted `index` (binary search, no re-sort)."""
+    if len(index) == 0:
+        return np.ones(len(hashes), dtype=bool)
+    pos = np.searchsorted(index, hashes)
+    pos[pos == len(index)] = 0
+    return index[pos] != hashes
+
+
+def merge_key_index(index: np.ndarray, new_hashes: np.ndarray) -> np.ndarray:
+    """Inserts new (unique, unseen) hashes into the sorted index."""
+    new_hashes = np.sort(new_hashes)
+    return np.insert(index, np.searchsorted(index, new_hashes), new_hashes)
+
+
+# --- 2. Writing ---
+
+def _atomic_write(path: str, writer: Callable[[str], None]):
+    tmp = path + ".tmp"
+    writer(tmp)
+    os.replace(tmp, path)
+
+
+def _write_npy(array: np.ndarray) -> Callable[[str], None]:
+    def writer(path):
+        with open(path, "wb") as f:
+            np.save(f, array)
+    return writer
+
+
+def _write_json(data: Dict) -> Callable[[str], None]:
+    def writer(path):
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1)
+    return writer
+
+
+def _iso(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+
+@contextmanager
+def _store_lock(directory: str):
+    """Serialises ingests of one commodity, across threads and processes."""
+    with _STORE_LOCKS_GUARD:
+        lock = _STORE_LOCKS.setdefault(directory, threading.Lock())
+    with lock, open(os.path.join(directory, ".lock"), "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _run_hooks(key: str, changes: Dict):
+    for hook in list(_INGEST_HOOKS):
+        try:
+            hook(key, changes)
+        except Exception as e:
+            log_exception(f"[Ingest] Hook {getattr(hook, '__name__', hook)} failed", e)
+
+
+def _replay_pending(key: str, directory: str, manifest: Optional[Dict]):
+    """Runs the hooks of an ingest that crashed after its manifest landed."""
+    path = os.path.join(directory, PENDING_FILE)
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        pending = json.load(f)
+    if manifest is not None and manifest.get("generation", 0) >= pending["generation"]:
+        log(f"[Ingest] {key}: replaying hooks of an interrupted ingest.")
+        invalidate_price_dataset(key)
+        _run_hooks(key, pending["changes"])
+    os.remove(path)
+
+
+def _remove_superseded(directory: str, manifest: Dict):
+    """Deletes partition files the manifest no longer references (replaced or orphaned by a crash)."""
+    live = {part["file"] for part in manifest["partitions"].values()}
+    for name in os.listdir(directory):
+        if name.endswith(".pkl") and name not in live:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError as e:
+                log_exception(f"[Ingest] Could not remove {name}", e)
+
+
+def _merge_partition(existing: Optional[pd.DataFrame], new_rows: pd.DataFrame) -> pd.DataFrame:
+    """Adds rows to one district partition, keeping it sorted by (market, date)."""
+    frames = [new_rows] if existing is None else [existing, new_rows]
+    merged = pd.concat(frames, ignore_index=True)
+    for col in CATEGORY_COLUMNS:
+        merged[col] = merged[col].astype("category").cat.remove_unused_categories()
+    # Only this district is re-sorted; the existing part is already in order
+    return merged.sort_values([MARKET_COL, DATE_COL], kind="stable").reset_index(drop=True)
+
+
+def ingest_frame(crop_name: str, raw: pd.DataFrame) -> Dict:
+    """
+    Appends raw Agmarknet rows for one commodity to the price store.
+    Duplicates (within the batch or already stored) are dropped. Returns the
+    changed partitions (empty if nothing was new).
+
+    Changed partitions are written to new versioned files, and the manifest
+    swap makes them visible all at once; the key index follows it, and the
+    superseded files are deleted last. Ingests of a commodity are serialised.
+    """
+    key = normalise_name(crop_name)
+    directory = store_dir(key)
+    os.makedirs(directory, exist_ok=True)
+
+    missing = [c for c in ARCHIVE_COLUMNS if c not in raw.columns]
+    if missing:
+        raise ValueError(f"Export is missing columns: {missing}")
+
+    dates = raw[DATE_COL]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = parse_report_dates(dates)
+    raw = raw.loc[dates.notna()].copy()
+    raw[DATE_COL] = dates[dates.notna()]
+    days = to_day_numbers(raw[DATE_COL])
+    hashes = row_hashes(raw, days)
+
+    with _store_lock(directory):
+        current = read_manifest(key)
+        _replay_pending(key, directory, current)
+        if current is not None:
+            # Left behind if the previous ingest was interrupted
+            _remove_superseded(directory, current)
+
+        # --- Deduplicate with the hash index ---
+        index = load_key_index(key, current)
+        fresh = unseen_mask(hashes, index) & ~pd.Index(hashes).duplicated()
+        if not fresh.any():
+            log(f"[Ingest] {crop_name}: {len(raw)} rows, nothing new.")
+            return {}
+
+        new_rows = compact_frame(raw.loc[fresh], ARCHIVE_COLUMNS)
+        new_rows[DISTRICT_COL] = new_rows[DISTRICT_COL].astype(str).str.strip().astype("category")
+        # A private copy: the cached manifest is still what readers see
+        manifest = copy.deepcopy(current) if current else {"commodity": crop_name, "partitions": {}}
+        manifest.pop("_mtime", None)
+        manifest["generation"] = manifest.get("generation", 0) + 1
+
+        # --- Merge into the changed district partitions only ---
+        changes = {}
+        for district, rows in new_rows.groupby(DISTRICT_COL, observed=True, sort=False):
+            pkey = partition_key(district)
+            part = manifest["partitions"].get(pkey)
+            existing = read_partition(key, part) if part else None
+            merged = _merge_partition(existing, rows)
+
+            version = (part["version"] + 1) if part else 1
+            fname = f"{pkey}.v{version}.pkl"
+            _atomic_write(os.path.join(directory, fname), lambda p: merged.to_pickle(p, compression=None))
+
+            market_watermarks = merged.groupby(MARKET_COL, observed=True)[DATE_COL].max()
+            manifest["partitions"][pkey] = {
+                "district": str(district),
+                "file": fname,
+                "rows": int(len(merged)),
+                "version": version,
+                "watermark": _iso(merged[DATE_COL].max()),
+                "markets": {str(m): _iso(d) for m, d in market_watermarks.items()},
+            }
+            changes[pkey] = {
+                "district": str(district),
+                "rows_added": int(len(rows)),
+                "first_new_date": _iso(rows[DATE_COL].min()),
+                "markets": {str(m): int(n) for m, n in rows[MARKET_COL].value_counts().items() if n},
+            }
+
+        index = merge_key_index(index, hashes[fresh])
+        manifest["updated_at"] = datetime.now().isoformat(timespec="seconds")
+        manifest["rows"] = int(sum(p["rows"] for p in manifest["partitions"].values()))
+        manifest["keys"] = int(len(index))
+
+        # Recorded first, so a crash before the hooks run is replayed next time
+        pending = os.path.join(directory, PENDING_FILE)
+        _atomic_write(pending, _write_json({"generation": manifest["generation"], "changes": changes}))
+        # The swap: readers move to the new partitions all at once
+        _atomic_write(os.path.join(directory, "manifest.json"), _write_json(manifest))
+        # A crash here leaves the index short of manifest["keys"]; it is rebuilt on the next ingest
+        _atomic_write(_keys_path(key), _write_npy(index))
+        _remove_superseded(directory, manifest)
+
+        invalidate_price_dataset(key)
+        added = sum(c["rows_added"] for c in changes.values())
+        log(f"[Ingest] {crop_name}: {added} new rows in {len(changes)} district partition(s).")
+        _run_hooks(key, changes)
+        os.remove(pending)
+    return changes
+
+
+# --- 3. Entry points ---
+
+def read_export(path: str) -> pd.DataFrame:
+    """Reads an Agmarknet export (CSV) with the dedup and store columns."""
+    wanted = set(ARCHIVE_COLUMNS) | {"Commodity"}
+    return pd.read_csv(path, usecols=lambda c: c in wanted,
+                       dtype={c: "category" for c in CATEGORY_COLUMNS})
+
+
+def bootstrap_commodity(crop_name: str) -> Dict:
+    """Seeds the store for one commodity from its CSV in data/."""
+    path = price_csv_path(crop_name)
+    if path is None:
+        raise FileNotFoundError(f"No price CSV in data/ for '{crop_name}'")
+    return ingest_frame(crop_name, read_export(path))
+
+
+def ingest_export(path: str, crop_name: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Ingests one export file. Without `crop_name` the rows are split by their
+    'Commodity' column. Commodities with no store yet are seeded from data/
+    first. Returns {commodity key: changes}.
+    """
+    started = time.perf_counter()
+    raw = read_export(path)
+    if crop_name:
+        groups = [(crop_name, raw)]
+    elif "Commodity" in raw.columns:
+        groups = list(raw.groupby("Commodity", observed=True, sort=False))
+    else:
+        raise ValueError(f"{path} has no 'Commodity' column; pass the commodity explicitly.")
+
+    all_changes = {}
+    for commodity, rows in groups:
+        commodity = str(commodity)
+        if read_manifest(commodity) is None and price_csv_path(commodity):
+            log(f"[Ingest] Seeding store for {commodity} from data/ first.")
+            bootstrap_commodity(commodity)
+        changes = ingest_frame(commodity, rows)
+        if changes:
+            all_changes[normalise_name(commodity)] = changes
+
+    log(f"[Ingest] {path} done in {time.perf_counter() - started:.2f}s")
+    return all_changes
+
+
+def bootstrap_all() -> List[str]:
+    """Seeds the store for every commodity CSV in data/ that has no store yet."""
+    seeded = []
+    for key, path in price_files().items():
+        if read_manifest(key) is None:
+            bootstrap_commodity(os.path.basename(path)[:-4])
+            seeded.append(key)
+    return seeded
+
+
+def watermarks(crop_name: str) -> Dict[str, str]:
+    """{district: latest stored date} for one commodity."""
+    manifest = read_manifest(crop_name) or {"partitions": {}}
+    return {p["district"]: p["watermark"] for p in manifest["partitions"].values()}
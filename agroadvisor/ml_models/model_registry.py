@@ -0,0 +1,180 @@
+import os
+import copy
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import joblib
+import pandas as pd
+from sklearn.metrics import r2_score
+
+from .utils import log, log_exception, MODEL_STORE_DIR
+from .dataset import normalise_name
+from .predictor import train_model, update_model, mape, FEATURES, TARGET
+from .backends import choose_backend, is_incremental
+
+# --- Refresh policy ---
+# Fewer new rows than this: keep serving the cached model as-is
+MIN_NEW_ROWS = 5
+# Full refit when the error on the new rows exceeds DRIFT_FACTOR x the error
+# measured at the last full fit (and is above MIN_DRIFT_MAPE) ...
+DRIFT_FACTOR = 1.5
+MIN_DRIFT_MAPE = 0.05
+# ... or after this many incremental updates in a row
+MAX_INCREMENTAL_UPDATES = 12
+# Loaded models kept in memory per process
+MEMORY_CACHE_SIZE = 32
+
+_MEMORY: "OrderedDict[str, Tuple[int, Dict]]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+# --- 1. Storage ---
+
+def model_path(crop_name: str, district_name: str, market_name: str) -> str:
+    return os.path.join(
+        MODEL_STORE_DIR,
+        normalise_name(crop_name),
+        f"{normalise_name(district_name)}__{normalise_name(market_name)}.joblib",
+    )
+
+
+def load_entry(path: str) -> Optional[Dict]:
+    """{"model": ..., "meta": {...}} from memory or disk (reloaded if the file changed)."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _LOCK:
+        cached = _MEMORY.get(path)
+        if cached and cached[0] == mtime:
+            _MEMORY.move_to_end(path)
+            return cached[1]
+    try:
+        entry = joblib.load(path)
+    except Exception as e:
+        log_exception(f"[Registry] Could not load {path}", e)
+        return None
+    _remember(path, mtime, entry)
+    return entry
+
+
+def save_entry(path: str, entry: Dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    joblib.dump(entry, tmp)
+    os.replace(tmp, path)
+    _remember(path, os.stat(path).st_mtime_ns, entry)
+
+
+def _remember(path: str, mtime: int, entry: Dict):
+    with _LOCK:
+        _MEMORY[path] = (mtime, entry)
+        _MEMORY.move_to_end(path)
+        while len(_MEMORY) > MEMORY_CACHE_SIZE:
+            _MEMORY.popitem(last=False)
+
+
+# --- 2. Policy ---
+
+def _full_fit(df: pd.DataFrame, reason: str) -> Tuple[Optional[object], Dict, Dict]:
+    model, metrics = train_model(df)
+    meta = {
+        "watermark": df["date"].max().strftime("%Y-%m-%d"),
+        "rows": int(len(df)),
+        "baseline_mape": metrics.get("mape", 0.0),
+        "mape": metrics.get("mape", 0.0),
+        "r2_score": metrics.get("r2_score", 0.0),
+        "backend": metrics.get("backend"),
+        "features": list(FEATURES),
+        "fit_seconds": metrics.get("fit_seconds", 0.0),
+        "incremental_updates": 0,
+        "full_fit_at": datetime.now().isoformat(timespec="seconds"),
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+        "last_action": f"full fit ({reason})",
+    }
+    return model, metrics, meta
+
+
+def refresh_decision(meta: Dict, new_rows: pd.DataFrame, drift_mape: float) -> Tuple[str, str]:
+    """('reuse' | 'incremental' | 'refit', reason) for a cached model given the new rows."""
+    if len(new_rows) < MIN_NEW_ROWS:
+        return "reuse", f"only {len(new_rows)} new rows"
+    baseline = meta.get("baseline_mape") or 0.0
+    if drift_mape > max(baseline * DRIFT_FACTOR, MIN_DRIFT_MAPE):
+        return "refit", f"drift: MAPE {drift_mape:.3f} vs baseline {baseline:.3f}"
+    # Only forests can be updated in place; the other backends are cheap to refit
+    backend = meta.get("backend", "forest")
+    if not is_incremental(backend):
+        return "refit", f"{backend} is refitted in full"
+    if meta.get("incremental_updates", 0) >= MAX_INCREMENTAL_UPDATES:
+        return "refit", f"{MAX_INCREMENTAL_UPDATES} incremental updates since last full fit"
+    return "incremental", "new rows within drift tolerance"
+
+
+def get_price_model(crop_name: str, district_name: str, market_name: str,
+                    df: pd.DataFrame) -> Tuple[Optional[object], Dict]:
+    """
+    Returns a price model for one market, fitted on `df` (the preprocessed
+    frame). A cached model is reused while no new rows have arrived, updated
+    incrementally when a few have, and fully refitted when it has drifted.
+    """
+    path = model_path(crop_name, district_name, market_name)
+    entry = load_entry(path)
+
+    if entry is not None and entry["meta"].get("features") != FEATURES:
+        log(f"[Registry] {crop_name}/{market_name}: feature set changed, refitting.")
+        entry = None
+
+    if entry is None:
+        model, metrics, meta = _full_fit(df, "no cached model")
+        if model is not None:
+            save_entry(path, {"model": model, "meta": meta})
+        return model, metrics
+
+    model, meta = entry["model"], dict(entry["meta"])
+    watermark = pd.Timestamp(meta["watermark"])
+    new_rows = df[df["date"] > watermark]
+    metrics = {"r2_score": meta.get("r2_score", 0.0), "mape": meta.get("mape", meta.get("baseline_mape", 0.0)),
+               "train_rows": meta.get("rows", 0), "backend": meta.get("backend", "forest")}
+    if new_rows.empty:
+        return model, metrics
+
+    predicted = model.predict(new_rows[FEATURES])
+    drift_mape = mape(new_rows[TARGET], predicted)
+    decision, reason = refresh_decision(meta, new_rows, drift_mape)
+    wanted = choose_backend(len(df))
+    if decision != "reuse" and wanted != meta.get("backend", "forest"):
+        decision, reason = "refit", f"backend {meta.get('backend', 'forest')} -> {wanted}"
+    log(f"[Registry] {crop_name}/{market_name}: {len(new_rows)} new rows -> {decision} ({reason})")
+
+    if decision == "reuse":
+        return model, metrics
+
+    if decision == "incremental":
+        # Update a copy: the cached model may be serving other requests
+        updated = update_model(copy.deepcopy(model), df)
+        if updated is not None:
+            # The new trees are fitted on the new rows, so the updated forest
+            # has no held-out data: its accuracy is the one measured on those
+            # rows before they were learned
+            r2 = float(r2_score(new_rows[TARGET], predicted))
+            metrics.update({"r2_score": r2, "mape": drift_mape, "train_rows": int(len(df))})
+            meta.update({
+                "watermark": df["date"].max().strftime("%Y-%m-%d"),
+                "rows": int(len(df)),
+                "r2_score": r2,
+                "mape": drift_mape,
+                "incremental_updates": meta.get("incremental_updates", 0) + 1,
+                "last_drift_mape": drift_mape,
+                "updated_at": datetime.now().isoformat(timespec="seconds"),
+                "last_action": "incremental",
+            })
+            save_entry(path, {"model": updated, "meta": meta})
+            return updated, metrics
+        reason = "incremental update failed"
+
+    model, metrics, meta = _full_fit(df, reason)
+    if model is not None:
+        save_entry(path, {"model": model, "meta": meta})
+    return model, metrics
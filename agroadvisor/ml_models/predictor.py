@@ -11,15 +11,35 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import r2_score
 
 from .utils import log, log_exception, setup_session, GEO_CACHE_FILE
+from .dataset import get_district_prices, with_datetimes
+from .backends import make_estimator, choose_backend
+from .gazetteer import get_gazetteer
+from .weather_cache import snap, shared_fetch, cached, prime, FORECAST_TTL, ARCHIVE_TTL
+from .weather_client import WeatherQuery, fetch_one, fetch_batch
+from .features import (
+    FEATURES, TARGET, HISTORY_FEATURES, add_season_rain, history_features, history_at,
+    season_rain_climatology,
+)
 
 # --- Configuration ---
 # Path is relative to the project root
 DATA_DIR = 'data' 
-OPEN_METEO_ARCHIVE = "https://archive-api.open-meteo.com/v1/archive"
-OPEN_METEO_FORECAST = "https://api.open-meteo.com/v1/forecast"
+DAILY_WEATHER = ("weathercode", "temperature_2m_max", "temperature_2m_min", "precipitation_sum")
 GEOCODER_API = "https://geocode.maps.co/search"
+# Set GEOCODER_OFFLINE=1 to geocode from the local gazetteer only; after an API
+# failure it is not asked again for GEOCODER_RETRY_SECONDS
+GEOCODER_OFFLINE = os.environ.get("GEOCODER_OFFLINE", "").lower() in ("1", "true", "yes")
+GEOCODER_RETRY_SECONDS = 300
 PREDICTION_FUTURE_DAYS = 90
 
+# Incremental refresh: trees added (and oldest retired) per update, fitted on
+# the most recent RECENT_WINDOW_DAYS of history
+INCREMENTAL_TREES = 20
+RECENT_WINDOW_DAYS = 730
+MIN_RECENT_ROWS = 200
+
+_geocoder_down_until = 0.0
+
 # --- 1. Geocoding & Weather ---
 
 def load_geo_cache() -> Dict:
@@ -33,21 +53,34 @@ def load_geo_cache() -> Dict:
 
 def save_geo_cache(cache: Dict):
     try:
-        with open(GEO_CACHE_FILE, "w") as f:
+        # Atomic: the gazetteer reloads the file whenever it changes
+        tmp = GEO_CACHE_FILE + ".tmp"
+        with open(tmp, "w") as f:
             json.dump(cache, f, indent=2)
+        os.replace(tmp, GEO_CACHE_FILE)
     except Exception as e:
         log(f"[Geocode] Warning: Failed to save cache: {e}")
 
 def geocode_market(market_name: str, district: str, state: str, session: requests.Session) -> Tuple[Optional[float], Optional[float]]:
-    cache = load_geo_cache()
+    """
+    Coordinates from the local gazetteer (exact, fuzzy or district centroid);
+    the geocoding API is only asked about places it has never seen. Returns
+    (None, None) if it cannot be placed, rather than guessing a location.
+    """
+    gazetteer = get_gazetteer()
+    match = gazetteer.lookup(market_name, district, state)
+    if match is not None:
+        if match.method != "exact":
+            log(f"[Geocode] {market_name}, {district}: {match.method} match '{match.name}'")
+        return match.lat, match.lon
+
     key = f"{market_name}|{district}|{state}".lower()
-    
-    if key in cache:
-        log(f"[Geocode] Cache HIT for {key}")
-        return cache[key]["lat"], cache[key]["lon"]
-    
-    log(f"[Geocode] Cache MISS for {key}. Querying API...")
     query = f"{market_name}, {district}, {state}"
+    if GEOCODER_OFFLINE or time.monotonic() < _geocoder_down_until:
+        log(f"[Geocode] Geocoder offline, cannot place {query}")
+        return None, None
+
+    log(f"[Geocode] Not in gazetteer: {key}. Querying API...")
     try:
         res = session.get(GEOCODER_API, params={"q": query}, timeout=10)
         res.raise_for_status()
@@ -61,6 +94,7 @@ def geocode_market(market_name: str, district: str, state: str, session: request
         lat = float(chosen["lat"])
         lon = float(chosen["lon"])
         
+        cache = load_geo_cache()
         cache[key] = {"lat": lat, "lon": lon, "name": chosen.get("display_name")}
         save_geo_cache(cache)
         log(f"[Geocode] Success: {query} -> {lat}, {lon}")
@@ -68,112 +102,171 @@ def geocode_market(market_name: str, district: str, state: str, session: request
         
     except Exception as e:
         log_exception(f"[Geocode] API query failed for {query}", e)
+        _mark_geocoder_down()
         return None, None
 
+def _mark_geocoder_down():
+    global _geocoder_down_until
+    _geocoder_down_until = time.monotonic() + GEOCODER_RETRY_SECONDS
+
+def _weather_key(lat: float, lon: float, start_date: str, end_date: str, is_forecast: bool) -> Tuple[Tuple, float]:
+    """Shared-cache key and TTL for snapped coordinates."""
+    if is_forecast:
+        return ("forecast", lat, lon), FORECAST_TTL
+    return ("archive", lat, lon, start_date, end_date), ARCHIVE_TTL
+
 def get_weather_data(lat: float, lon: float, start_date: str, end_date: str, is_forecast: bool, session: requests.Session) -> Optional[Dict]:
-    url = OPEN_METEO_FORECAST if is_forecast else OPEN_METEO_ARCHIVE
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "daily": "weathercode,temperature_2m_max,temperature_2m_min,precipitation_sum",
-        "timezone": "auto"
-    }
-    
+    """
+    Daily weather for a location, fetched once per snapped location (and date
+    range) per request and shared across requests for a while, so crops whose
+    markets sit in the same place cost one API call.
+    """
+    lat, lon = snap(lat, lon)
+    key, ttl = _weather_key(lat, lon, start_date, end_date, is_forecast)
+    return shared_fetch(key, ttl, lambda: _fetch_weather_data(lat, lon, start_date, end_date, is_forecast, session))
+
+def prefetch_weather(locations: List[Tuple[float, float, Optional[str], Optional[str]]], is_forecast: bool,
+                     session: requests.Session) -> int:
+    """
+    Fetches daily weather for many (lat, lon, start_date, end_date) at once,
+    in multi-location calls, into the shared cache that get_weather_data
+    reads. Locations already cached are skipped. Returns how many were fetched.
+    """
+    wanted = {}
+    for lat, lon, start_date, end_date in locations:
+        lat, lon = snap(lat, lon)
+        key, ttl = _weather_key(lat, lon, start_date, end_date, is_forecast)
+        if key not in wanted and cached(key) is None:
+            wanted[key] = (weather_query(lat, lon, start_date, end_date, is_forecast), ttl)
+    if not wanted:
+        return 0
+    payloads = fetch_batch([query for query, _ in wanted.values()], session)
+    for (key, (query, ttl)), payload in zip(wanted.items(), payloads):
+        prime(key, ttl, daily_weather(payload))
+    return len(wanted)
+
+def weather_query(lat: float, lon: float, start_date: str, end_date: str, is_forecast: bool) -> WeatherQuery:
     if is_forecast:
-        params["forecast_days"] = 16
-    else:
-        params["start_date"] = start_date
-        params["end_date"] = end_date
+        return WeatherQuery(lat, lon, forecast=True, daily=DAILY_WEATHER, extra=(("forecast_days", 16),))
+    return WeatherQuery(lat, lon, start_date=start_date, end_date=end_date, daily=DAILY_WEATHER)
 
-    try:
-        res = session.get(url, params=params, timeout=10)
-        res.raise_for_status()
-        data = res.json()
-        
-        if not data.get("daily") or not data["daily"].get("time"):
-            log(f"[Weather] API returned no daily data for {lat},{lon}")
-            return None
-            
-        weather_dict = {}
-        for i, date_str in enumerate(data["daily"]["time"]):
-            weather_dict[date_str] = {
-                "temp_max": data["daily"]["temperature_2m_max"][i],
-                "temp_min": data["daily"]["temperature_2m_min"][i],
-                "precip": data["daily"]["precipitation_sum"][i],
-                "wmo": data["daily"]["weathercode"][i]
-            }
-        log(f"[Weather] Fetched {len(weather_dict)} days of data for {lat},{lon}")
-        return weather_dict
-        
-    except Exception as e:
-        log_exception(f"[Weather] API query failed for {lat},{lon}", e)
+def daily_weather(data: Optional[Dict]) -> Optional[Dict]:
+    """{date_str: {"temp_max", "temp_min", "precip", "wmo"}} from an Open-Meteo payload."""
+    if not data or not data.get("daily") or not data["daily"].get("time"):
+        return None
+    daily = data["daily"]
+    return {
+        date_str: {
+            "temp_max": daily["temperature_2m_max"][i],
+            "temp_min": daily["temperature_2m_min"][i],
+            "precip": daily["precipitation_sum"][i],
+            "wmo": daily["weathercode"][i],
+        }
+        for i, date_str in enumerate(daily["time"])
+    }
+
+def _fetch_weather_data(lat: float, lon: float, start_date: str, end_date: str, is_forecast: bool, session: requests.Session) -> Optional[Dict]:
+    data = fetch_one(weather_query(lat, lon, start_date, end_date, is_forecast), session, timeout=10)
+    if data is None:
+        return None
+    weather_dict = daily_weather(data)
+    if weather_dict is None:
+        log(f"[Weather] API returned no daily data for {lat},{lon}")
         return None
+    log(f"[Weather] Fetched {len(weather_dict)} days of data for {lat},{lon}")
+    return weather_dict
 
 # --- 2. Model Training & Prediction ---
 
+# Columns of the merged frame returned by preprocess_data (FEATURES are
+# defined in features.py)
+FRAME_COLUMNS = ["date", TARGET, "arrivals_tonnes"] + FEATURES
+WEATHER_COLUMNS = ["temp_max", "temp_min", "precip"]
+
+def clean_prices(df: pd.DataFrame) -> pd.DataFrame:
+    """Price rows renamed to (date, modal_price, arrivals_tonnes), cleaned and sorted."""
+    # Rename the column to 'modal_price' (lowercase)
+    df = df.rename(columns={
+        "Reported Date": "date",
+        "Modal Price (Rs./Quintal)": "modal_price",
+        "Arrivals (Tonnes)": "arrivals_tonnes"
+    })
+
+    # Normalise to ns so merge_asof keys match whatever the source resolution
+    df["date"] = pd.to_datetime(df["date"], dayfirst=True, errors='coerce').astype("datetime64[ns]")
+    df["modal_price"] = pd.to_numeric(df["modal_price"], errors="coerce")
+    df["arrivals_tonnes"] = pd.to_numeric(df["arrivals_tonnes"], errors="coerce")
+    
+    df = df.dropna(subset=["date", "modal_price"])
+    return df.sort_values(by="date").reset_index(drop=True)
+
+def weather_frame(weather_data: Dict) -> pd.DataFrame:
+    """The {date_str: {...}} dict from get_weather_data as a frame sorted by date."""
+    weather_df = pd.DataFrame.from_dict(weather_data, orient="index")
+    weather_df.index.name = "date_str"
+    weather_df = weather_df.reset_index()
+    weather_df["date"] = pd.to_datetime(weather_df["date_str"]).astype("datetime64[ns]")
+    return weather_df.sort_values("date").reset_index(drop=True)
+
+def merge_features(df: pd.DataFrame, weather_df: pd.DataFrame, history: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Joins cleaned prices to the nearest weather day (within 1 day) and derives
+    calendar, seasonal-rain and lagged price features. `history` is the full
+    cleaned price history the lags are taken from (default: `df` itself).
+    """
+    merged = pd.merge_asof(
+        df.sort_values("date"),
+        add_season_rain(weather_df),
+        on="date",
+        direction="nearest",
+        tolerance=pd.Timedelta(days=1)
+    )
+    
+    merged["doy"] = merged["date"].dt.dayofyear
+    merged["month"] = merged["date"].dt.month
+    merged["year"] = merged["date"].dt.year
+    merged["dow"] = merged["date"].dt.weekday
+    merged["arrivals_tonnes"] = merged["arrivals_tonnes"].fillna(0)
+    merged[HISTORY_FEATURES] = history_features(merged, df if history is None else history).to_numpy()
+    
+    # Also drops the first LAG_DAYS of history, which have no lagged prices
+    merged = merged.dropna(subset=[col for col in FRAME_COLUMNS if col not in ["arrivals_tonnes"]])
+    # Return only the model columns
+    return merged[FRAME_COLUMNS].reset_index(drop=True)
+
 def preprocess_data(df: pd.DataFrame, weather_data: Dict) -> Optional[pd.DataFrame]:
     try:
-        # Rename the column to 'modal_price' (lowercase)
-        df = df.rename(columns={
-            "Reported Date": "date",
-            "Modal Price (Rs./Quintal)": "modal_price",
-            "Arrivals (Tonnes)": "arrivals_tonnes"
-        })
-
-        df["date"] = pd.to_datetime(df["date"], dayfirst=True, errors='coerce')
-        df["modal_price"] = pd.to_numeric(df["modal_price"], errors="coerce")
-        df["arrivals_tonnes"] = pd.to_numeric(df["arrivals_tonnes"], errors="coerce")
-        
-        df = df.dropna(subset=["date", "modal_price"])
-        df = df.sort_values(by="date").reset_index(drop=True)
-        
+        df = clean_prices(df)
         if df.empty:
             log("[Preprocess] No data left after cleaning.")
             return None
 
-        weather_df = pd.DataFrame.from_dict(weather_data, orient="index")
-        weather_df.index.name = "date_str"
-        weather_df = weather_df.reset_index()
-        weather_df["date"] = pd.to_datetime(weather_df["date_str"])
-        
-        merged = pd.merge_asof(
-            df.sort_values("date"),
-            weather_df.sort_values("date"),
-            on="date",
-            direction="nearest",
-            tolerance=pd.Timedelta(days=1)
-        )
-        
-        merged["doy"] = merged["date"].dt.dayofyear
-        merged["month"] = merged["date"].dt.month
-        merged["year"] = merged["date"].dt.year
-        merged["dow"] = merged["date"].dt.weekday
-        merged["arrivals_tonnes"] = merged["arrivals_tonnes"].fillna(0)
-        
-        # The 'final_cols' list must use 'modal_price' (lowercase)
-        final_cols = [
-            "date", "modal_price", "arrivals_tonnes", "temp_max", "temp_min", 
-            "precip", "doy", "month", "year", "dow"
-        ]
-        
-        merged = merged.dropna(subset=[col for col in final_cols if col not in ["arrivals_tonnes"]])
+        merged = merge_features(df, weather_frame(weather_data))
         log(f"[Preprocess] Merged with weather, final shape: {merged.shape}")
-        
-        # Return only the columns in final_cols
-        return merged[final_cols] 
+        return merged
         
     except Exception as e:
         log_exception(f"[Preprocess] Failed: {e}", e)
         return None
 
-def train_model(df: pd.DataFrame) -> Tuple[Optional[object], Dict]:
-    metrics = {"r2_score": 0.0, "train_rows": 0}
+def mape(y_true, y_pred) -> float:
+    """Mean absolute percentage error (as a fraction), ignoring zero prices."""
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    mask = y_true != 0
+    if not mask.any():
+        return 0.0
+    return float(np.mean(np.abs((y_true[mask] - y_pred[mask]) / y_true[mask])))
+
+def train_model(df: pd.DataFrame, backend: Optional[str] = None) -> Tuple[Optional[object], Dict]:
+    """
+    Fits a price model on a preprocessed frame. `backend` names one of
+    backends.BACKENDS; by default it is chosen from the number of rows.
+    """
+    metrics = {"r2_score": 0.0, "mape": 0.0, "train_rows": 0, "backend": backend, "fit_seconds": 0.0}
     try:
-        features = ["arrivals_tonnes", "temp_max", "temp_min", "precip", "doy", "month", "year", "dow"]
-        target = "modal_price" # Use the lowercase version
-        
-        X = df[features]
-        y = df[target]
+        X = df[FEATURES]
+        y = df[TARGET]
         
         if X.empty or y.empty or len(X) < 20:
             log("[Model] Not enough data to train.")
@@ -181,33 +274,77 @@ def train_model(df: pd.DataFrame) -> Tuple[Optional[object], Dict]:
 
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         metrics["train_rows"] = len(X_train)
+        metrics["backend"] = backend = backend or choose_backend(len(X))
         
-        model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1, max_depth=10)
+        started = time.perf_counter()
+        model = make_estimator(backend)
         model.fit(X_train, y_train)
+        metrics["fit_seconds"] = time.perf_counter() - started
         
         if not y_test.empty:
             y_pred = model.predict(X_test)
             metrics["r2_score"] = float(r2_score(y_test, y_pred))
+            metrics["mape"] = mape(y_test, y_pred)
         
-        log(f"[Model] Trained. R2={metrics['r2_score']:.4f}")
+        log(f"[Model] Trained {backend} in {metrics['fit_seconds'] * 1000:.1f} ms. R2={metrics['r2_score']:.4f}")
         return model, metrics
         
     except Exception as e:
         log_exception("[Model] Training failed", e)
         return None, metrics
 
-def forecast(model: object, future_date: datetime, weather_features: Dict, last_arrival: float) -> Optional[float]:
+def update_model(model: object, df: pd.DataFrame, new_trees: int = INCREMENTAL_TREES,
+                 window_days: int = RECENT_WINDOW_DAYS) -> Optional[object]:
+    """
+    Incrementally refreshes a fitted forest: `new_trees` trees are fitted on
+    the most recent `window_days` of data (warm_start) and the same number of
+    the oldest trees are retired, so the forest size stays constant.
+    Sparse markets use at least the last MIN_RECENT_ROWS rows instead.
+    Returns None for models that cannot be updated this way.
+    """
+    if not isinstance(model, RandomForestRegressor):
+        return None
     try:
-        feat_row = {
-            "arrivals_tonnes": last_arrival,
-            "temp_max": float(weather_features.get("temp_max", 0.0)),
-            "temp_min": float(weather_features.get("temp_min", 0.0)),
-            "precip": float(weather_features.get("precip", 0.0)),
-            "doy": int(future_date.timetuple().tm_yday),
-            "month": int(future_date.month),
-            "year": int(future_date.year),
-            "dow": int(future_date.weekday()),
-        }
+        in_window = int((df["date"] >= df["date"].max() - pd.Timedelta(days=window_days)).sum())
+        recent = df.iloc[-max(in_window, min(len(df), MIN_RECENT_ROWS)):]
+        if len(recent) < 20:
+            log("[Model] Not enough recent data for an incremental update.")
+            return None
+
+        n_old = len(model.estimators_)
+        model.set_params(warm_start=True, n_estimators=n_old + new_trees)
+        model.fit(recent[FEATURES], recent[TARGET])
+        model.estimators_ = model.estimators_[new_trees:]
+        model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+
+        log(f"[Model] Incremental update: +{new_trees} trees on {len(recent)} recent rows.")
+        return model
+
+    except Exception as e:
+        log_exception("[Model] Incremental update failed", e)
+        return None
+
+def forecast_features(future_date: datetime, weather_features: Dict, history: Dict) -> Dict:
+    """
+    The model's feature row for one future date. `history` holds the
+    HISTORY_FEATURES and 'season_rain' for that date (see features.history_at).
+    """
+    row = {
+        "temp_max": float(weather_features.get("temp_max", 0.0)),
+        "temp_min": float(weather_features.get("temp_min", 0.0)),
+        "precip": float(weather_features.get("precip", 0.0)),
+        "season_rain": float(history.get("season_rain", 0.0)),
+        "doy": int(future_date.timetuple().tm_yday),
+        "month": int(future_date.month),
+        "year": int(future_date.year),
+        "dow": int(future_date.weekday()),
+    }
+    row.update({c: float(history[c]) for c in HISTORY_FEATURES})
+    return row
+
+def forecast(model: object, future_date: datetime, weather_features: Dict, history: Dict) -> Optional[float]:
+    try:
+        feat_row = forecast_features(future_date, weather_features, history)
         
         pred_price = float(model.predict(pd.DataFrame([feat_row]))[0])
         return pred_price
@@ -218,29 +355,31 @@ def forecast(model: object, future_date: datetime, weather_features: Dict, last_
 
 # --- 3. Main Orchestrator ---
 
-def run_price_prediction(crop_name: str, district_name: str, session: requests.Session) -> Optional[Dict]:
-    """Main function to process a single crop for price."""
-    
-    csv_file = os.path.join(DATA_DIR, f"{crop_name.lower().replace('/','_')}.csv")
+def memoized(memo: Optional[Dict], key: Tuple, fn, *args, **kwargs):
+    """fn(*args, **kwargs), computed once per `key` when a memo dict is given."""
+    if memo is None:
+        return fn(*args, **kwargs)
+    if key not in memo:
+        memo[key] = fn(*args, **kwargs)
+    return memo[key]
+
+def run_price_prediction(crop_name: str, district_name: str, session: requests.Session,
+                         memo: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Main function to process a single crop for price. Callers handling many
+    crops/districts at once can pass a shared `memo` dict so each market is
+    geocoded once (forecast weather is shared by get_weather_data itself).
+    """
     
-    if not os.path.exists(csv_file):
-        log(f"[Data] Price CSV not found: {csv_file}. Skipping price forecast.")
-        return None
-        
-    try:
-        raw_df = pd.read_csv(csv_file)
-    except Exception as e:
-        log_exception(f"[Data] Failed to read {csv_file}", e)
+    # Compact, process-cached rows for this district (categoricals + float32 +
+    # int32 days), read from the ingested price store when there is one.
+    district_df = get_district_prices(crop_name, district_name)
+    if district_df is None:
+        log(f"[Data] Price data not found for '{crop_name}'. Skipping price forecast.")
         return None
-
-    # --- THIS IS THE FIX for AttributeError ---
-    # We convert the 'District Name' column to string, fill NaNs, and then compare
-    district_series = raw_df["District Name"].astype(str).fillna('').str.strip().str.lower()
-    district_df = raw_df[district_series == district_name.strip().lower()].copy()
-    # --- END OF FIX ---
     
     if district_df.empty:
-        log(f"[Data] No data found for district '{district_name}' in '{csv_file}'.")
+        log(f"[Data] No data found for district '{district_name}' for '{crop_name}'.")
         return None
         
     try:
@@ -251,29 +390,30 @@ def run_price_prediction(crop_name: str, district_name: str, session: requests.S
         log_exception(f"[Data] Could not determine market/state from CSV", e)
         return None
         
-    market_df = district_df[district_df["Market Name"] == target_market].copy()
+    market_df = with_datetimes(district_df[district_df["Market Name"] == target_market])
 
-    lat, lon = geocode_market(target_market, district_name, target_state, session)
+    lat, lon = memoized(memo, ("geocode", target_market, district_name, target_state),
+                        geocode_market, target_market, district_name, target_state, session)
     if lat is None:
         log(f"[Weather] Could not geocode market '{target_market}'.")
         return None
 
-    min_date = pd.to_datetime(market_df["Reported Date"], dayfirst=True, errors='coerce').min().strftime("%Y-%m-%d")
-    max_date = pd.to_datetime(market_df["Reported Date"], dayfirst=True, errors='coerce').max().strftime("%Y-%m-%d")
-    
-    hist_weather = get_weather_data(lat, lon, min_date, max_date, is_forecast=False, session=session)
+    # Shared by every crop whose market snaps to the same location
     future_weather_data = get_weather_data(lat, lon, None, None, is_forecast=True, session=session)
-
-    if not hist_weather or not future_weather_data:
+    if not future_weather_data:
         log("[Weather] Failed to get weather data.")
         return None
 
-    processed_df = preprocess_data(market_df, hist_weather)
+    # Merged price + weather frame, extended only by the days it is missing
+    from .feature_store import get_features
+    processed_df = get_features(crop_name, district_name, target_market, lat, lon, market_df, session)
     if processed_df is None or processed_df.empty:
         log("[Preprocess] No data after preprocessing.")
         return None
         
-    model, metrics = train_model(processed_df)
+    # Cached per market; refreshed incrementally as new rows arrive
+    from .model_registry import get_price_model
+    model, metrics = get_price_model(crop_name, district_name, target_market, processed_df)
     if model is None:
         log("[Model] Model training failed.")
         return None
@@ -283,8 +423,11 @@ def run_price_prediction(crop_name: str, district_name: str, session: requests.S
     weather_for_future = future_weather_data[latest_forecast_date_str]
     log(f"[Forecast] Using weather from {latest_forecast_date_str} for future date {future_date.date()}")
 
-    last_arrival = processed_df.iloc[-1]["arrivals_tonnes"]
-    predicted_price = forecast(model, future_date, weather_for_future, last_arrival)
+    # Lagged prices are all known today; rainfall still to come is taken
+    # from the seasonal climatology
+    history = history_at(clean_prices(market_df), future_date)
+    history["season_rain"] = season_rain_climatology(processed_df, future_date)
+    predicted_price = forecast(model, future_date, weather_for_future, history)
     
     if predicted_price is None:
         return None
@@ -2,6 +2,9 @@ import pandas as pd
 import joblib
 import os
 from .utils import log, log_exception
+from .yield_table import YieldTable, load_yield_table
+from .yield_stats import YieldStats, load_yield_stats
+from .suitability import rank_crops, failed_constraints, suitable_crops, load_requirements
 
 # --- File Paths ---
 # Paths are relative to the project root (agroadvisor_project/)
@@ -12,28 +15,36 @@ YIELD_CSV = os.path.join(DATA_DIR, 'crop-wise-area-production-yield.csv')
 YIELD_MODEL_FILE = os.path.join(MODEL_DIR, 'yield_model.joblib')
 CROP_MODEL_FILE = os.path.join(MODEL_DIR, 'advanced_crop_model.joblib')
 
+def _load_model(path: str, label: str):
+    """A joblib model, or None if it cannot be loaded (the recommender then falls back)."""
+    try:
+        log(f"Loading {label} from {path}...")
+        model = joblib.load(path)
+        log(f"{label.capitalize()} loaded.")
+        return model
+    except Exception as e:
+        log_exception(f"Could not load {label}", e)
+        return None
+
 def load_recommender_data():
-    """Loads all data files and the model needed for the recommender."""
+    """
+    Loads all data files and the models needed for the recommender. A model
+    that fails to load is None: crops are then ranked by the rule-based
+    suitability engine and/or without a yield score.
+    """
     try:
         log("Loading recommender data files...")
-        log(f"Reading: {YIELD_CSV}")
-        df_yield = pd.read_csv(YIELD_CSV)
-        
-        log(f"Loading yield model from {YIELD_MODEL_FILE}...")
-        yield_model = joblib.load(YIELD_MODEL_FILE)
-        log("Yield model loaded.")
-
-        log(f"Loading advanced crop model from {CROP_MODEL_FILE}...")
-        crop_model = joblib.load(CROP_MODEL_FILE)
-        log("Advanced crop model loaded.")
-
-        avg_yield_lookup = df_yield.groupby('crop_name').agg(
-            Avg_Yield=('yield', 'mean'),
-            Unit=('yield_unit', 'first')
-        ).to_dict('index')
-        
+        # Prebuilt per crop/district/season; only rebuilt when the CSV changes
+        yield_stats = load_yield_stats(YIELD_CSV)
+        if yield_stats is None:
+            raise FileNotFoundError(f"No yield statistics could be built from {YIELD_CSV}")
+
+        # The precomputed table, when current, spares loading the model itself
+        yield_model = load_yield_table(YIELD_MODEL_FILE) or _load_model(YIELD_MODEL_FILE, "yield model")
+        crop_model = _load_model(CROP_MODEL_FILE, "advanced crop model")
+
         log("Recommender models and data loaded successfully.")
-        return crop_model, yield_model, avg_yield_lookup
+        return crop_model, yield_model, yield_stats
         
     except FileNotFoundError as e:
         log_exception(f"FATAL: Missing file.", e)
@@ -42,55 +53,100 @@ def load_recommender_data():
         log_exception(f"FATAL: Error loading recommender data", e)
         raise
 
+def model_suitability(data: dict, crop_model: object, top_n: int = 5) -> list:
+    """
+    (crop, probability) for the classifier's top_n crops. The rule-based
+    engine filters out crops far outside their requirements first (if enough
+    crops remain).
+    """
+    model_input = pd.DataFrame([[
+        float(data['nitrogen']),
+        float(data['phosphorous']),
+        float(data['potassium']),
+        float(data['ph']),
+        float(data['rainfall']),
+        float(data['temperature']),
+        float(data['humidity'])
+    ]], 
+        columns=['N', 'P', 'K', 'ph', 'rainfall', 'temperature', 'humidity']
+    )
+    
+    probabilities = crop_model.predict_proba(model_input)[0]
+    all_crop_probs = list(zip(crop_model.classes_, probabilities))
+
+    suitable = suitable_crops(data)
+    if suitable is not None:
+        # Crops without ranges in the CSV are kept
+        known = load_requirements().index
+        candidates = [cp for cp in all_crop_probs if cp[0] in suitable or cp[0] not in known]
+        if len(candidates) >= top_n:
+            all_crop_probs = candidates
+
+    return sorted(all_crop_probs, key=lambda x: x[1], reverse=True)[:top_n]
+
+def yield_score(yield_model: object, district: str, crop_name: str, season: str):
+    """The yield model's score, looked up in the precomputed table when that is what was loaded."""
+    if yield_model is None:
+        return None
+    if isinstance(yield_model, YieldTable):
+        return yield_model.lookup(district, crop_name, season)
+    prediction_input = pd.DataFrame({
+        'district_name': [district],
+        'crop_name': [crop_name],
+        'season': [season]
+    })
+    return float(yield_model.predict(prediction_input)[0])
+
+def historical_yield(yield_stats, crop_name: str, district: str, season: str):
+    """District/season-specific yield statistics (or a plain crop-level {'Avg_Yield', 'Unit'} lookup)."""
+    if isinstance(yield_stats, YieldStats):
+        return yield_stats.lookup(crop_name, district, season)
+    avg_info = (yield_stats or {}).get(crop_name)
+    if not avg_info:
+        return None
+    return {'mean': avg_info['Avg_Yield'], 'unit': avg_info['Unit'], 'scope': 'crop'}
+
 def get_recommendations(data: dict, crop_model: object, yield_model: object, avg_yield_lookup: dict) -> list:
     """
-    Main recommendation logic (from your original file).
+    Main recommendation logic (from your original file). Without a crop
+    model, suitability comes from the rule-based engine; without a yield
+    model, the final score is the suitability alone.
     """
     try:
         # --- 1. Get Environmental Suitability ---
         # Data dict comes from our new WTForm
-        model_input = pd.DataFrame([[
-            float(data['nitrogen']),
-            float(data['phosphorous']),
-            float(data['potassium']),
-            float(data['ph']),
-            float(data['rainfall']),
-            float(data['temperature']),
-            float(data['humidity'])
-        ]], 
-            columns=['N', 'P', 'K', 'ph', 'rainfall', 'temperature', 'humidity']
-        )
-        
-        probabilities = crop_model.predict_proba(model_input)[0]
-        all_crop_probs = zip(crop_model.classes_, probabilities)
-        sorted_crop_probs = sorted(all_crop_probs, key=lambda x: x[1], reverse=True)
-        top_5_suitable = sorted_crop_probs[:5]
+        if crop_model is not None:
+            top_5_suitable = [(crop, score, failed_constraints(data, crop))
+                              for crop, score in model_suitability(data, crop_model)]
+        else:
+            log("[Recommender] No crop model, using the rule-based suitability engine.")
+            top_5_suitable = [(c['Crop_Name'], c['Suitability'], c['Failed_Constraints'])
+                              for c in rank_crops([data])[0]]
 
-        log(f"Found top 5 suitable crops: {top_5_suitable}")
+        log(f"Found top 5 suitable crops: {[(crop, score) for crop, score, _ in top_5_suitable]}")
 
         # --- 2. Get Predicted Yield Score for the Top 5 ---
         district = data['district']
         season = data['season']
         final_recommendations = []
 
-        for crop_name, suitability_score in top_5_suitable:
-            prediction_input = pd.DataFrame({
-                'district_name': [district],
-                'crop_name': [crop_name],
-                'season': [season]
-            })
-            
-            predicted_yield_score = yield_model.predict(prediction_input)[0]
-            final_score = (suitability_score * 0.5) + (predicted_yield_score * 0.5)
-            avg_info = avg_yield_lookup.get(crop_name, {'Avg_Yield': 'N/A', 'Unit': ''})
+        for crop_name, suitability_score, failed in top_5_suitable:
+            predicted_yield_score = yield_score(yield_model, district, crop_name, season)
+            if predicted_yield_score is not None:
+                final_score = (suitability_score * 0.5) + (predicted_yield_score * 0.5)
+            else:
+                final_score = suitability_score
+            history = historical_yield(avg_yield_lookup, crop_name, district, season)
             
             final_recommendations.append({
                 'Crop_Name': crop_name,
                 'Final_Score': float(final_score),
                 'Suitability': float(suitability_score),
-                'Predicted_Yield_Score': float(predicted_yield_score),
-                'Avg_Historical_Yield': avg_info['Avg_Yield'] if avg_info['Avg_Yield'] != 'N/A' else 'N/A',
-                'Unit': avg_info['Unit']
+                'Predicted_Yield_Score': predicted_yield_score,
+                'Avg_Historical_Yield': history['mean'] if history else 'N/A',
+                'Unit': history['unit'] if history else '',
+                'Historical_Yield': history,
+                'Failed_Constraints': failed or [],
             })
 
         # --- 4. Sort and return top 5 ---
@@ -99,4 +155,4 @@ def get_recommendations(data: dict, crop_model: object, yield_model: object, avg
 
     except Exception as e:
         log_exception("[Recommender] Error in get_recommendations", e)
-        return []
\ No newline at end of file
+        return []
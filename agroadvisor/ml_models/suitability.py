@@ -0,0 +1,131 @@
+import os
+import threading
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+from .utils import log, log_exception
+
+# --- Configuration ---
+REQUIREMENTS_CSV = os.path.join('data', 'crop_requirements_processed.csv')
+# (column prefix in the CSV, key in the farmer's profile, label)
+FACTORS = [
+    ("N", "nitrogen", "Nitrogen"),
+    ("P", "phosphorous", "Phosphorous"),
+    ("K", "potassium", "Potassium"),
+    ("pH", "ph", "pH"),
+    ("Rain", "rainfall", "Rainfall"),
+    ("Temp", "temperature", "Temperature"),
+    ("Humid", "humidity", "Humidity"),
+]
+# Outside its range a factor's score falls linearly to 0 at this many range
+# widths from the nearest bound
+TOLERANCE = 0.5
+# First-stage filter: crops scoring below this are not passed to the model
+MIN_SUITABILITY = 0.5
+
+_LOCK = threading.Lock()
+_REQUIREMENTS: Optional["CropRequirements"] = None
+
+
+class CropRequirements:
+    """Per-crop [low, high] ranges as (crops x factors) arrays."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.crops = df["Crop"].astype(str).str.strip().to_numpy()
+        self.low = df[[f"{prefix}_Min" for prefix, _, _ in FACTORS]].to_numpy(dtype=float)
+        self.high = df[[f"{prefix}_Max" for prefix, _, _ in FACTORS]].to_numpy(dtype=float)
+        # Zero-width ranges still get some slack
+        self.slack = np.maximum((self.high - self.low) * TOLERANCE, 1e-6)
+        self.index = {crop: i for i, crop in enumerate(self.crops)}
+
+    def __len__(self):
+        return len(self.crops)
+
+
+def load_requirements() -> Optional[CropRequirements]:
+    global _REQUIREMENTS
+    if _REQUIREMENTS is None:
+        with _LOCK:
+            if _REQUIREMENTS is None:
+                try:
+                    _REQUIREMENTS = CropRequirements(pd.read_csv(REQUIREMENTS_CSV))
+                    log(f"[Suitability] Loaded ranges for {len(_REQUIREMENTS)} crops")
+                except Exception as e:
+                    log_exception(f"[Suitability] Could not load {REQUIREMENTS_CSV}", e)
+                    return None
+    return _REQUIREMENTS
+
+
+# --- Scoring ---
+
+def profile_matrix(profiles: Sequence[Dict]) -> np.ndarray:
+    """(profiles x factors) array from profile dicts (nitrogen, ..., humidity)."""
+    return np.array([[float(p[key]) for _, key, _ in FACTORS] for p in profiles], dtype=float)
+
+
+def score_profiles(X: np.ndarray, req: CropRequirements):
+    """
+    Scores every crop against every profile in one pass.
+    Returns (scores, distance): scores is (profiles x crops) in [0, 1], the
+    mean of per-factor scores; distance is (profiles x crops x factors), how
+    far each value is outside the crop's range (0 inside it).
+    """
+    values = X[:, None, :]
+    distance = np.maximum(req.low - values, 0) + np.maximum(values - req.high, 0)
+    factor_scores = np.clip(1 - distance / req.slack, 0, 1)
+    return factor_scores.mean(axis=2), distance
+
+
+def explain(x: np.ndarray, crop_index: int, distance: np.ndarray, req: CropRequirements) -> List[str]:
+    """Human-readable list of the constraints one profile fails for one crop."""
+    failed = []
+    for f in np.flatnonzero(distance > 0):
+        low, high = req.low[crop_index, f], req.high[crop_index, f]
+        side = "below" if x[f] < low else "above"
+        failed.append(f"{FACTORS[f][2]} {x[f]:g} is {side} {low:g}-{high:g}")
+    return failed
+
+
+def rank_crops(profiles: Sequence[Dict], top_n: Optional[int] = 5) -> List[List[Dict]]:
+    """
+    For each profile, crops by descending suitability:
+    [{"Crop_Name", "Suitability", "Failed_Constraints"}, ...] (top_n per profile; all if None).
+    """
+    req = load_requirements()
+    if req is None or not profiles:
+        return [[] for _ in profiles]
+    X = profile_matrix(profiles)
+    scores, distance = score_profiles(X, req)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    if top_n:
+        order = order[:, :top_n]
+
+    ranked = []
+    for p, crops in enumerate(order):
+        ranked.append([{
+            "Crop_Name": str(req.crops[c]),
+            "Suitability": float(scores[p, c]),
+            "Failed_Constraints": explain(X[p], c, distance[p, c], req),
+        } for c in crops])
+    return ranked
+
+
+def failed_constraints(profile: Dict, crop_name: str) -> Optional[List[str]]:
+    """The constraints `profile` fails for one crop (None for crops without ranges)."""
+    req = load_requirements()
+    if req is None or crop_name not in req.index:
+        return None
+    c = req.index[crop_name]
+    X = profile_matrix([profile])
+    _, distance = score_profiles(X, req)
+    return explain(X[0], c, distance[0, c], req)
+
+
+def suitable_crops(profile: Dict, min_score: float = MIN_SUITABILITY) -> Optional[set]:
+    """Crops scoring at least `min_score` for `profile` (None if the ranges are unavailable)."""
+    req = load_requirements()
+    if req is None:
+        return None
+    scores, _ = score_profiles(profile_matrix([profile]), req)
+    return set(req.crops[scores[0] >= min_score])
@@ -12,6 +12,18 @@ from urllib3.util.retry import Retry
 INSTANCE_DIR = "instance"
 GEO_CACHE_FILE = os.path.join(INSTANCE_DIR, "geo_cache.json")
 LOG_FILE = os.path.join(INSTANCE_DIR, "app.log")
+# Partitioned, deduplicated Agmarknet price store (see ingest.py)
+PRICE_STORE_DIR = os.path.join(INSTANCE_DIR, "prices")
+# Cached per-market price models (see model_registry.py)
+MODEL_STORE_DIR = os.path.join(INSTANCE_DIR, "models")
+# Merged price + weather feature frames per market (see feature_store.py)
+FEATURE_STORE_DIR = os.path.join(INSTANCE_DIR, "features")
+# Per-market daily/weekly price aggregates (see aggregates.py)
+AGGREGATE_STORE_DIR = os.path.join(INSTANCE_DIR, "aggregates")
+# Precomputed yield-model scores per district x crop x season (see yield_table.py)
+YIELD_TABLE_FILE = os.path.join(INSTANCE_DIR, "yield_table.npz")
+# Historical yield statistics per crop/district/season (see yield_stats.py)
+YIELD_STATS_FILE = os.path.join(INSTANCE_DIR, "yield_stats.pkl")
 
 # --- Ensure Dirs Exist ---
 os.makedirs(INSTANCE_DIR, exist_ok=True)
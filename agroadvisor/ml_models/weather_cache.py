@@ -0,0 +1,99 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Tuple
+from flask import g, has_request_context
+
+from .utils import log
+
+# --- Configuration ---
+# Coordinates are snapped to this grid (~5.5 km, finer than Open-Meteo's own
+# cells) so markets and districts that geocode a few hundred metres apart
+# share one fetch
+SNAP_DEGREES = 0.05
+# Seconds a fetched result is shared across requests
+FORECAST_TTL = 3600
+# Kept under feature_store.WEATHER_RETRY so it still sees newly archived days
+ARCHIVE_TTL = 3 * 3600
+MAX_ENTRIES = 128
+# Fetches are serialised per key through a fixed pool of locks (keys sharing
+# a stripe just wait for each other), so no per-key state outlives the cache
+LOCK_STRIPES = 64
+
+_CACHE: "OrderedDict[Hashable, Tuple[float, object]]" = OrderedDict()
+_LOCK = threading.Lock()
+_KEY_LOCKS = tuple(threading.Lock() for _ in range(LOCK_STRIPES))
+
+
+def snap(lat: float, lon: float) -> Tuple[float, float]:
+    """(lat, lon) rounded to the SNAP_DEGREES grid."""
+    return (round(round(float(lat) / SNAP_DEGREES) * SNAP_DEGREES, 4),
+            round(round(float(lon) / SNAP_DEGREES) * SNAP_DEGREES, 4))
+
+
+def _request_memo() -> Dict:
+    if "_weather_memo" not in g:
+        g._weather_memo = {}
+    return g._weather_memo
+
+
+def _key_lock(key: Hashable) -> threading.Lock:
+    return _KEY_LOCKS[hash(key) % LOCK_STRIPES]
+
+
+def shared_fetch(key: Tuple, ttl: float, fetch: Callable[[], object]):
+    """
+    fetch() at most once per `key`: within the current request (even for
+    failures, so five crops do not retry a dead API five times) and across
+    requests/threads for `ttl` seconds (successful results only). `key`
+    should contain snapped coordinates.
+    """
+    memo = _request_memo() if has_request_context() else None
+    if memo is not None and key in memo:
+        return memo[key]
+
+    # One fetch per key at a time: concurrent requests wait for its result
+    with _key_lock(key):
+        now = time.monotonic()
+        with _LOCK:
+            cached = _CACHE.get(key)
+            if cached and cached[0] > now:
+                _CACHE.move_to_end(key)
+                value = cached[1]
+            else:
+                cached = None
+        if cached is None:
+            value = fetch()
+            prime(key, ttl, value)
+        else:
+            log(f"[Weather] Shared {key[0]} data for {key[1]},{key[2]}")
+
+    if memo is not None:
+        memo[key] = value
+    return value
+
+
+def cached(key: Tuple):
+    """The shared value for `key` if it is still fresh, else None (never fetches)."""
+    with _LOCK:
+        entry = _CACHE.get(key)
+        if entry and entry[0] > time.monotonic():
+            _CACHE.move_to_end(key)
+            return entry[1]
+    return None
+
+
+def prime(key: Tuple, ttl: float, value):
+    """Stores a value fetched elsewhere (e.g. by a batched call) as if shared_fetch had fetched it."""
+    if value is None:
+        return
+    with _LOCK:
+        _CACHE[key] = (time.monotonic() + ttl, value)
+        _CACHE.move_to_end(key)
+        while len(_CACHE) > MAX_ENTRIES:
+            _CACHE.popitem(last=False)
+
+
+def clear():
+    with _LOCK:
+        _CACHE.clear()
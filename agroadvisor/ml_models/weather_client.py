@@ -0,0 +1,182 @@
+import time
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
+import requests
+
+from .utils import log, log_exception
+
+# --- Configuration ---
+OPEN_METEO_ARCHIVE = "https://archive-api.open-meteo.com/v1/archive"
+OPEN_METEO_FORECAST = "https://api.open-meteo.com/v1/forecast"
+# Open-Meteo takes comma-separated latitude/longitude lists; calls are kept
+# under both limits
+MAX_LOCATIONS_PER_CALL = 100
+MAX_URL_LENGTH = 2000
+# Queries with different date ranges share a call (fetching the union and
+# slicing it per location) while the union is at most this much longer
+# than the longest member's own range
+RANGE_SLACK = 1.25
+RANGE_SLACK_DAYS = 31
+
+
+class WeatherQuery(NamedTuple):
+    """One location's Open-Meteo request. Dates are 'YYYY-MM-DD'."""
+    lat: float
+    lon: float
+    forecast: bool = False
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    daily: Tuple[str, ...] = ()
+    current: Tuple[str, ...] = ()
+    # Any other parameters, e.g. (("forecast_days", 16),) or (("models", "era5"),)
+    extra: Tuple[Tuple[str, object], ...] = ()
+
+    def group(self) -> Tuple:
+        """Queries with the same group can be answered by one multi-location call."""
+        return (self.forecast, self.daily, self.current, self.extra, self.start_date is None)
+
+
+def _days(start: str, end: str) -> int:
+    return (date.fromisoformat(end) - date.fromisoformat(start)).days + 1
+
+
+# --- Planning ---
+
+class _Call:
+    """One multi-location request: its locations, date range and the queries it answers."""
+
+    def __init__(self, first: WeatherQuery):
+        self.template = first
+        self.locations: List[Tuple[float, float]] = []
+        self.start, self.end = first.start_date, first.end_date
+        self.longest = _days(first.start_date, first.end_date) if first.start_date else 0
+        self.queries: List[WeatherQuery] = []
+
+    def params(self, locations=None, start=None, end=None) -> Dict:
+        q = self.template
+        locations = self.locations if locations is None else locations
+        params = {
+            "latitude": ",".join(f"{lat:.4f}" for lat, _ in locations),
+            "longitude": ",".join(f"{lon:.4f}" for _, lon in locations),
+            "timezone": "auto",
+        }
+        if q.daily:
+            params["daily"] = ",".join(q.daily)
+        if q.current:
+            params["current"] = ",".join(q.current)
+        if q.start_date:
+            params["start_date"], params["end_date"] = start or self.start, end or self.end
+        params.update(q.extra)
+        return params
+
+    def url_length(self, locations, start, end) -> int:
+        base = OPEN_METEO_FORECAST if self.template.forecast else OPEN_METEO_ARCHIVE
+        return len(base) + 1 + len(urlencode(self.params(locations, start, end)))
+
+    def try_add(self, query: WeatherQuery) -> bool:
+        location = (query.lat, query.lon)
+        locations = self.locations if location in self.locations else self.locations + [location]
+        if len(locations) > MAX_LOCATIONS_PER_CALL:
+            return False
+        start, end, longest = self.start, self.end, self.longest
+        if query.start_date:
+            start, end = min(start, query.start_date), max(end, query.end_date)
+            longest = max(longest, _days(query.start_date, query.end_date))
+            if _days(start, end) > longest * RANGE_SLACK + RANGE_SLACK_DAYS:
+                return False
+        if self.queries and self.url_length(locations, start, end) > MAX_URL_LENGTH:
+            return False
+        self.locations, self.start, self.end, self.longest = locations, start, end, longest
+        self.queries.append(query)
+        return True
+
+
+def plan_calls(queries: Iterable[WeatherQuery]) -> List[_Call]:
+    """Groups distinct queries into as few calls as the limits allow."""
+    groups: Dict[Tuple, List[WeatherQuery]] = {}
+    for query in dict.fromkeys(queries):
+        groups.setdefault(query.group(), []).append(query)
+
+    calls = []
+    for members in groups.values():
+        # Similar date ranges end up next to each other
+        members.sort(key=lambda q: (q.start_date or "", q.end_date or "", q.lat, q.lon))
+        call = None
+        for query in members:
+            if call is None or not call.try_add(query):
+                call = _Call(query)
+                call.try_add(query)
+                calls.append(call)
+    return calls
+
+
+# --- Fetching ---
+
+def slice_daily(payload: Dict, start: Optional[str], end: Optional[str]) -> Dict:
+    """The payload with its daily arrays cut down to [start, end]."""
+    daily = payload.get("daily")
+    if not start or not daily or not daily.get("time"):
+        return payload
+    times = daily["time"]
+    keep = [i for i, day in enumerate(times) if start <= day[:10] <= end]
+    if len(keep) == len(times):
+        return payload
+    sliced = {key: [values[i] for i in keep] if isinstance(values, list) else values
+              for key, values in daily.items()}
+    return {**payload, "daily": sliced}
+
+
+def _request(call: _Call, session: requests.Session, timeout: float) -> List[Optional[Dict]]:
+    """One payload per location of `call` (None for all of them if the call fails)."""
+    url = OPEN_METEO_FORECAST if call.template.forecast else OPEN_METEO_ARCHIVE
+    try:
+        res = session.get(url, params=call.params(), timeout=timeout)
+        res.raise_for_status()
+        data = res.json()
+    except requests.HTTPError as e:
+        # One bad location fails the whole call: retry the halves to isolate it
+        if len(call.locations) > 1 and e.response is not None and e.response.status_code == 400:
+            half = len(call.locations) // 2
+            payloads = []
+            for part in (call.locations[:half], call.locations[half:]):
+                sub = _Call(call.template)
+                sub.locations, sub.start, sub.end = part, call.start, call.end
+                payloads.extend(_request(sub, session, timeout))
+            return payloads
+        log_exception(f"[Weather] Batch of {len(call.locations)} locations failed", e)
+        return [None] * len(call.locations)
+    except Exception as e:
+        log_exception(f"[Weather] Batch of {len(call.locations)} locations failed", e)
+        return [None] * len(call.locations)
+
+    payloads = data if isinstance(data, list) else [data]
+    if len(payloads) != len(call.locations):
+        log(f"[Weather] Expected {len(call.locations)} locations, got {len(payloads)}")
+        return [None] * len(call.locations)
+    return payloads
+
+
+def fetch_batch(queries: List[WeatherQuery], session: requests.Session,
+                timeout: float = 30) -> List[Optional[Dict]]:
+    """
+    The Open-Meteo payload for each query (None where it failed), fetched with
+    as few multi-location calls as possible. Each payload covers exactly its
+    query's date range.
+    """
+    started = time.perf_counter()
+    calls = plan_calls(queries)
+    answers: Dict[WeatherQuery, Optional[Dict]] = {}
+    for call in calls:
+        by_location = dict(zip(call.locations, _request(call, session, timeout)))
+        for query in call.queries:
+            payload = by_location.get((query.lat, query.lon))
+            answers[query] = None if payload is None else slice_daily(payload, query.start_date, query.end_date)
+    if len(queries) > 1:
+        log(f"[Weather] {len(answers)} locations in {len(calls)} calls "
+            f"({time.perf_counter() - started:.2f}s)")
+    return [answers[q] for q in queries]
+
+
+def fetch_one(query: WeatherQuery, session: requests.Session, timeout: float = 30) -> Optional[Dict]:
+    return fetch_batch([query], session, timeout)[0]
@@ -0,0 +1,152 @@
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+
+from .utils import log, log_exception, YIELD_STATS_FILE
+from .yield_table import clean_label
+
+# --- Configuration ---
+# Recency-weighted average: a season's weight halves every this many years
+HALF_LIFE_YEARS = 5
+# Key levels, most specific first: lookups fall back along this list
+LEVELS = {
+    "crop_district_season": ["crop", "district", "season"],
+    "crop_district": ["crop", "district"],
+    "crop": ["crop"],
+}
+
+
+def csv_version(csv_path: str) -> Optional[str]:
+    try:
+        st = os.stat(csv_path)
+    except OSError:
+        return None
+    return f"{st.st_size}-{st.st_mtime_ns}"
+
+
+# --- Building ---
+
+def clean_yields(df_yield: pd.DataFrame) -> pd.DataFrame:
+    """crop/district/season labels without padding, and ' 1998-99' as the year 1998."""
+    return pd.DataFrame({
+        "crop": df_yield["crop_name"].map(clean_label),
+        "district": df_yield["district_name"].map(clean_label),
+        "season": df_yield["season"].map(clean_label),
+        "year": pd.to_numeric(df_yield["year"].astype(str).str.strip().str[:4], errors="coerce"),
+        "yield": pd.to_numeric(df_yield["yield"], errors="coerce"),
+    }).dropna(subset=["year", "yield"])
+
+
+def level_stats(df: pd.DataFrame, keys, latest_year: int) -> pd.DataFrame:
+    """Mean, median, quartiles, recency-weighted mean and yearly trend per `keys` group."""
+    df = df.assign(
+        weight=0.5 ** ((latest_year - df["year"]) / HALF_LIFE_YEARS),
+        year_x_yield=df["year"] * df["yield"],
+        year_sq=df["year"] ** 2,
+    )
+    df["weighted"] = df["weight"] * df["yield"]
+    grouped = df.groupby(keys, sort=False)
+    stats = grouped["yield"].agg(mean="mean", median="median", count="size")
+    stats["p25"] = grouped["yield"].quantile(0.25)
+    stats["p75"] = grouped["yield"].quantile(0.75)
+    sums = grouped[["weight", "weighted", "year", "year_x_yield", "year_sq", "yield"]].sum()
+    stats["recent_mean"] = sums["weighted"] / sums["weight"]
+    # Least-squares slope of yield on year, in yield units per year
+    n = stats["count"]
+    var = sums["year_sq"] - sums["year"] ** 2 / n
+    cov = sums["year_x_yield"] - sums["year"] * sums["yield"] / n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stats["trend_per_year"] = np.where(var > 0, cov / var, 0.0)
+    years = grouped["year"].agg(first_year="min", last_year="max")
+    return stats.join(years)
+
+
+def build_yield_stats(df_yield: pd.DataFrame, version: Optional[str] = None,
+                      path: str = YIELD_STATS_FILE) -> "YieldStats":
+    """Computes every level's statistics and stores them as plain dicts for fast loading."""
+    started = time.perf_counter()
+    df = clean_yields(df_yield)
+    latest_year = int(df["year"].max())
+    unit = str(df_yield["yield_unit"].mode()[0]) if "yield_unit" in df_yield else ""
+
+    levels = {}
+    for name, keys in LEVELS.items():
+        stats = level_stats(df, keys, latest_year).round(4)
+        stats[["count", "first_year", "last_year"]] = stats[["count", "first_year", "last_year"]].astype(int)
+        levels[name] = {
+            tuple(k.lower() for k in (key if isinstance(key, tuple) else (key,))): row
+            for key, row in zip(stats.index, stats.to_dict("records"))
+        }
+
+    entry = {
+        "version": version,
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "unit": unit,
+        "seasons": sorted(df["season"].unique()),
+        "levels": levels,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    pd.to_pickle(entry, tmp)
+    os.replace(tmp, path)
+    log(f"[YieldStats] {len(df)} rows -> " + ", ".join(f"{len(v)} {k}" for k, v in levels.items())
+        + f" in {time.perf_counter() - started:.2f}s")
+    return YieldStats(entry)
+
+
+# --- Lookups ---
+
+class YieldStats:
+    """Historical yield statistics by (crop, district, season), falling back to coarser levels."""
+
+    def __init__(self, entry: Dict):
+        self.version = entry["version"]
+        self.built_at = entry["built_at"]
+        self.unit = entry["unit"]
+        self.seasons = entry["seasons"]
+        self.levels = entry["levels"]
+
+    def lookup(self, crop: str, district: Optional[str] = None, season: Optional[str] = None) -> Optional[Dict]:
+        """The most specific statistics available, with 'scope' naming the level used."""
+        crop = clean_label(crop).lower()
+        district = clean_label(district).lower() if district else None
+        season = clean_label(season).lower() if season else None
+        candidates = [
+            ("crop_district_season", (crop, district, season)),
+            ("crop_district", (crop, district)),
+            ("crop", (crop,)),
+        ]
+        for level, key in candidates:
+            if None in key:
+                continue
+            stats = self.levels[level].get(key)
+            if stats is not None:
+                return {**stats, "scope": level, "unit": self.unit}
+        return None
+
+    def get(self, crop: str, default=None):
+        """Crop-level {'Avg_Yield', 'Unit'}, as the old AVG_YIELD_LOOKUP dict returned."""
+        stats = self.levels["crop"].get((clean_label(crop).lower(),))
+        if stats is None:
+            return default
+        return {"Avg_Yield": stats["mean"], "Unit": self.unit}
+
+
+def load_yield_stats(csv_path: str, path: str = YIELD_STATS_FILE) -> Optional[YieldStats]:
+    """The stored statistics, rebuilt from `csv_path` if missing or older than the CSV."""
+    version = csv_version(csv_path)
+    try:
+        if os.path.exists(path):
+            entry = pd.read_pickle(path)
+            if version is None or entry.get("version") == version:
+                return YieldStats(entry)
+            log(f"[YieldStats] {csv_path} changed, rebuilding {path}")
+        if version is None:
+            return None
+        return build_yield_stats(pd.read_csv(csv_path), version, path)
+    except Exception as e:
+        log_exception("[YieldStats] Could not load yield statistics", e)
+        return None
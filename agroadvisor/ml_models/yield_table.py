@@ -0,0 +1,117 @@
+import os
+import time
+from datetime import datetime
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+from .utils import log, log_exception, YIELD_TABLE_FILE
+
+# The yield model's inputs are three categoricals from a finite domain, so
+# every answer is precomputed into a (district x crop x season) cube.
+
+
+def model_version(model_path: str) -> Optional[str]:
+    """Identifies a model file by size and mtime (cheap: the file is never read)."""
+    try:
+        st = os.stat(model_path)
+    except OSError:
+        return None
+    return f"{st.st_size}-{st.st_mtime_ns}"
+
+
+def clean_label(value) -> str:
+    # Seasons carry trailing padding in the source CSV ('Kharif     ')
+    return " ".join(str(value).split())
+
+
+class YieldTable:
+    """Yield scores for every (district, crop, season) of the yield CSV, looked up in O(1)."""
+
+    def __init__(self, districts, crops, seasons, cube: np.ndarray, version: Optional[str] = None,
+                 built_at: Optional[str] = None):
+        self.districts = {clean_label(d).lower(): i for i, d in enumerate(districts)}
+        self.crops = {clean_label(c).lower(): i for i, c in enumerate(crops)}
+        self.seasons = {clean_label(s).lower(): i for i, s in enumerate(seasons)}
+        self.cube = cube
+        self.version = version
+        self.built_at = built_at
+        # Districts outside the domain get the mean over all known districts
+        with np.errstate(invalid="ignore"):
+            self.any_district = np.nanmean(cube, axis=0) if len(cube) else cube
+
+    def lookup(self, district: str, crop: str, season: str) -> Optional[float]:
+        c = self.crops.get(clean_label(crop).lower())
+        s = self.seasons.get(clean_label(season).lower())
+        if c is None or s is None:
+            return None
+        d = self.districts.get(clean_label(district).lower())
+        value = self.cube[d, c, s] if d is not None else self.any_district[c, s]
+        return None if np.isnan(value) else float(value)
+
+    def __len__(self):
+        return int(self.cube.size)
+
+
+# --- Building ---
+
+def build_yield_table(yield_model, df_yield: pd.DataFrame, version: Optional[str] = None,
+                      path: str = YIELD_TABLE_FILE, batch_size: int = 50_000) -> YieldTable:
+    """Scores the full district x crop x season cross-product and saves it as an .npz cube."""
+    started = time.perf_counter()
+    # The model was fitted on the raw CSV labels, padding included
+    districts = np.sort(df_yield["district_name"].dropna().unique())
+    crops = np.sort(df_yield["crop_name"].dropna().unique())
+    seasons = np.sort(df_yield["season"].dropna().unique())
+
+    d, c, s = np.meshgrid(np.arange(len(districts)), np.arange(len(crops)), np.arange(len(seasons)), indexing="ij")
+    grid = pd.DataFrame({
+        "district_name": districts[d.ravel()],
+        "crop_name": crops[c.ravel()],
+        "season": seasons[s.ravel()],
+    })
+    scores = np.concatenate([
+        np.asarray(yield_model.predict(grid.iloc[i:i + batch_size]), dtype=np.float32)
+        for i in range(0, len(grid), batch_size)
+    ]) if len(grid) else np.empty(0, dtype=np.float32)
+    cube = scores.reshape(len(districts), len(crops), len(seasons))
+
+    built_at = datetime.now().isoformat(timespec="seconds")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(
+        tmp, cube=cube,
+        districts=np.array([clean_label(x) for x in districts]),
+        crops=np.array([clean_label(x) for x in crops]),
+        seasons=np.array([clean_label(x) for x in seasons]),
+        version=np.array(version or ""), built_at=np.array(built_at),
+    )
+    os.replace(tmp, path)
+    log(f"[YieldTable] Scored {cube.size} combinations ({len(districts)} districts x {len(crops)} crops x "
+        f"{len(seasons)} seasons) in {time.perf_counter() - started:.2f}s -> {path}")
+    return YieldTable(districts, crops, seasons, cube, version, built_at)
+
+
+# --- Loading ---
+
+def load_yield_table(model_path: str, path: str = YIELD_TABLE_FILE) -> Optional[YieldTable]:
+    """
+    The stored table, or None if there is none or it was built from another
+    version of the model at `model_path` (a table without its model is used).
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            table = YieldTable(data["districts"], data["crops"], data["seasons"], data["cube"],
+                               str(data["version"]) or None, str(data["built_at"]))
+    except Exception as e:
+        log_exception(f"[YieldTable] Could not load {path}", e)
+        return None
+
+    current = model_version(model_path)
+    if current is not None and table.version != current:
+        log(f"[YieldTable] {path} was built for another yield model version; run `flask build-yield-table`.")
+        return None
+    log(f"[YieldTable] Loaded {len(table)} yield scores built {table.built_at}")
+    return table
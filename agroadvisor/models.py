@@ -1,8 +1,13 @@
 from agroadvisor.extensions import db
+from flask import current_app
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 import datetime
 
+# app.extensions key of the role name -> id cache, filled on first use.
+# Kept per app (so per database) and cleared by database.seed_roles.
+ROLE_IDS_KEY = 'role_ids'
+
 class Role(db.Model):
     """
     Role model to differentiate between 'Farmer' and 'Admin'.
@@ -13,6 +18,18 @@ class Role(db.Model):
     # This 'backref' gives us a 'user.role' attribute
     users = db.relationship('User', backref='role', lazy=True)
 
+    @classmethod
+    def id_for(cls, name):
+        """The id of the role called `name` (None if it does not exist), cached per app."""
+        role_ids = current_app.extensions.setdefault(ROLE_IDS_KEY, {})
+        role_id = role_ids.get(name)
+        if role_id is None:
+            role = cls.query.filter_by(name=name).first()
+            if role is None:
+                return None
+            role_id = role_ids[name] = role.id
+        return role_id
+
     def __repr__(self):
         return f'<Role {self.name}>'
 
@@ -42,7 +59,8 @@ class User(UserMixin, db.Model):
 
     def is_admin(self):
         """Helper function to check if user is an admin."""
-        return self.role and self.role.name == 'Admin'
+        # Compared by id: no query to load the role on every check
+        return self.role_id is not None and self.role_id == Role.id_for('Admin')
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -62,5 +80,12 @@ class Product(db.Model):
     # Foreign key to link product to a user (the farmer)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    # Keyset pagination of the marketplace (newest first) walks the first index;
+    # per-seller listings and the admin product counts / latest dates the second
+    __table_args__ = (
+        db.Index('ix_product_date_posted_id', 'date_posted', 'id'),
+        db.Index('ix_product_user_id_date_posted', 'user_id', 'date_posted'),
+    )
+
     def __repr__(self):
         return f'<Product {self.name}>'
\ No newline at end of file
@@ -0,0 +1,176 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Callable, NamedTuple, Optional
+from flask import current_app, request, session, Response
+from flask_login import current_user
+
+from agroadvisor.ml_models.utils import log, log_exception
+
+# Bumped (rewritten) by every write that changes a cached page; all workers
+# compare it before serving a cached entry, so invalidation is cross-process.
+VERSION_FILE = 'page_cache.version'
+
+
+class Entry(NamedTuple):
+    version: int
+    body: bytes
+    etag: str
+
+
+class PageCache:
+    """
+    Rendered public pages and page fragments, valid while the content version
+    is unchanged. Entries are kept in an LRU bounded by `max_entries`.
+    """
+
+    def __init__(self, version_path: str, max_entries: int = 256, max_age: int = 0):
+        self.version_path = version_path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if self.version() == 0:
+            self.invalidate()
+
+    # --- Version ---
+
+    def version(self) -> int:
+        """The content version: the time (ns) of the last invalidation, 0 if never."""
+        try:
+            with open(self.version_path) as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def invalidate(self, reason: str = '') -> int:
+        """Marks every cached page and fragment stale, in all workers."""
+        version = max(time.time_ns(), self.version() + 1)
+        tmp = f"{self.version_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.version_path) or '.', exist_ok=True)
+            with open(tmp, 'w') as f:
+                f.write(str(version))
+            os.replace(tmp, self.version_path)
+        except OSError as e:
+            log_exception("[PageCache] Could not write the cache version", e)
+        with self._lock:
+            self._entries.clear()
+        if reason:
+            log(f"[PageCache] Invalidated ({reason})")
+        return version
+
+    # --- Entries ---
+
+    def get(self, key, version: int) -> Optional[Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version: int, body: bytes) -> Entry:
+        entry = Entry(version, body, hashlib.sha1(body).hexdigest())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def fragment(self, key, render: Callable[[], str]) -> str:
+        """A rendered fragment (shared by anonymous and logged-in pages), rendered on a miss."""
+        version = self.version()
+        entry = self.get(('fragment', key), version)
+        if entry is None:
+            entry = self.put(('fragment', key), version, render().encode('utf-8'))
+        return entry.body.decode('utf-8')
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else None}
+
+
+def page_cache() -> Optional[PageCache]:
+    return current_app.extensions.get('page_cache')
+
+
+def invalidate_pages(reason: str = ''):
+    """Call after committing a write that changes a public page."""
+    cache = page_cache()
+    if cache is not None:
+        cache.invalidate(reason)
+
+
+def cached_fragment(key, render: Callable[[], str]) -> str:
+    cache = page_cache()
+    return render() if cache is None else cache.fragment(key, render)
+
+
+# --- Full-page responses ---
+
+def _cacheable_request() -> bool:
+    # Only anonymous GETs without pending flash messages see the shared page
+    return (request.method in ('GET', 'HEAD') and '_flashes' not in session
+            and not current_user.is_authenticated)
+
+
+def _conditional_response(entry: Entry, cache: PageCache, status: str) -> Response:
+    response = Response(entry.body, mimetype='text/html')
+    response.set_etag(entry.etag)
+    response.last_modified = datetime.fromtimestamp(entry.version / 1e9, tz=timezone.utc)
+    response.cache_control.public = True
+    response.cache_control.max_age = cache.max_age
+    response.vary.add('Cookie')
+    response.headers['X-Cache'] = status
+    # 304 when the client's If-None-Match / If-Modified-Since still matches
+    return response.make_conditional(request)
+
+
+def cached_page(view):
+    """
+    Serves the view's rendered HTML from the PageCache to anonymous visitors,
+    keyed by path and query string, with ETag/Last-Modified revalidation.
+    Logged-in users always get a freshly rendered page.
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        cache = page_cache()
+        if cache is None or not _cacheable_request():
+            return view(*args, **kwargs)
+
+        key = ('page', request.path, request.query_string)
+        # Read the version before rendering: a write committed meanwhile
+        # leaves this entry stale instead of hiding the change
+        version = cache.version()
+        entry = cache.get(key, version)
+        if entry is not None:
+            return _conditional_response(entry, cache, 'HIT')
+
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.direct_passthrough or 'Set-Cookie' in response.headers:
+            return response
+        entry = cache.put(key, version, response.get_data())
+        return _conditional_response(entry, cache, 'MISS')
+    return wrapped
+
+
+def init_page_cache(app):
+    """Creates the app's PageCache. Does nothing unless PAGE_CACHE_ENABLED is set."""
+    if not app.config.get('PAGE_CACHE_ENABLED'):
+        return
+    app.extensions['page_cache'] = PageCache(
+        os.path.join(app.instance_path, VERSION_FILE),
+        max_entries=app.config.get('PAGE_CACHE_MAX_ENTRIES', 256),
+        max_age=app.config.get('PAGE_CACHE_MAX_AGE', 0),
+    )
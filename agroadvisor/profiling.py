@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import pstats
+import threading
+from collections import Counter
+from datetime import datetime
+from flask import request, g
+from flask_login import current_user
+
+from agroadvisor.ml_models.utils import log, log_exception
+
+# Frames from these paths are reported separately as "ML" hot spots
+ML_PATH_MARKER = os.path.join('agroadvisor', 'ml_models')
+TOP_N = 25
+
+
+class SlowRequestSampler:
+    """
+    Background stack sampler for requests that run past a latency threshold.
+
+    Requests only register their thread id and start time. The sampler thread
+    sleeps until the earliest registered request could cross the threshold,
+    so nothing is sampled (and almost nothing runs) for fast requests.
+    """
+
+    def __init__(self, threshold: float, interval: float):
+        self.threshold = threshold
+        self.interval = interval
+        self._active = {}   # thread id -> start time
+        self._samples = {}  # thread id -> list of stacks
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start_request(self, tid: int):
+        with self._lock:
+            self._active[tid] = time.perf_counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='slow-request-sampler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def finish_request(self, tid: int):
+        """Stops tracking a request and returns its collected stacks (if any)."""
+        with self._lock:
+            self._active.pop(tid, None)
+            return self._samples.pop(tid, None)
+
+    def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.perf_counter()
+            with self._lock:
+                slow = [tid for tid, start in self._active.items() if now - start >= self.threshold]
+                pending = [start + self.threshold - now for tid, start in self._active.items() if tid not in slow]
+
+            if slow:
+                frames = sys._current_frames()
+                with self._lock:
+                    for tid in slow:
+                        frame = frames.get(tid)
+                        if frame is not None and tid in self._active:
+                            self._samples.setdefault(tid, []).append(_stack_of(frame))
+                time.sleep(self.interval)
+            else:
+                self._wakeup.wait(min(pending) if pending else None)
+
+
+def _stack_of(frame) -> tuple:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    return tuple(stack)
+
+
+def _label(filename: str, lineno: int, func: str) -> str:
+    return f"{func} ({os.path.relpath(filename) if os.path.isabs(filename) else filename}:{lineno})"
+
+
+def _is_ml(filename: str) -> bool:
+    return ML_PATH_MARKER in filename
+
+
+# --- Summaries ---
+
+def summarise_cprofile(profiler: cProfile.Profile) -> dict:
+    stats = pstats.Stats(profiler).stats
+    rows = []
+    for (filename, lineno, func), (cc, nc, tt, ct, callers) in stats.items():
+        rows.append({
+            'function': _label(filename, lineno, func),
+            'ml': _is_ml(filename),
+            'calls': nc,
+            'tottime': round(tt, 4),
+            'cumtime': round(ct, 4),
+        })
+    rows.sort(key=lambda r: r['cumtime'], reverse=True)
+    return {
+        'top': rows[:TOP_N],
+        'ml_top': [r for r in rows if r['ml']][:TOP_N],
+    }
+
+
+def summarise_samples(stacks: list, interval: float) -> dict:
+    cumulative = Counter()
+    own = Counter()
+    for stack in stacks:
+        own[stack[0]] += 1
+        for frame in set(stack):
+            cumulative[frame] += 1
+
+    rows = [{
+        'function': _label(*frame),
+        'ml': _is_ml(frame[0]),
+        'samples': count,
+        'tottime': round(own.get(frame, 0) * interval, 4),
+        'cumtime': round(count * interval, 4),
+    } for frame, count in cumulative.items()]
+    rows.sort(key=lambda r: r['cumtime'], reverse=True)
+    return {
+        'top': rows[:TOP_N],
+        'ml_top': [r for r in rows if r['ml']][:TOP_N],
+    }
+
+
+# --- Storage ---
+
+def profiles_dir(app) -> str:
+    return os.path.join(app.instance_path, 'profiles')
+
+
+def save_profile(app, summary: dict, profiler: cProfile.Profile = None):
+    """Writes a JSON summary (plus the raw .prof for cProfile) and prunes old files."""
+    directory = profiles_dir(app)
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    name = f"{stamp}-{(summary['endpoint'] or 'unknown').replace('.', '_')}"
+    try:
+        if profiler is not None:
+            profiler.dump_stats(os.path.join(directory, name + '.prof'))
+            summary['raw'] = name + '.prof'
+        with open(os.path.join(directory, name + '.json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+        log(f"[Profile] Saved {summary['trigger']} profile for {summary['path']} ({summary['duration']:.2f}s)")
+    except Exception as e:
+        log_exception("[Profile] Failed to save profile", e)
+        return
+
+    keep = app.config.get('PROFILE_KEEP', 200)
+    summaries = sorted(f for f in os.listdir(directory) if f.endswith('.json'))
+    for old in summaries[:-keep] if len(summaries) > keep else []:
+        for ext in ('.json', '.prof'):
+            path = os.path.join(directory, old[:-5] + ext)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def list_profiles(app) -> list:
+    """All stored profile summaries, slowest first."""
+    directory = profiles_dir(app)
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for fname in os.listdir(directory):
+        if not fname.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, fname)) as f:
+                summary = json.load(f)
+            summary['name'] = fname[:-5]
+            profiles.append(summary)
+        except Exception:
+            continue
+    return sorted(profiles, key=lambda p: p.get('duration', 0), reverse=True)
+
+
+def load_profile(app, name: str):
+    path = os.path.join(profiles_dir(app), os.path.basename(name) + '.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        summary = json.load(f)
+    summary['name'] = name
+    return summary
+
+
+# --- Flask hooks ---
+
+def init_profiling(app):
+    """
+    Registers the profiling hooks. Does nothing unless PROFILING_ENABLED is set,
+    so the default request path is untouched.
+    """
+    if not app.config.get('PROFILING_ENABLED'):
+        return
+
+    header = app.config.get('PROFILE_HEADER', 'X-Profile-Request')
+    threshold = app.config.get('PROFILE_THRESHOLD_SECONDS')
+    sampler = None
+    if threshold:
+        sampler = SlowRequestSampler(float(threshold), app.config.get('PROFILE_SAMPLE_INTERVAL', 0.01))
+    log(f"[Profile] Enabled (header={header}, threshold={threshold}s)")
+
+    @app.before_request
+    def _start_profiling():
+        g._profile_start = time.perf_counter()
+        if header in request.headers and current_user.is_authenticated and current_user.is_admin():
+            g._profiler = cProfile.Profile()
+            g._profiler.enable()
+        elif sampler is not None:
+            sampler.start_request(threading.get_ident())
+
+    @app.teardown_request
+    def _finish_profiling(exc):
+        start = g.pop('_profile_start', None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        profiler = g.pop('_profiler', None)
+
+        if profiler is not None:
+            profiler.disable()
+            summary, trigger = summarise_cprofile(profiler), 'header'
+        else:
+            stacks = sampler.finish_request(threading.get_ident()) if sampler else None
+            if not stacks:
+                return
+            summary, trigger = summarise_samples(stacks, sampler.interval), 'threshold'
+            summary['samples'] = len(stacks)
+
+        summary.update({
+            'trigger': trigger,
+            'path': request.path,
+            'method': request.method,
+            'endpoint': request.endpoint,
+            'duration': round(duration, 4),
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        })
+        save_profile(app, summary, profiler)
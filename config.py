@@ -14,8 +14,88 @@ class Config:
     
     # Database configuration
     # We use a simple SQLite database for development
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
-        'sqlite:///' + os.path.join(basedir, 'instance', 'app.db')
+    SQLALCHEMY_DATABASE_URI = (os.environ.get('DATABASE_URL') or
+        'sqlite:///' + os.path.join(basedir, 'instance', 'app.db')).replace('postgres://', 'postgresql://', 1)
     DATA_DIR = os.path.join(basedir, 'data')
     # This disables an unneeded feature, saving resources
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # --- Database performance profile (see agroadvisor/database.py) ---
+    # SQLite: WAL lets readers and one writer work concurrently across gunicorn
+    # workers, and writers wait up to busy_timeout ms instead of raising
+    # "database is locked". Server databases (DATABASE_URL=postgresql://...)
+    # get a pre-pinged pool of DB_POOL_SIZE (+ DB_MAX_OVERFLOW) per worker.
+    DATABASE_TUNING = os.environ.get('DATABASE_TUNING', '1').lower() in ('1', 'true', 'yes')
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64000,  # KiB, i.e. 64 MB
+        'temp_store': 'MEMORY',
+    }
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = 30
+    DB_POOL_RECYCLE = 1800
+
+    # --- Startup ---
+    # Load the recommender models in create_app instead of on first use, e.g.
+    # with `gunicorn --preload` so forked workers share one copy
+    PRELOAD_ML = os.environ.get('PRELOAD_ML', '').lower() in ('1', 'true', 'yes')
+
+    # --- Public page cache (see agroadvisor/page_cache.py) ---
+    # Anonymous GETs of the index and marketplace pages are served from memory
+    # until a product or user write invalidates them; browsers revalidate with
+    # ETag / Last-Modified after PAGE_CACHE_MAX_AGE seconds.
+    PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    PAGE_CACHE_MAX_ENTRIES = 256
+    PAGE_CACHE_MAX_AGE = int(os.environ.get('PAGE_CACHE_MAX_AGE', 0))
+    # Listings per marketplace page (older pages via ?cursor=)
+    MARKETPLACE_PAGE_SIZE = int(os.environ.get('MARKETPLACE_PAGE_SIZE', 24))
+    # Bulk listing import (/market/import): rows per upload and per INSERT batch
+    IMPORT_MAX_ROWS = int(os.environ.get('IMPORT_MAX_ROWS', 20000))
+    IMPORT_BATCH_SIZE = 1000
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+
+    # --- Dashboard weather (see agroadvisor/ml_models/current_weather.py) ---
+    # Current conditions are served from memory and refreshed by a background
+    # thread (one per worker): readings are fresh for CURRENT_WEATHER_TTL
+    # seconds and a stale one is shown for up to CURRENT_WEATHER_MAX_STALE
+    # seconds while it is refetched. Only popular locations (viewed
+    # CURRENT_WEATHER_POPULAR_MIN_VIEWS times within the last
+    # CURRENT_WEATHER_POPULAR_WINDOW seconds) are refetched
+    # CURRENT_WEATHER_REFRESH_AHEAD seconds before they expire. A refresher
+    # pass fetches at most CURRENT_WEATHER_MAX_PER_PASS locations.
+    CURRENT_WEATHER_ENABLED = os.environ.get('CURRENT_WEATHER_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    CURRENT_WEATHER_TTL = int(os.environ.get('CURRENT_WEATHER_TTL', 600))
+    CURRENT_WEATHER_REFRESH_AHEAD = 120
+    CURRENT_WEATHER_MAX_STALE = 3 * 3600
+    CURRENT_WEATHER_POPULAR_WINDOW = 3600
+    CURRENT_WEATHER_POPULAR_MIN_VIEWS = 3
+    CURRENT_WEATHER_MAX_PER_PASS = 200
+
+    # --- Admin dashboard ---
+    ADMIN_USERS_PER_PAGE = int(os.environ.get('ADMIN_USERS_PER_PAGE', 50))
+
+    # --- Price chart payloads ---
+    # The predict page history is downsampled to at most this many points.
+    # CHART_DOWNSAMPLE is 'lttb' (shape-preserving), 'ohlc' (weekly+ buckets) or 'none'.
+    CHART_MAX_POINTS = int(os.environ.get('CHART_MAX_POINTS', 400))
+    CHART_DOWNSAMPLE = os.environ.get('CHART_DOWNSAMPLE', 'lttb')
+
+    # --- Request profiling (off by default) ---
+    # When enabled, admins can profile a single request by sending the
+    # PROFILE_HEADER, and any request slower than PROFILE_THRESHOLD_SECONDS
+    # is stack-sampled. Profiles are stored under instance/profiles/.
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+    PROFILE_HEADER = 'X-Profile-Request'
+    PROFILE_THRESHOLD_SECONDS = float(os.environ.get('PROFILE_THRESHOLD_SECONDS', 10))
+    PROFILE_SAMPLE_INTERVAL = 0.01
+    PROFILE_KEEP = 200
+
+    # --- JSON API (/api/v1) ---
+    # Items per batch request; responses at least API_GZIP_MIN_BYTES long are
+    # gzipped for clients that accept it.
+    API_MAX_BATCH = int(os.environ.get('API_MAX_BATCH', 50))
+    API_GZIP_MIN_BYTES = 1024
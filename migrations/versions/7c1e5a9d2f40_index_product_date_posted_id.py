@@ -0,0 +1,26 @@
+"""Index product (date_posted, id) for marketplace pagination
+
+Revision ID: 7c1e5a9d2f40
+Revises: 149241eb37ab
+Create Date: 2026-10-19 10:12:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e5a9d2f40'
+down_revision = '149241eb37ab'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_date_posted_id', ['date_posted', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_date_posted_id')
@@ -0,0 +1,26 @@
+"""Index product (user_id, date_posted) for seller pages and admin statistics
+
+Revision ID: b3f81d6e0a27
+Revises: 7c1e5a9d2f40
+Create Date: 2026-10-19 11:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f81d6e0a27'
+down_revision = '7c1e5a9d2f40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_user_id_date_posted', ['user_id', 'date_posted'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_user_id_date_posted')
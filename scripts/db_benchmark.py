@@ -0,0 +1,196 @@
+"""
+Database throughput benchmark for AgroAdvisor.
+
+Runs concurrent worker processes (like gunicorn workers) against the app's
+database through `create_app`, each mixing marketplace reads (the latest
+listings page) with listing inserts, and reports reads/s, writes/s, latency
+and "database is locked" errors. By default it compares the tuned profile
+(DATABASE_TUNING: WAL + pragmas / pooling) with the untuned one on a fresh
+SQLite file.
+
+Examples (run from the project root):
+
+    python scripts/db_benchmark.py --workers 1,4,8 --duration 10
+    python scripts/db_benchmark.py --write-ratio 0.5 --profiles tuned
+    DATABASE_URL=postgresql://user:pw@localhost/agro python scripts/db_benchmark.py --profiles tuned
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import multiprocessing as mp
+
+# Paths in the app (data/, instance/) are relative to the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from config import Config
+
+PROFILES = {"tuned": True, "untuned": False}
+
+
+def make_config(database_url: str, tuning: bool):
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        DATABASE_TUNING = tuning
+    return BenchmarkConfig
+
+
+def seed(config_class, n_products: int = 500) -> int:
+    """Creates the schema, a benchmark user and some listings. Returns the user id."""
+    from agroadvisor import create_app
+    from agroadvisor.extensions import db
+    from agroadvisor.database import init_database
+    from agroadvisor.models import User, Role, Product
+
+    app = create_app(config_class)
+    with app.app_context():
+        init_database()
+        user = User.query.filter_by(username="dbbench").first()
+        if user is None:
+            user = User(username="dbbench", email="dbbench@example.com",
+                        role=Role.query.filter_by(name="Farmer").first())
+            user.set_password("dbbench")
+            db.session.add(user)
+            db.session.commit()
+        for i in range(n_products - user.products.count()):
+            db.session.add(Product(name=f"Seed lot {i}", price=1000.0, quantity="10 Quintal", user_id=user.id))
+        db.session.commit()
+        user_id = user.id
+        db.engine.dispose()
+    return user_id
+
+
+# --- Worker process ---
+
+def worker(config_class, user_id: int, duration: float, write_ratio: float, threads: int, seed_value: int, out):
+    """One 'gunicorn worker': `threads` threads sharing the app's engine and pool."""
+    import threading
+    from sqlalchemy.exc import OperationalError
+    from agroadvisor import create_app
+    from agroadvisor.extensions import db
+    from agroadvisor.models import Product
+
+    app = create_app(config_class)
+    stats = {"reads": [], "writes": [], "errors": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def run(thread_seed):
+        rng = random.Random(thread_seed)
+        local = {"reads": [], "writes": [], "errors": 0, "locked": 0}
+        with app.app_context():
+            while time.perf_counter() < deadline:
+                write = rng.random() < write_ratio
+                started = time.perf_counter()
+                try:
+                    if write:
+                        db.session.add(Product(name=f"Bench lot {rng.randint(0, 10**6)}", price=rng.uniform(500, 9000),
+                                               quantity="5 Quintal", user_id=user_id))
+                        db.session.commit()
+                    else:
+                        Product.query.order_by(Product.date_posted.desc()).limit(20).all()
+                        db.session.commit()
+                    local["writes" if write else "reads"].append(time.perf_counter() - started)
+                except OperationalError as e:
+                    db.session.rollback()
+                    local["errors"] += 1
+                    if "locked" in str(e).lower():
+                        local["locked"] += 1
+                finally:
+                    db.session.remove()
+        with lock:
+            for key in ("reads", "writes"):
+                stats[key].extend(local[key])
+            stats["errors"] += local["errors"]
+            stats["locked"] += local["locked"]
+
+    pool = [threading.Thread(target=run, args=(seed_value * 1000 + t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    out.put(stats)
+
+
+# --- Runs and reporting ---
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(config_class, user_id: int, workers: int, threads: int, duration: float, write_ratio: float):
+    ctx = mp.get_context("fork" if hasattr(os, "fork") else "spawn")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(config_class, user_id, duration, write_ratio, threads, i, out))
+             for i in range(workers)]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    reads = [x for r in results for x in r["reads"]]
+    writes = [x for r in results for x in r["writes"]]
+    return {
+        "reads_per_s": len(reads) / duration,
+        "writes_per_s": len(writes) / duration,
+        "read_p99_ms": percentile(reads, 0.99) * 1000,
+        "write_p99_ms": percentile(writes, 0.99) * 1000,
+        "errors": sum(r["errors"] for r in results),
+        "locked": sum(r["locked"] for r in results),
+    }
+
+
+def parse_list(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=lambda v: [int(x) for x in parse_list(v)], default=[1, 4],
+                        help="Comma-separated worker process counts (default: 1,4)")
+    parser.add_argument("--threads", type=int, default=2, help="Threads per worker (default: 2)")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per run (default: 5)")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="Share of operations that insert (default: 0.2)")
+    parser.add_argument("--profiles", type=parse_list, default=list(PROFILES),
+                        help="Comma-separated profiles to compare: tuned, untuned (default: both)")
+    args = parser.parse_args(argv)
+
+    database_url = os.environ.get("DATABASE_URL")
+    workdir = None
+    rows = []
+    for profile in args.profiles:
+        if not database_url:
+            # A fresh file per profile: WAL mode persists in the database file
+            workdir = tempfile.mkdtemp(prefix="agro-dbbench-")
+            url = "sqlite:///" + os.path.join(workdir, "bench.db")
+        else:
+            url = database_url
+        config_class = make_config(url, PROFILES[profile])
+        user_id = seed(config_class)
+        for workers in args.workers:
+            result = run(config_class, user_id, workers, args.threads, args.duration, args.write_ratio)
+            rows.append({"profile": profile, "workers": workers, **result})
+            print(f"[Run] {profile} workers={workers}: {result['reads_per_s']:.0f} reads/s, "
+                  f"{result['writes_per_s']:.0f} writes/s, {result['locked']} locked", flush=True)
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n=== {url.split('://')[0]}, {args.threads} threads/worker, write ratio {args.write_ratio} ===")
+    print(f"{'profile':>8} {'workers':>7} {'reads/s':>9} {'writes/s':>9} {'read p99':>9} {'write p99':>10} {'errors':>7} {'locked':>7}")
+    for r in rows:
+        print(f"{r['profile']:>8} {r['workers']:>7} {r['reads_per_s']:>9.0f} {r['writes_per_s']:>9.0f} "
+              f"{r['read_p99_ms']:>7.1f}ms {r['write_p99_ms']:>8.1f}ms {r['errors']:>7} {r['locked']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,515 @@
+"""
+HTTP load-test scenario runner for AgroAdvisor.
+
+Boots the real app from `create_app` behind a small pre-forked HTTP server,
+stubs every upstream API (geocoding, Open-Meteo) locally, and drives a
+weighted mix of traffic against it from concurrent virtual users.
+
+Examples (run from the project root):
+
+    python scripts/loadtest.py --concurrency 16 --duration 30
+    python scripts/loadtest.py --workers 1,2,4 --threads 4,8 --duration 20
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit, parse_qs
+
+import multiprocessing as mp
+
+# Paths in the app (data/, instance/) are relative to the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import requests
+from requests.adapters import HTTPAdapter
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from config import Config
+
+LOADTEST_EMAIL = "loadtest@example.com"
+LOADTEST_PASSWORD = "loadtest-password"
+
+# Default traffic mix (endpoint name -> relative weight)
+DEFAULT_MIX = {
+    "index": 15,
+    "marketplace": 35,
+    "login": 10,
+    "recommend": 20,
+    "predict": 20,
+}
+
+# What a successful response looks like per endpoint: (status, redirect path).
+# Anything else counts as an error - notably a 302 to the login page from a
+# lost session, which would otherwise pass as a fast success.
+EXPECTED = {
+    "index": (200, None),
+    "marketplace": (200, None),
+    "login": (302, "/farmer/dashboard"),
+    "recommend": (200, None),
+    "predict": (200, None),
+}
+
+STUBBED_HOSTS = {
+    "geocode.maps.co",
+    "geocoding-api.open-meteo.com",
+    "api.open-meteo.com",
+    "archive-api.open-meteo.com",
+}
+
+
+# --- 1. Upstream API stubs ---
+
+def _seeded(text: str) -> random.Random:
+    digest = hashlib.md5(text.encode("utf-8")).hexdigest()
+    return random.Random(int(digest[:8], 16))
+
+
+def _fake_coords(text: str):
+    rng = _seeded(text)
+    # Somewhere inside India
+    return round(rng.uniform(10.0, 30.0), 4), round(rng.uniform(72.0, 88.0), 4)
+
+
+def _fake_daily(lat: float, lon: float, variables, start: date, end: date) -> dict:
+    days = (end - start).days + 1
+    daily = {"time": [(start + timedelta(days=i)).isoformat() for i in range(days)]}
+    for var in variables:
+        values = []
+        for i in range(days):
+            doy = (start + timedelta(days=i)).timetuple().tm_yday
+            season = math.sin(2 * math.pi * doy / 365.0)
+            if var.startswith("temperature_2m_max"):
+                values.append(round(31 + 5 * season, 1))
+            elif var.startswith("temperature_2m_min"):
+                values.append(round(20 + 4 * season, 1))
+            elif var.startswith("precipitation"):
+                values.append(round(max(0.0, 6 * season + (lat % 3)), 1))
+            elif "humidity" in var:
+                values.append(round(60 + 20 * season, 1))
+            else:
+                values.append(int(abs(lon * 10 + doy) % 4))
+        daily[var] = values
+    return daily
+
+
+def _stub_payload(url: str):
+    parts = urlsplit(url)
+    params = parse_qs(parts.query)
+    first = lambda key, default=None: params.get(key, [default])[0]
+
+    if parts.hostname == "geocode.maps.co":
+        query = first("q", "")
+        lat, lon = _fake_coords(query)
+        return [{"lat": str(lat), "lon": str(lon), "display_name": query}]
+
+    if parts.hostname == "geocoding-api.open-meteo.com":
+        lat, lon = _fake_coords(first("name", ""))
+        return {"results": [{"latitude": lat, "longitude": lon}]}
+
+    lats = [float(v) for v in first("latitude", "0").split(",")]
+    lons = [float(v) for v in first("longitude", "0").split(",")]
+
+    if "current" in params:
+        payloads = [{
+            "latitude": lat, "longitude": lon,
+            "current": {"temperature_2m": 27.5, "relative_humidity_2m": 64, "precipitation": 0.2},
+        } for lat, lon in zip(lats, lons)]
+    else:
+        variables = []
+        for value in params.get("daily", []):
+            variables.extend(value.split(","))
+        today = date.today()
+        if first("start_date"):
+            start = date.fromisoformat(first("start_date"))
+            end = date.fromisoformat(first("end_date"))
+        else:
+            start, end = today, today + timedelta(days=int(first("forecast_days", "16")) - 1)
+        payloads = [{"latitude": lat, "longitude": lon, "daily": _fake_daily(lat, lon, variables, start, end)}
+                    for lat, lon in zip(lats, lons)]
+
+    return payloads[0] if len(payloads) == 1 else payloads
+
+
+def install_upstream_stubs(latency_ms: float = 0.0):
+    """
+    Routes every request to a known upstream host to a local stub.
+    All other traffic (e.g. our own HTTP client) goes through untouched.
+    """
+    original_send = HTTPAdapter.send
+
+    def send(adapter, request, **kwargs):
+        if urlsplit(request.url).hostname not in STUBBED_HOSTS:
+            return original_send(adapter, request, **kwargs)
+        if latency_ms:
+            time.sleep(latency_ms / 1000.0)
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response.headers["Content-Type"] = "application/json"
+        response._content = json.dumps(_stub_payload(request.url)).encode("utf-8")
+        return response
+
+    HTTPAdapter.send = send
+
+
+# --- 2. App setup ---
+
+def make_config(db_path: str):
+    class LoadTestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + db_path
+        # Virtual users post forms directly, without scraping CSRF tokens
+        WTF_CSRF_ENABLED = False
+    return LoadTestConfig
+
+
+def seed_database(config_class, n_products: int = 200):
+    """Creates the load-test user and some marketplace listings."""
+    from agroadvisor import create_app
+    from agroadvisor.extensions import db
+    from agroadvisor.database import init_database
+    from agroadvisor.models import User, Role, Product
+
+    app = create_app(config_class)
+    with app.app_context():
+        init_database()
+        user = User.query.filter_by(email=LOADTEST_EMAIL).first()
+        if user is None:
+            user = User(username="loadtest", email=LOADTEST_EMAIL,
+                        role=Role.query.filter_by(name="Farmer").first())
+            user.set_password(LOADTEST_PASSWORD)
+            db.session.add(user)
+            db.session.commit()
+        if user.products.count() < n_products:
+            rng = random.Random(7)
+            for i in range(n_products):
+                db.session.add(Product(
+                    name=f"Lot {i}", description="Load-test listing",
+                    price=round(rng.uniform(500, 9000), 2), quantity=f"{rng.randint(1, 90)} Quintal",
+                    user_id=user.id,
+                ))
+            db.session.commit()
+        db.engine.dispose()
+
+
+def load_form_choices(max_pairs: int = 20):
+    """Picks valid (crop, district) pairs and seasons for the POST scenarios."""
+    import pandas as pd
+
+    data_dir = Config.DATA_DIR
+    commodities = pd.read_csv(os.path.join(data_dir, "commodities.csv"))["Commodity"].unique()
+    districts = set(pd.read_csv(os.path.join(data_dir, "agmarknet_state_district_market.csv"))["district"].unique())
+    seasons = list(pd.read_csv(os.path.join(data_dir, "crop-wise-area-production-yield.csv"),
+                               usecols=["season"])["season"].unique())
+
+    files = {"".join(ch for ch in f[:-4].lower() if ch.isalnum()): f
+             for f in os.listdir(data_dir) if f.endswith(".csv")}
+    pairs = []
+    for crop in commodities:
+        fname = files.get("".join(ch for ch in crop.lower() if ch.isalnum()))
+        if not fname:
+            continue
+        top = pd.read_csv(os.path.join(data_dir, fname), usecols=["District Name"])["District Name"]
+        for district in top.value_counts().index[:3]:
+            if district in districts:
+                pairs.append((crop, district))
+    random.Random(11).shuffle(pairs)
+    return pairs[:max_pairs], sorted(districts), seasons
+
+
+# --- 3. Server ---
+
+class PooledWSGIServer(BaseWSGIServer):
+    """A WSGI server that handles connections on a fixed-size thread pool."""
+    multithread = True
+
+    def __init__(self, *args, threads: int = 4, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class QuietHandler(WSGIRequestHandler):
+    # One request per connection, so a pool thread is never parked on keep-alive
+    protocol_version = "HTTP/1.0"
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def serve_worker(fd: int, config_class, threads: int, upstream_latency_ms: float):
+    install_upstream_stubs(upstream_latency_ms)
+    from agroadvisor import create_app
+    app = create_app(config_class)
+    server = PooledWSGIServer("127.0.0.1", 0, app, handler=QuietHandler, fd=fd, threads=threads)
+    server.serve_forever()
+
+
+class Cluster:
+    """N pre-forked server processes sharing one listening socket."""
+
+    def __init__(self, config_class, workers: int, threads: int, upstream_latency_ms: float = 0.0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(1024)
+        self.port = self.sock.getsockname()[1]
+        self.procs = []
+        self.thread_server = None
+
+        if "fork" in mp.get_all_start_methods():
+            ctx = mp.get_context("fork")
+            for _ in range(workers):
+                proc = ctx.Process(target=serve_worker, daemon=True,
+                                   args=(self.sock.fileno(), config_class, threads, upstream_latency_ms))
+                proc.start()
+                self.procs.append(proc)
+        else:
+            # No fork() (e.g. Windows): a single in-process worker
+            if workers > 1:
+                print("[Server] fork() unavailable, running a single worker.")
+            install_upstream_stubs(upstream_latency_ms)
+            from agroadvisor import create_app
+            self.thread_server = PooledWSGIServer("127.0.0.1", self.port, create_app(config_class),
+                                                  handler=QuietHandler, fd=self.sock.fileno(), threads=threads)
+            threading.Thread(target=self.thread_server.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def wait_ready(self, timeout: float = 120.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                if requests.get(self.base_url + "/", timeout=5).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.25)
+        raise RuntimeError("Server did not become ready in time.")
+
+    def stop(self):
+        for proc in self.procs:
+            proc.terminate()
+        for proc in self.procs:
+            proc.join(timeout=10)
+        if self.thread_server:
+            self.thread_server.shutdown()
+        self.sock.close()
+
+
+# --- 4. Virtual users ---
+
+class VirtualUser:
+    def __init__(self, base_url: str, pairs, districts, seasons, rng: random.Random):
+        self.base_url = base_url
+        self.pairs = pairs
+        self.districts = districts
+        self.seasons = seasons
+        self.rng = rng
+        self.http = requests.Session()
+
+    def login(self):
+        return self.http.post(self.base_url + "/auth/login", allow_redirects=False, timeout=120,
+                              data={"email": LOADTEST_EMAIL, "password": LOADTEST_PASSWORD})
+
+    def run(self, name: str):
+        url = self.base_url
+        if name == "index":
+            return self.http.get(url + "/", timeout=120)
+        if name == "marketplace":
+            return self.http.get(url + "/market/", timeout=120)
+        if name == "login":
+            self.http.get(url + "/auth/logout", allow_redirects=False, timeout=120)
+            return self.login()
+        if name == "recommend":
+            return self.http.post(url + "/farmer/recommend", allow_redirects=False, timeout=120, data={
+                "nitrogen": self.rng.randint(20, 140), "phosphorous": self.rng.randint(10, 90),
+                "potassium": self.rng.randint(10, 90), "ph": round(self.rng.uniform(5.0, 8.0), 1),
+                "district": self.rng.choice(self.districts), "season": self.rng.choice(self.seasons),
+            })
+        if name == "predict":
+            crop, district = self.rng.choice(self.pairs)
+            return self.http.post(url + "/farmer/predict", allow_redirects=False, timeout=120,
+                                  data={"crop": crop, "district": district})
+        raise ValueError(f"Unknown endpoint: {name}")
+
+
+def succeeded(name: str, response) -> bool:
+    status, location = EXPECTED[name]
+    if response.status_code != status:
+        return False
+    return location is None or urlsplit(response.headers.get("Location", "")).path == location
+
+
+def drive(base_url: str, mix: dict, concurrency: int, duration: float, choices, seed: int = 1):
+    """Runs `concurrency` virtual users for `duration` seconds; returns samples."""
+    pairs, districts, seasons = choices
+    names, weights = zip(*mix.items())
+    samples = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def user_loop(idx):
+        rng = random.Random(seed * 1000 + idx)
+        user = VirtualUser(base_url, pairs, districts, seasons, rng)
+        user.login()
+        local = []
+        while time.perf_counter() < stop_at:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                ok = succeeded(name, user.run(name))
+            except requests.RequestException:
+                ok = False
+            local.append((name, time.perf_counter() - start, ok))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=user_loop, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples
+
+
+# --- 5. Reporting ---
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo, hi = math.floor(k), math.ceil(k)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarise(samples, duration: float) -> dict:
+    by_endpoint = defaultdict(list)
+    for name, latency, ok in samples:
+        by_endpoint[name].append((latency, ok))
+    by_endpoint["ALL"] = [(lat, ok) for _, lat, ok in samples]
+
+    report = {}
+    for name, rows in by_endpoint.items():
+        lats = sorted(lat for lat, _ in rows)
+        errors = sum(1 for _, ok in rows if not ok)
+        report[name] = {
+            "requests": len(rows),
+            "rps": len(rows) / duration if duration else 0.0,
+            "p50_ms": percentile(lats, 50) * 1000,
+            "p90_ms": percentile(lats, 90) * 1000,
+            "p99_ms": percentile(lats, 99) * 1000,
+            "max_ms": (lats[-1] * 1000) if lats else 0.0,
+            "error_rate": errors / len(rows) if rows else 0.0,
+        }
+    return report
+
+
+def print_report(report: dict, title: str):
+    print(f"\n=== {title} ===")
+    print(f"{'endpoint':<12} {'reqs':>7} {'rps':>8} {'p50ms':>8} {'p90ms':>8} {'p99ms':>8} {'maxms':>8} {'err%':>6}")
+    for name in sorted(report, key=lambda n: (n == "ALL", n)):
+        r = report[name]
+        print(f"{name:<12} {r['requests']:>7} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p90_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['max_ms']:>8.1f} {r['error_rate'] * 100:>6.1f}")
+
+
+# --- 6. Main ---
+
+def parse_int_list(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}'. Choose from {sorted(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=parse_int_list, default=[1],
+                        help="Comma-separated worker process counts to sweep (default: 1)")
+    parser.add_argument("--threads", type=parse_int_list, default=[4],
+                        help="Comma-separated threads-per-worker counts to sweep (default: 4)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent virtual users (default: 8)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per run (default: 20)")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Warm-up seconds before measuring (default: 3)")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Traffic mix, e.g. 'marketplace=5,predict=1' (default: built-in mix)")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0,
+                        help="Artificial latency added to every stubbed upstream call")
+    parser.add_argument("--json", dest="json_out", help="Write the full report to this JSON file")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="agro-loadtest-")
+    config_class = make_config(os.path.join(workdir, "loadtest.db"))
+    print(f"[Setup] Seeding database in {workdir}")
+    seed_database(config_class)
+    choices = load_form_choices()
+    print(f"[Setup] {len(choices[0])} predict pairs, {len(choices[1])} districts, {len(choices[2])} seasons")
+
+    results = []
+    for workers in args.workers:
+        for threads in args.threads:
+            cluster = Cluster(config_class, workers, threads, args.upstream_latency_ms)
+            try:
+                cluster.wait_ready()
+                if args.warmup:
+                    drive(cluster.base_url, args.mix, args.concurrency, args.warmup, choices, seed=0)
+                started = time.perf_counter()
+                samples = drive(cluster.base_url, args.mix, args.concurrency, args.duration, choices)
+                report = summarise(samples, time.perf_counter() - started)
+            finally:
+                cluster.stop()
+            print_report(report, f"workers={workers} threads={threads} concurrency={args.concurrency}")
+            results.append({"workers": workers, "threads": threads,
+                            "concurrency": args.concurrency, "endpoints": report})
+
+    if len(results) > 1:
+        print("\n=== Sweep summary ===")
+        print(f"{'workers':>7} {'threads':>7} {'rps':>8} {'p99ms':>8} {'err%':>6}")
+        for r in results:
+            total = r["endpoints"]["ALL"]
+            print(f"{r['workers']:>7} {r['threads']:>7} {total['rps']:>8.1f} {total['p99_ms']:>8.1f} "
+                  f"{total['error_rate'] * 100:>6.1f}")
+        best = max(results, key=lambda r: r["endpoints"]["ALL"]["rps"])
+        print(f"Peak throughput at workers={best['workers']} threads={best['threads']}")
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"generated_at": datetime.now().isoformat(), "runs": results}, f, indent=2)
+        print(f"[Report] Written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()